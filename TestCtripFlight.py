@@ -1,136 +1,558 @@
+import logging
 import os
-from datetime import datetime
+import sys
 import pytest
-from selenium import webdriver
-from selenium.webdriver import ActionChains, Keys
-from selenium.webdriver.chrome.service import Service
+# 收集阶段只需要By；WebDriver、ActionChains、WebDriverWait等在首次使用时再导入
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+import time
 from time import sleep
 
+from artifact_buffer import ArtifactBuffer
+from date_picker import select_date
+from element_cache import ElementCache
+from element_fingerprint import LocatorHealer
+from input_engine import FastInputEngine
+from network_replay import NetworkReplay
+from network_wait import NetworkMonitor
+from request_blocker import RequestBlocker
+from resource_monitor import CHECKPOINT_JS, RESTORE_STORAGE_JS, RecyclableDriver, ResourceMonitor
+from round_trips import RoundTripCounter
+from run_history import RunHistory
+from step_timeouts import StepTimeouts
 
-@pytest.fixture(scope="class")
-def driver():
-    service = Service(executable_path="C:\\Program Files\\Google\\Chrome\\Application\\chromedriver.exe")
-    driver = webdriver.Chrome(service=service)
-    driver.get("https://www.ctrip.com")
+
+INITIAL_URL = "https://www.ctrip.com"
+
+# 自适应快速输入引擎（清空方式与输入方式按定位器缓存在 input_strategies.json）
+INPUT_ENGINE = FastInputEngine()
+
+# 点击/悬浮方式：composite(默认)一次浏览器调用完成滚动、遮挡检查和操作；native 为逐条WebDriver命令
+CLICK_MODE = os.environ.get("CTRIP_CLICK_MODE", "composite")
+ROUND_TRIPS = RoundTripCounter()
+
+# 步骤截图（CTRIP_ARTIFACT_MODE=failure 时只保存在内存环形缓冲中，失败或标记的步骤才写盘）
+ARTIFACTS = ArtifactBuffer()
+
+# 每步采样浏览器内存/CPU/JS堆，超过阈值（CTRIP_RECYCLE_STEPS / CTRIP_RECYCLE_MB / CTRIP_RECYCLE_HEAP_MB）时透明回收浏览器
+RESOURCES = ResourceMonitor()
+
+# 每个步骤的耗时、各阶段耗时、生效的定位器、重试和失败类型在运行结束时写入 run_history.db（CTRIP_RUN_HISTORY）
+HISTORY = RunHistory()
+
+# 所有定位器都失效时按录制时的元素指纹（STEP_OPTIONS 中的 fingerprint）找回元素，自愈得到的定位器记入 healed_locators.jsonl
+HEALER = LocatorHealer()
+
+# 查找元素的等待时间按运行历史中主定位器查找耗时的p95加余量学习（step_timeouts.json），没有足够样本时使用固定等待时间
+TIMEOUTS = StepTimeouts()
+
+# 同一页面中再次查找同一个元素时复用已解析的元素（页面跳转或元素被重新渲染后自动重新解析，CTRIP_ELEMENT_CACHE=0 关闭）
+ELEMENTS = ElementCache()
+
+# 运行时屏蔽的统计、广告、追踪请求（设置环境变量 CTRIP_BLOCK_REQUESTS=0 关闭）
+BLOCKED_URL_PATTERNS = [
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*googlesyndication.com*",
+    "*hm.baidu.com*",
+    "*cnzz.com*",
+    "*ubt*.ctrip.com*",
+    "*/bf.gif*",
+    "*/ubtrace*",
+    "*/sensorsdata*",
+]
+BLOCKED_RESOURCE_TYPES = [
+    "Media",
+]
+REQUEST_BLOCKER = RequestBlocker(BLOCKED_URL_PATTERNS, BLOCKED_RESOURCE_TYPES,
+                                 enabled=os.environ.get("CTRIP_BLOCK_REQUESTS", "1") == "1")
+
+
+def create_driver(archive_name="default"):
+    """创建浏览器驱动并打开初始页面（fixture与执行计划等工具共用）
+
+    archive_name: 网络录制/回放模式（CTRIP_NETWORK_MODE=record/replay）下使用的归档名称
+    """
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from driver_resolver import chrome_service
+    from network_wait import enable_network_log
+
+    # 开启Network性能日志，用于等待步骤触发的请求完成
+    options = enable_network_log(Options())
+    # 使用本机与Chrome版本匹配的chromedriver（按浏览器版本缓存，启动时不需要联网）
+    service = chrome_service(options)
+    if os.environ.get("CTRIP_BROWSER_DAEMON") == "1":
+        # 连接常驻浏览器守护进程，避免每次运行冷启动Chrome
+        from browser_daemon import BrowserDaemon
+        driver = BrowserDaemon().attach(service=service, options=options)
+    else:
+        driver = webdriver.Chrome(service=service, options=options)
+    RoundTripCounter.attach(driver)
+    driver.known_windows = set(driver.window_handles)
+    REQUEST_BLOCKER.apply(driver)
+    driver.network_replay = NetworkReplay.from_env(driver, archive_name)
+    driver.get(INITIAL_URL)
     driver.maximize_window()
-    yield driver
+    return driver
+
+
+def release_driver(driver):
+    """释放浏览器驱动：守护进程中的浏览器只断开会话，其余直接退出"""
+    daemon = getattr(driver, "browser_daemon", None)
     try:
-        driver.quit()
+        REQUEST_BLOCKER.collect(driver)
+        REQUEST_BLOCKER.detach(driver)
+        if getattr(driver, "network_replay", None) is not None:
+            driver.network_replay.stop()
+        if daemon is not None:
+            daemon.detach(driver)
+        else:
+            driver.quit()
     except:
         pass
 
 
+@pytest.fixture(scope="session", autouse=True)
+def request_blocking_summary():
+    """整个运行结束后输出请求屏蔽统计"""
+    yield
+    REQUEST_BLOCKER.print_summary()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def artifact_summary():
+    """整个运行结束后输出截图缓冲统计"""
+    yield
+    ARTIFACTS.print_summary()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def round_trip_summary():
+    """整个运行结束后输出每步的WebDriver往返次数"""
+    yield
+    ROUND_TRIPS.print_summary(f"（CTRIP_CLICK_MODE={CLICK_MODE}）")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def element_cache_summary():
+    """整个运行结束后输出元素缓存的命中情况"""
+    yield
+    ELEMENTS.print_summary()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def resource_summary():
+    """整个运行结束后输出每个浏览器实例的内存曲线并写入资源报告"""
+    yield
+    RESOURCES.print_summary()
+    RESOURCES.write_report()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def run_history():
+    """整个运行结束后把步骤结果批量写入运行历史数据库，并据此更新步骤等待时间"""
+    HISTORY.start_run(os.path.basename(__file__), click_mode=CLICK_MODE)
+    yield
+    HISTORY.finish_run()
+    TIMEOUTS.learn(HISTORY.path)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def locator_preflight():
+    """CTRIP_PREFLIGHT=report/abort 时，运行前在每个页面状态批量检查所有步骤的定位器（abort：有失效步骤时中止运行）"""
+    mode = os.environ.get("CTRIP_PREFLIGHT", "off")
+    if mode in ("report", "abort"):
+        from preflight import run_preflight
+        run_preflight(sys.modules[__name__], abort=mode == "abort")
+    yield
+
+
+@pytest.fixture(scope="class")
+def driver(request):
+    # 每个需求类使用独立的网络归档；测试拿到的是可回收的代理，回收浏览器后仍是同一个对象
+    name = request.cls.__name__ if request.cls else "default"
+    driver = RecyclableDriver(lambda: create_driver(name), release_driver, RESOURCES, name)
+    yield driver
+    release_driver(driver)
+
+
+# 组合操作：一次调用完成"不在视口内才滚动 → 遮挡检查 → 点击/返回悬浮坐标"，并报告点击是否打开了新窗口
+ACTION_JS = """
+    var el = arguments[0], action = arguments[1];
+    if (!window.__ctripOpenHooked) {
+        window.__ctripOpenHooked = true;
+        window.__ctripOpened = 0;
+        var open = window.open;
+        window.open = function () { window.__ctripOpened++; return open.apply(this, arguments); };
+    }
+    var rect = el.getBoundingClientRect();
+    if (rect.top < 0 || rect.left < 0 || rect.bottom > innerHeight || rect.right > innerWidth) {
+        el.scrollIntoView({block: 'center'});
+        rect = el.getBoundingClientRect();
+    }
+    if (!rect.width && !rect.height) { return {status: 'invisible'}; }
+    var x = rect.left + rect.width / 2, y = rect.top + rect.height / 2;
+    var hit = document.elementFromPoint(x, y);
+    if (hit && hit !== el && !el.contains(hit)) {
+        return {status: 'covered', by: hit.tagName.toLowerCase() + (hit.id ? '#' + hit.id : '')};
+    }
+    if (action !== 'click') { return {status: 'ready', x: x, y: y}; }
+
+    var before = window.__ctripOpened;
+    var options = {bubbles: true, cancelable: true, view: window, clientX: x, clientY: y, button: 0};
+    ['pointerdown', 'mousedown', 'pointerup', 'mouseup'].forEach(function (type) {
+        var Event = type.indexOf('pointer') === 0 && window.PointerEvent ? PointerEvent : MouseEvent;
+        el.dispatchEvent(new Event(type, options));
+    });
+    el.click();
+    var blank = el.closest('a[target=_blank], form[target=_blank]');
+    return {status: 'clicked', opened: window.__ctripOpened > before || !!blank};
+"""
+
+
 class BaseCtripFlight:
     """基础类，包含所有测试类共用的操作方法"""
 
-    def execute_action(self, driver, by_type, locator, action_type, input_data=None, alternative_locators=None):
-        """统一的操作执行方法（支持备选定位器容错）"""
-        if action_type == 'click':
-            element = self._find_element_with_fallback(driver, by_type, locator, alternative_locators)
-            driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", element)
-            sleep(0.5)
-            
-            windows_before = set(driver.window_handles)
-            
+    # 每个需求类独立维护：最近一次通过步骤后的检查点、导致需求放弃的步骤编号、
+    # 已通过的步骤（回收浏览器后在新浏览器中重放）
+    _checkpoint = None
+    _aborted_by = None
+    _passed_steps = None
+
+    @staticmethod
+    def step_timeout(step_id):
+        """步骤查找元素的超时：STEP_OPTIONS中配置的固定值优先，否则使用按运行历史学到的预算（都没有时为None，使用默认超时）"""
+        return STEP_OPTIONS.get(step_id, {}).get("timeout") or TIMEOUTS.get(step_id)
+
+    def run_precondition(self, driver, precondition_data):
+        """执行共享前置步骤，失败时放弃该需求的剩余步骤"""
+        cls = type(self)
+        if cls._aborted_by:
+            for precond_step in precondition_data:
+                HISTORY.skip_step(precond_step[0], f"{cls._aborted_by} 失败")
+            pytest.skip(f"{cls._aborted_by} 失败，跳过该需求的剩余步骤")
+        try:
+            for precond_step in precondition_data:
+                precond_id, precond_by, precond_loc, precond_alts, precond_action, precond_name, precond_input = precond_step
+                options = STEP_OPTIONS.get(precond_id, {})
+                HISTORY.start_step(precond_id, precond_action, precond_loc)
+                self.execute_action(driver, precond_by, precond_loc, precond_action, precond_input, precond_alts,
+                                    wait_for=options.get("wait_for"), fingerprint=options.get("fingerprint"),
+                                    timeout=self.step_timeout(precond_id))
+                HISTORY.finish_step("passed")
+        except Exception as e:
+            HISTORY.finish_step("failed", e)
+            cls._aborted_by = "前置步骤"
+            ARTIFACTS.dump(driver, precond_id)
+            raise
+        cls._passed_steps = list(precondition_data)
+        self.update_checkpoint(driver)
+
+    def run_step(self, driver, test_case_id, by_type, locator, action_type, input_data=None, alternative_locators=None):
+        """执行业务步骤：通过后记录检查点；失败时恢复上一个检查点重试一次，仍失败则快速跳过该需求的剩余步骤"""
+        cls = type(self)
+        if cls._aborted_by:
+            HISTORY.skip_step(test_case_id, f"{cls._aborted_by} 失败")
+            pytest.skip(f"{cls._aborted_by} 失败，跳过该需求的剩余步骤")
+        self.recycle_if_needed(driver)
+
+        options = STEP_OPTIONS.get(test_case_id, {})
+        wait_for = options.get("wait_for")
+        fingerprint = options.get("fingerprint")
+        timeout = self.step_timeout(test_case_id)
+        mark = RoundTripCounter.mark(driver)
+        HISTORY.start_step(test_case_id, action_type, locator)
+        try:
+            self.execute_action(driver, by_type, locator, action_type, input_data, alternative_locators, wait_for,
+                                fingerprint, timeout)
+        except Exception as first_error:
+            if cls._checkpoint is None:
+                cls._aborted_by = test_case_id
+                HISTORY.finish_step("failed", first_error)
+                ARTIFACTS.dump(driver, test_case_id)
+                raise
+            HISTORY.note_retry()
             try:
-                element.click()
-            except:
-                driver.execute_script("arguments[0].click();", element)
+                self.restore_checkpoint(driver, cls._checkpoint)
+                self.execute_action(driver, by_type, locator, action_type, input_data, alternative_locators, wait_for,
+                                    fingerprint, timeout)
+            except Exception:
+                cls._aborted_by = test_case_id
+                HISTORY.finish_step("failed", first_error)
+                ARTIFACTS.dump(driver, test_case_id)
+                raise first_error
+
+        HISTORY.finish_step("passed")
+        ROUND_TRIPS.record(driver, action_type, mark)
+        RESOURCES.after_step(driver, test_case_id)
+        if cls._passed_steps is not None:
+            cls._passed_steps.append((test_case_id, by_type, locator, alternative_locators, action_type, None, input_data))
+        self.update_checkpoint(driver)
+
+    def recycle_if_needed(self, driver):
+        """上一个步骤超过资源阈值时，在本步骤之前回收浏览器
+
+        表单状态只存在于页面内存中，新浏览器从初始页面重放本需求已通过的步骤（不计入运行历史）后再继续
+        """
+        reason = RESOURCES.pending_recycle(driver)
+        if not reason:
+            return
+        cls = type(self)
+        driver.recycle(reason, restore=False)
+        for step_id, step_by, step_loc, step_alts, step_action, _, step_input in cls._passed_steps or []:
+            options = STEP_OPTIONS.get(step_id, {})
+            self.execute_action(driver, step_by, step_loc, step_action, step_input, step_alts,
+                                wait_for=options.get("wait_for"), fingerprint=options.get("fingerprint"),
+                                timeout=self.step_timeout(step_id))
+        print(f"♻ 已在新浏览器中重放 {len(cls._passed_steps or [])} 个已通过的步骤")
+        self.update_checkpoint(driver)
+
+    def update_checkpoint(self, driver):
+        """步骤通过后更新检查点；读取失败（页面正在跳转、存储不可访问）时保留上一个检查点，不影响已通过的步骤"""
+        try:
+            type(self)._checkpoint = self.take_checkpoint(driver)
+        except Exception as e:
+            logging.debug(f"记录检查点失败，沿用上一个检查点: {e}")
+
+    @staticmethod
+    def take_checkpoint(driver):
+        """记录检查点：当前窗口、URL以及localStorage/sessionStorage"""
+        state = driver.execute_script(CHECKPOINT_JS)
+        state["window"] = driver.current_window_handle
+        return state
+
+    @staticmethod
+    def restore_checkpoint(driver, checkpoint):
+        """恢复检查点：切回检查点窗口；页面已离开检查点URL时重新打开并恢复存储"""
+        if checkpoint["window"] in driver.window_handles:
+            driver.switch_to.window(checkpoint["window"])
+        if driver.current_url != checkpoint["url"]:
+            driver.get(checkpoint["url"])
+            driver.execute_script(RESTORE_STORAGE_JS, checkpoint)
+            driver.refresh()
+
+    def execute_action(self, driver, by_type, locator, action_type, input_data=None, alternative_locators=None,
+                       wait_for=None, fingerprint=None, timeout=None):
+        """统一的操作执行方法（支持备选定位器容错；wait_for为该步骤触发的请求URL模式，fingerprint为录制时的元素指纹，
+        timeout为该步骤查找元素的等待时间，为空时使用固定等待时间）
+
+        元素在查找之后被页面重新渲染（StaleElementReferenceException）时丢弃缓存，重新查找并再执行一次
+        """
+        from selenium.common.exceptions import StaleElementReferenceException
+
+        args = (driver, by_type, locator, action_type, input_data, alternative_locators, wait_for, fingerprint, timeout)
+        try:
+            self._perform_action(*args)
+        except StaleElementReferenceException:
+            ELEMENTS.invalidate(by_type, locator)
+            self._perform_action(*args)
+
+    def _perform_action(self, driver, by_type, locator, action_type, input_data, alternative_locators, wait_for,
+                        fingerprint, timeout):
+        if action_type == 'click':
+            element = self._find_element_with_fallback(driver, by_type, locator, alternative_locators,
+                                                       timeout=timeout or 10, fingerprint=fingerprint)
+            since = time.time()
+            result = self._composite_action(driver, element, 'click')
+            windows_before = None
+            if result.get('status') != 'clicked':
+                # native模式、元素被遮挡或不可见：逐条命令滚动和点击，点击前后比较窗口句柄
+                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", element)
+                windows_before = set(driver.window_handles)
+                try:
+                    element.click()
+                except:
+                    driver.execute_script("arguments[0].click();", element)
             
-            sleep(1)
+            # 有URL模式时等待匹配请求完成，否则最多等1秒网络空闲
+            self.wait_for_network(driver, wait_for, since, timeout=15 if wait_for else 1)
             
-            windows_after = set(driver.window_handles)
-            if len(windows_after) > len(windows_before):
-                new_window = list(windows_after - windows_before)[0]
-                driver.switch_to.window(new_window)
+            # 组合点击报告了打开新窗口时才读取窗口句柄
+            if windows_before is not None or result.get('opened'):
+                self._switch_to_unseen_window(driver, windows_before)
             
         elif action_type == 'input':
-            element = self._find_element_with_fallback(driver, by_type, locator, alternative_locators, timeout=20)
+            element = self._find_element_with_fallback(driver, by_type, locator, alternative_locators,
+                                                       timeout=timeout or 20, fingerprint=fingerprint)
             element.click()
-            sleep(0.3)
+            # 按定位器缓存的清空方式清空，再通过Input.insertText一次性输入；只有需要键盘事件的控件才逐键输入
+            since = time.time()
+            INPUT_ENGINE.type_text(driver, element, input_data, key=INPUT_ENGINE.locator_key(by_type, locator))
+            if wait_for:
+                # 等待城市联想等请求返回
+                self.wait_for_network(driver, wait_for, since)
             
-            try:
-                element.clear()
-                sleep(0.2)
-            except:
-                pass
-            
-            try:
-                driver.execute_script("""
-                    arguments[0].value = '';
-                    arguments[0].dispatchEvent(new Event('input', { bubbles: true }));
-                    arguments[0].dispatchEvent(new Event('change', { bubbles: true }));
-                """, element)
-                sleep(0.2)
-            except:
-                pass
-            
-            try:
-                element.send_keys(Keys.CONTROL + 'a')
-                sleep(0.1)
-                element.send_keys(Keys.BACKSPACE)
-                sleep(0.1)
-            except:
-                pass
-            
-            element.send_keys(input_data)
+        elif action_type == 'select_date':
+            # input_data为真实日期（YYYY-MM-DD）或相对今天的天数（+N），一次调用完成定位、翻月和点击
+            element = self._find_element_with_fallback(driver, by_type, locator, alternative_locators,
+                                                       timeout=timeout or 10, fingerprint=fingerprint)
+            since = time.time()
+            select_date(driver, element, input_data)
+            self.wait_for_network(driver, wait_for, since, timeout=15 if wait_for else 1)
             
         elif action_type == 'hover':
-            element = self._find_element_with_fallback(driver, by_type, locator, alternative_locators)
-            driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", element)
-            sleep(0.5)
-            actions = ActionChains(driver)
-            actions.move_to_element(element).perform()
-            sleep(1)
+            element = self._find_element_with_fallback(driver, by_type, locator, alternative_locators,
+                                                       timeout=timeout or 10, fingerprint=fingerprint)
+            since = time.time()
+            result = self._composite_action(driver, element, 'hover')
+            if result.get('status') != 'ready' or not self._move_mouse(driver, result['x'], result['y']):
+                from selenium.webdriver import ActionChains
+
+                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", element)
+                actions = ActionChains(driver)
+                actions.move_to_element(element).perform()
+            # 悬浮展开的菜单可能异步加载内容：与点击相同，有URL模式时等待匹配请求完成，否则最多等1秒网络空闲
+            self.wait_for_network(driver, wait_for, since, timeout=15 if wait_for else 1)
             
         elif action_type == 'window_switch':
             window_index = int(locator.split('_')[1]) - 1
             window_handles = driver.window_handles
             driver.switch_to.window(window_handles[window_index])
+            self._known_windows(driver).update(window_handles)
     
-    def _find_element_with_fallback(self, driver, by_type, locator, alternative_locators=None, timeout=10):
-        """使用主定位器查找元素，失败后尝试备选定位器"""
-        from selenium.common.exceptions import TimeoutException, NoSuchElementException
-        
+    @staticmethod
+    def _composite_action(driver, element, action):
+        """一次浏览器调用完成滚动、遮挡检查和点击（或返回悬浮坐标）；返回空字典表示改用逐条命令"""
+        if CLICK_MODE != "composite":
+            return {}
         try:
-            wait = WebDriverWait(driver, timeout)
-            element = wait.until(EC.presence_of_element_located((by_type, locator)))
-            return element
-        except TimeoutException:
-            pass
-        
-        if alternative_locators:
-            for alt_by, alt_locator in alternative_locators:
-                try:
-                    wait = WebDriverWait(driver, 5)
-                    element = wait.until(EC.presence_of_element_located((alt_by, alt_locator)))
-                    return element
-                except TimeoutException:
-                    continue
+            return driver.execute_script(ACTION_JS, element, action) or {}
+        except Exception:
+            return {}
+    
+    @staticmethod
+    def _move_mouse(driver, x, y):
+        """通过DevTools把真实鼠标移动到视口坐标（触发:hover样式和mouseenter）"""
+        try:
+            driver.execute_cdp_cmd("Input.dispatchMouseEvent", {"type": "mouseMoved", "x": x, "y": y})
+            return True
+        except Exception:
+            return False
+    
+    @staticmethod
+    def _known_windows(driver):
+        known = getattr(driver, "known_windows", None)
+        if known is None:
+            known = driver.known_windows = set(driver.window_handles)
+        return known
+    
+    def _switch_to_unseen_window(self, driver, windows_before=None):
+        """切换到新打开的窗口（windows_before为空时与已知窗口比较），返回是否切换"""
+        known = self._known_windows(driver)
+        window_handles = driver.window_handles
+        new_windows = [handle for handle in window_handles if handle not in (windows_before or known)]
+        known.update(window_handles)
+        if new_windows:
+            driver.switch_to.window(new_windows[0])
+            return True
+        return False
+    
+    @staticmethod
+    def wait_for_network(driver, wait_for, since, timeout=15):
+        """等待步骤触发的请求完成；驱动未开启性能日志时退回原来的固定等待"""
+        with HISTORY.phase("network"):
+            if NetworkMonitor.for_driver(driver).wait(wait_for, since=since, timeout=timeout) is None:
+                sleep(1)
+
+    def _find_element_with_fallback(self, driver, by_type, locator, alternative_locators=None, timeout=10,
+                                    fingerprint=None):
+        """使用主定位器查找元素，失败后尝试备选定位器，都失败时按元素指纹自愈（已解析过且仍在文档中的元素直接复用；
+        查找耗时和生效的定位器记入运行历史）"""
+        from selenium.common.exceptions import TimeoutException, NoSuchElementException
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
         
-        raise NoSuchElementException(f"无法找到元素: 主定位器和所有备选定位器均失败")
+        with HISTORY.phase("find"):
+            # 同一页面中再次查找同一个元素：确认缓存的元素仍在文档中即可，不再等待
+            cached = ELEMENTS.get(driver, by_type, locator)
+            if cached is not None:
+                HISTORY.note_cached()
+                return cached[0]
+            
+            try:
+                wait = WebDriverWait(driver, timeout)
+                element = wait.until(EC.presence_of_element_located((by_type, locator)))
+                HISTORY.note_locator(0)
+                ELEMENTS.put(by_type, locator, element, 0)
+                return element
+            except TimeoutException:
+                pass
+            
+            if alternative_locators:
+                for index, (alt_by, alt_locator) in enumerate(alternative_locators, start=1):
+                    try:
+                        wait = WebDriverWait(driver, min(5, timeout))
+                        element = wait.until(EC.presence_of_element_located((alt_by, alt_locator)))
+                        HISTORY.note_locator(index)
+                        ELEMENTS.put(by_type, locator, element, index)
+                        return element
+                    except TimeoutException:
+                        continue
+            
+            # 页面稍后才打开的新窗口（组合点击只能报告点击时同步打开的窗口）：切换过去再找一次
+            if self._switch_to_unseen_window(driver):
+                return self._find_element_with_fallback(driver, by_type, locator, alternative_locators, timeout,
+                                                        fingerprint)
+            
+            # 所有定位器都失效：按录制时的元素指纹在页面内一次打分，找回置信度足够高的元素
+            element = HEALER.heal(driver, fingerprint, by_type, locator)
+            if element is not None:
+                HISTORY.note_locator(len(alternative_locators or []) + 1)
+                ELEMENTS.put(by_type, locator, element, len(alternative_locators or []) + 1)
+                return element
+            
+            raise NoSuchElementException(f"无法找到元素: 主定位器和所有备选定位器均失败")
 
     @staticmethod
-    def take_screenshot(driver, file_name):
-        timestamp = datetime.now().strftime("%H%M%S%d%f")
-        timestamped_file_name = f"{timestamp}_{file_name}"
-        screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
-        screenshot_file_path = os.path.join(screenshots_dir, timestamped_file_name)
-        driver.save_screenshot(screenshot_file_path)
+    def take_screenshot(driver, file_name, keep=False):
+        """步骤截图：always模式直接写入screenshots目录；failure模式放入缓冲，keep=True时立即写盘"""
+        ARTIFACTS.capture(driver, file_name, keep)
+
+
+# 步骤附加选项：wait_for=该步骤触发、需要等待完成的请求URL（正则）
+#               keep_artifacts=True 时该步骤的截图总是写盘（CTRIP_ARTIFACT_MODE=failure 下也写）
+#               fingerprint=录制时的元素指纹，所有定位器都失效时用于自愈
+#               timeout=查找元素的等待时间（秒），优先于 step_timeouts.json 中学习到的等待时间
+STEP_OPTIONS = {
+    "CtripFlight_R001_001": {"wait_for": "/api/poi/"},
+    "CtripFlight_R001_002": {"wait_for": "/api/poi/"},
+    "CtripFlight_R001_008": {"wait_for": "/search/api/search/batchSearch"},
+    "CtripFlight_R002_009": {"wait_for": "/api/poi/"},
+    "CtripFlight_R002_010": {"wait_for": "/api/poi/"},
+    "CtripFlight_R002_016": {"wait_for": "/search/api/search/batchSearch"},
+    "CtripFlight_R003_017": {"wait_for": "/api/poi/"},
+    "CtripFlight_R003_018": {"wait_for": "/api/poi/"},
+    "CtripFlight_R003_024": {"wait_for": "/search/api/search/batchSearch"},
+    "CtripFlight_R004_025": {"wait_for": "/api/poi/"},
+    "CtripFlight_R004_026": {"wait_for": "/api/poi/"},
+    "CtripFlight_R004_032": {"wait_for": "/search/api/search/batchSearch"},
+}
+
+
+# 共享定位器表：每个逻辑元素（主定位器 + 备选定位器）只定义一次，前置步骤和各需求的步骤表按名称引用
+LOCATORS = {
+    "菜单": (By.CSS_SELECTOR, "#leftSideNavLayer > div > div > div.lsn_top_button_wrap_t3-TA.lsn_icon_center_uNT-6 > div > div", []),
+    "机票": (By.XPATH, "//span[text()='机票']", []),
+    "国内/": (By.XPATH, "//span[text()='国内/国际/中国港澳台']", [(By.CSS_SELECTOR, "span.lsn_font_data_rSNIK"), (By.CSS_SELECTOR, "#popup-2 > div:nth-child(2) > a:nth-child(1) > span")]),
+    "单程": (By.XPATH, "//span[text()='单程']", [(By.CSS_SELECTOR, "span.radio-label"), (By.CSS_SELECTOR, "#searchForm > div > div.modify-search-box > div > div:nth-child(1) > ul > li:nth-child(1) > span")]),
+    "owDCity": (By.NAME, "owDCity", [(By.CSS_SELECTOR, "input[name='owDCity']"), (By.CSS_SELECTOR, "input[type='text']"), (By.CSS_SELECTOR, "input[placeholder='可输入城市或机场']")]),
+    "owACity": (By.NAME, "owACity", [(By.CSS_SELECTOR, "input[name='owACity']"), (By.CSS_SELECTOR, "input[type='text']"), (By.CSS_SELECTOR, "input[placeholder='可输入城市或机场']")]),
+    "日期": (By.CSS_SELECTOR, "#datePicker > div.form-item-v3.flt-date.flt-date-depart > span > div > div > div > input[type=text]", []),
+    "不限": (By.XPATH, "//span[text()='不限舱等']", []),
+    "经济": (By.XPATH, "//div[text()='经济舱']", []),
+    "带儿童": (By.XPATH, "//span[text()='带儿童']", [(By.CSS_SELECTOR, "span.label-tool-tip-wrap"), (By.CSS_SELECTOR, "div:nth-child(2) > div:nth-child(3) > div > div > div > div > div > div > div:nth-child(1) > span")]),
+    "搜索": (By.XPATH, "//button[text()='搜索']", [(By.CSS_SELECTOR, "button[type='submit']"), (By.CSS_SELECTOR, "button.search-btn"), (By.CSS_SELECTOR, "#searchForm > div > button")]),
+}
 
 
 class PreCondition:
     """所有需求共享的前置步骤数据"""
     PRECONDITION_DATA = [
-        ("PreCondition_P001", By.CSS_SELECTOR, "#leftSideNavLayer > div > div > div.lsn_top_button_wrap_t3-TA.lsn_icon_center_uNT-6 > div > div", [], "hover", "菜单", None),
-        ("PreCondition_P002", By.XPATH, "//span[text()='机票']", [], "hover", "机票", None),
-        ("PreCondition_P003", By.XPATH, "//span[text()='国内/国际/中国港澳台']", [(By.CSS_SELECTOR, "span.lsn_font_data_rSNIK"), (By.CSS_SELECTOR, "#popup-2 > div:nth-child(2) > a:nth-child(1) > span")], "click", "国内/", None),
-        ("PreCondition_P004", By.XPATH, "//span[text()='单程']", [(By.CSS_SELECTOR, "span.radio-label"), (By.CSS_SELECTOR, "#searchForm > div > div.modify-search-box > div > div:nth-child(1) > ul > li:nth-child(1) > span")], "click", "单程", None),
+        ("PreCondition_P001", *LOCATORS["菜单"], "hover", "菜单", None),
+        ("PreCondition_P002", *LOCATORS["机票"], "hover", "机票", None),
+        ("PreCondition_P003", *LOCATORS["国内/"], "click", "国内/", None),
+        ("PreCondition_P004", *LOCATORS["单程"], "click", "单程", None),
     ]
 
 
@@ -138,14 +560,14 @@ class TestCtripFlight_R001(BaseCtripFlight):
     _precondition_executed = False
     
     TEST_DATA_R001 = [
-        ("CtripFlight_R001_001", By.NAME, "owDCity", [(By.CSS_SELECTOR, "input[name='owDCity']"), (By.CSS_SELECTOR, "input[type='text']"), (By.CSS_SELECTOR, "input[placeholder='可输入城市或机场']")], "input", "输入框", "北京"),
-        ("CtripFlight_R001_002", By.NAME, "owACity", [(By.CSS_SELECTOR, "input[name='owACity']"), (By.CSS_SELECTOR, "input[type='text']"), (By.CSS_SELECTOR, "input[placeholder='可输入城市或机场']")], "input", "输入框", "广州"),
-        ("CtripFlight_R001_003", By.CSS_SELECTOR, "#datePicker > div.form-item-v3.flt-date.flt-date-depart > span > div > div > div > input[type=text]", [], "click", "日期", None),
-        ("CtripFlight_R001_004", By.CSS_SELECTOR, "body > div:nth-child(8) > div > div.date-multi.clearfix > div:nth-child(2) > div.date-calendar.animated.infinite.fadeInRight > div > div.date-week.date-week-2 > div:nth-child(3) > span.date-d", [], "click", "日期", None),
-        ("CtripFlight_R001_005", By.XPATH, "//span[text()='不限舱等']", [], "click", "不限", None),
-        ("CtripFlight_R001_006", By.XPATH, "//div[text()='经济舱']", [], "click", "经济", None),
-        ("CtripFlight_R001_007", By.XPATH, "//span[text()='带儿童']", [(By.CSS_SELECTOR, "span.label-tool-tip-wrap"), (By.CSS_SELECTOR, "div:nth-child(2) > div:nth-child(3) > div > div > div > div > div > div > div:nth-child(1) > span")], "click", "带儿童", None),
-        ("CtripFlight_R001_008", By.XPATH, "//button[text()='搜索']", [(By.CSS_SELECTOR, "button[type='submit']"), (By.CSS_SELECTOR, "button.search-btn"), (By.CSS_SELECTOR, "#searchForm > div > button")], "click", "搜索", None),
+        ("CtripFlight_R001_001", *LOCATORS["owDCity"], "input", "输入框", "北京"),
+        ("CtripFlight_R001_002", *LOCATORS["owACity"], "input", "输入框", "广州"),
+        ("CtripFlight_R001_003", *LOCATORS["日期"], "click", "日期", None),
+        ("CtripFlight_R001_004", *LOCATORS["日期"], "select_date", "日期", "+7"),
+        ("CtripFlight_R001_005", *LOCATORS["不限"], "click", "不限", None),
+        ("CtripFlight_R001_006", *LOCATORS["经济"], "click", "经济", None),
+        ("CtripFlight_R001_007", *LOCATORS["带儿童"], "click", "带儿童", None),
+        ("CtripFlight_R001_008", *LOCATORS["搜索"], "click", "搜索", None),
     ]
 
     @pytest.mark.parametrize(
@@ -156,30 +578,27 @@ class TestCtripFlight_R001(BaseCtripFlight):
     def test_CtripFlight_R001(self, driver, test_case_id, by_type, locator, alternative_locators, action_type, test_name, input_data):
         # 只在第一个测试步骤时执行前置步骤
         if not TestCtripFlight_R001._precondition_executed:
-            for precond_step in PreCondition.PRECONDITION_DATA:
-                precond_id, precond_by, precond_loc, precond_alts, precond_action, precond_name, precond_input = precond_step
-                self.execute_action(driver, precond_by, precond_loc, precond_action, precond_input, precond_alts)
-                sleep(0.5)
+            self.run_precondition(driver, PreCondition.PRECONDITION_DATA)
             TestCtripFlight_R001._precondition_executed = True
 
-        # 执行业务步骤
-        self.execute_action(driver, by_type, locator, action_type, input_data, alternative_locators)
-        self.take_screenshot(driver, f"{test_case_id}.png")
-        sleep(1)
+        # 执行业务步骤（失败时恢复检查点重试一次，仍失败则跳过剩余步骤）
+        self.run_step(driver, test_case_id, by_type, locator, action_type, input_data, alternative_locators)
+        self.take_screenshot(driver, f"{test_case_id}.png",
+                             keep=STEP_OPTIONS.get(test_case_id, {}).get("keep_artifacts", False))
 
 
 class TestCtripFlight_R002(BaseCtripFlight):
     _precondition_executed = False
     
     TEST_DATA_R002 = [
-        ("CtripFlight_R002_009", By.NAME, "owDCity", [(By.CSS_SELECTOR, "input[name='owDCity']"), (By.CSS_SELECTOR, "input[type='text']"), (By.CSS_SELECTOR, "input[placeholder='可输入城市或机场']")], "input", "输入框", "北京"),
-        ("CtripFlight_R002_010", By.NAME, "owACity", [(By.CSS_SELECTOR, "input[name='owACity']"), (By.CSS_SELECTOR, "input[type='text']"), (By.CSS_SELECTOR, "input[placeholder='可输入城市或机场']")], "input", "输入框", "成都"),
-        ("CtripFlight_R002_011", By.CSS_SELECTOR, "#datePicker > div.form-item-v3.flt-date.flt-date-depart > span > div > div > div > input[type=text]", [], "click", "日期", None),
-        ("CtripFlight_R002_012", By.CSS_SELECTOR, "body > div:nth-child(8) > div > div.date-multi.clearfix > div:nth-child(2) > div.date-calendar.animated.infinite.fadeInRight > div > div.date-week.date-week-2 > div:nth-child(3) > span.date-d", [], "click", "日期", None),
-        ("CtripFlight_R002_013", By.XPATH, "//span[text()='不限舱等']", [], "click", "不限", None),
-        ("CtripFlight_R002_014", By.XPATH, "//div[text()='经济舱']", [], "click", "经济", None),
-        ("CtripFlight_R002_015", By.XPATH, "//span[text()='带儿童']", [(By.CSS_SELECTOR, "span.label-tool-tip-wrap"), (By.CSS_SELECTOR, "div:nth-child(2) > div:nth-child(3) > div > div > div > div > div > div > div:nth-child(1) > span")], "click", "带儿童", None),
-        ("CtripFlight_R002_016", By.XPATH, "//button[text()='搜索']", [(By.CSS_SELECTOR, "button[type='submit']"), (By.CSS_SELECTOR, "button.search-btn"), (By.CSS_SELECTOR, "#searchForm > div > button")], "click", "搜索", None),
+        ("CtripFlight_R002_009", *LOCATORS["owDCity"], "input", "输入框", "北京"),
+        ("CtripFlight_R002_010", *LOCATORS["owACity"], "input", "输入框", "成都"),
+        ("CtripFlight_R002_011", *LOCATORS["日期"], "click", "日期", None),
+        ("CtripFlight_R002_012", *LOCATORS["日期"], "select_date", "日期", "+7"),
+        ("CtripFlight_R002_013", *LOCATORS["不限"], "click", "不限", None),
+        ("CtripFlight_R002_014", *LOCATORS["经济"], "click", "经济", None),
+        ("CtripFlight_R002_015", *LOCATORS["带儿童"], "click", "带儿童", None),
+        ("CtripFlight_R002_016", *LOCATORS["搜索"], "click", "搜索", None),
     ]
 
     @pytest.mark.parametrize(
@@ -190,30 +609,27 @@ class TestCtripFlight_R002(BaseCtripFlight):
     def test_CtripFlight_R002(self, driver, test_case_id, by_type, locator, alternative_locators, action_type, test_name, input_data):
         # 只在第一个测试步骤时执行前置步骤
         if not TestCtripFlight_R002._precondition_executed:
-            for precond_step in PreCondition.PRECONDITION_DATA:
-                precond_id, precond_by, precond_loc, precond_alts, precond_action, precond_name, precond_input = precond_step
-                self.execute_action(driver, precond_by, precond_loc, precond_action, precond_input, precond_alts)
-                sleep(0.5)
+            self.run_precondition(driver, PreCondition.PRECONDITION_DATA)
             TestCtripFlight_R002._precondition_executed = True
 
-        # 执行业务步骤
-        self.execute_action(driver, by_type, locator, action_type, input_data, alternative_locators)
-        self.take_screenshot(driver, f"{test_case_id}.png")
-        sleep(1)
+        # 执行业务步骤（失败时恢复检查点重试一次，仍失败则跳过剩余步骤）
+        self.run_step(driver, test_case_id, by_type, locator, action_type, input_data, alternative_locators)
+        self.take_screenshot(driver, f"{test_case_id}.png",
+                             keep=STEP_OPTIONS.get(test_case_id, {}).get("keep_artifacts", False))
 
 
 class TestCtripFlight_R003(BaseCtripFlight):
     _precondition_executed = False
     
     TEST_DATA_R003 = [
-        ("CtripFlight_R003_017", By.NAME, "owDCity", [(By.CSS_SELECTOR, "input[name='owDCity']"), (By.CSS_SELECTOR, "input[type='text']"), (By.CSS_SELECTOR, "input[placeholder='可输入城市或机场']")], "input", "输入框", "上海"),
-        ("CtripFlight_R003_018", By.NAME, "owACity", [(By.CSS_SELECTOR, "input[name='owACity']"), (By.CSS_SELECTOR, "input[type='text']"), (By.CSS_SELECTOR, "input[placeholder='可输入城市或机场']")], "input", "输入框", "广州"),
-        ("CtripFlight_R003_019", By.CSS_SELECTOR, "#datePicker > div.form-item-v3.flt-date.flt-date-depart > span > div > div > div > input[type=text]", [], "click", "日期", None),
-        ("CtripFlight_R003_020", By.CSS_SELECTOR, "body > div:nth-child(8) > div > div.date-multi.clearfix > div:nth-child(2) > div.date-calendar.animated.infinite.fadeInRight > div > div.date-week.date-week-2 > div:nth-child(3) > span.date-d", [], "click", "日期", None),
-        ("CtripFlight_R003_021", By.XPATH, "//span[text()='不限舱等']", [], "click", "不限", None),
-        ("CtripFlight_R003_022", By.XPATH, "//div[text()='经济舱']", [], "click", "经济", None),
-        ("CtripFlight_R003_023", By.XPATH, "//span[text()='带儿童']", [(By.CSS_SELECTOR, "span.label-tool-tip-wrap"), (By.CSS_SELECTOR, "div:nth-child(2) > div:nth-child(3) > div > div > div > div > div > div > div:nth-child(1) > span")], "click", "带儿童", None),
-        ("CtripFlight_R003_024", By.XPATH, "//button[text()='搜索']", [(By.CSS_SELECTOR, "button[type='submit']"), (By.CSS_SELECTOR, "button.search-btn"), (By.CSS_SELECTOR, "#searchForm > div > button")], "click", "搜索", None),
+        ("CtripFlight_R003_017", *LOCATORS["owDCity"], "input", "输入框", "上海"),
+        ("CtripFlight_R003_018", *LOCATORS["owACity"], "input", "输入框", "广州"),
+        ("CtripFlight_R003_019", *LOCATORS["日期"], "click", "日期", None),
+        ("CtripFlight_R003_020", *LOCATORS["日期"], "select_date", "日期", "+7"),
+        ("CtripFlight_R003_021", *LOCATORS["不限"], "click", "不限", None),
+        ("CtripFlight_R003_022", *LOCATORS["经济"], "click", "经济", None),
+        ("CtripFlight_R003_023", *LOCATORS["带儿童"], "click", "带儿童", None),
+        ("CtripFlight_R003_024", *LOCATORS["搜索"], "click", "搜索", None),
     ]
 
     @pytest.mark.parametrize(
@@ -224,30 +640,27 @@ class TestCtripFlight_R003(BaseCtripFlight):
     def test_CtripFlight_R003(self, driver, test_case_id, by_type, locator, alternative_locators, action_type, test_name, input_data):
         # 只在第一个测试步骤时执行前置步骤
         if not TestCtripFlight_R003._precondition_executed:
-            for precond_step in PreCondition.PRECONDITION_DATA:
-                precond_id, precond_by, precond_loc, precond_alts, precond_action, precond_name, precond_input = precond_step
-                self.execute_action(driver, precond_by, precond_loc, precond_action, precond_input, precond_alts)
-                sleep(0.5)
+            self.run_precondition(driver, PreCondition.PRECONDITION_DATA)
             TestCtripFlight_R003._precondition_executed = True
 
-        # 执行业务步骤
-        self.execute_action(driver, by_type, locator, action_type, input_data, alternative_locators)
-        self.take_screenshot(driver, f"{test_case_id}.png")
-        sleep(1)
+        # 执行业务步骤（失败时恢复检查点重试一次，仍失败则跳过剩余步骤）
+        self.run_step(driver, test_case_id, by_type, locator, action_type, input_data, alternative_locators)
+        self.take_screenshot(driver, f"{test_case_id}.png",
+                             keep=STEP_OPTIONS.get(test_case_id, {}).get("keep_artifacts", False))
 
 
 class TestCtripFlight_R004(BaseCtripFlight):
     _precondition_executed = False
     
     TEST_DATA_R004 = [
-        ("CtripFlight_R004_025", By.NAME, "owDCity", [(By.CSS_SELECTOR, "input[name='owDCity']"), (By.CSS_SELECTOR, "input[type='text']"), (By.CSS_SELECTOR, "input[placeholder='可输入城市或机场']")], "input", "输入框", "上海"),
-        ("CtripFlight_R004_026", By.NAME, "owACity", [(By.CSS_SELECTOR, "input[name='owACity']"), (By.CSS_SELECTOR, "input[type='text']"), (By.CSS_SELECTOR, "input[placeholder='可输入城市或机场']")], "input", "输入框", "成都"),
-        ("CtripFlight_R004_027", By.CSS_SELECTOR, "#datePicker > div.form-item-v3.flt-date.flt-date-depart > span > div > div > div > input[type=text]", [], "click", "日期", None),
-        ("CtripFlight_R004_028", By.CSS_SELECTOR, "body > div:nth-child(8) > div > div.date-multi.clearfix > div:nth-child(2) > div.date-calendar.animated.infinite.fadeInRight > div > div.date-week.date-week-2 > div:nth-child(3) > span.date-d", [], "click", "日期", None),
-        ("CtripFlight_R004_029", By.XPATH, "//span[text()='不限舱等']", [], "click", "不限", None),
-        ("CtripFlight_R004_030", By.XPATH, "//div[text()='经济舱']", [], "click", "经济", None),
-        ("CtripFlight_R004_031", By.XPATH, "//span[text()='带儿童']", [(By.CSS_SELECTOR, "span.label-tool-tip-wrap"), (By.CSS_SELECTOR, "div:nth-child(2) > div:nth-child(3) > div > div > div > div > div > div > div:nth-child(1) > span")], "click", "带儿童", None),
-        ("CtripFlight_R004_032", By.XPATH, "//button[text()='搜索']", [(By.CSS_SELECTOR, "button[type='submit']"), (By.CSS_SELECTOR, "button.search-btn"), (By.CSS_SELECTOR, "#searchForm > div > button")], "click", "搜索", None),
+        ("CtripFlight_R004_025", *LOCATORS["owDCity"], "input", "输入框", "上海"),
+        ("CtripFlight_R004_026", *LOCATORS["owACity"], "input", "输入框", "成都"),
+        ("CtripFlight_R004_027", *LOCATORS["日期"], "click", "日期", None),
+        ("CtripFlight_R004_028", *LOCATORS["日期"], "select_date", "日期", "+7"),
+        ("CtripFlight_R004_029", *LOCATORS["不限"], "click", "不限", None),
+        ("CtripFlight_R004_030", *LOCATORS["经济"], "click", "经济", None),
+        ("CtripFlight_R004_031", *LOCATORS["带儿童"], "click", "带儿童", None),
+        ("CtripFlight_R004_032", *LOCATORS["搜索"], "click", "搜索", None),
     ]
 
     @pytest.mark.parametrize(
@@ -258,13 +671,10 @@ class TestCtripFlight_R004(BaseCtripFlight):
     def test_CtripFlight_R004(self, driver, test_case_id, by_type, locator, alternative_locators, action_type, test_name, input_data):
         # 只在第一个测试步骤时执行前置步骤
         if not TestCtripFlight_R004._precondition_executed:
-            for precond_step in PreCondition.PRECONDITION_DATA:
-                precond_id, precond_by, precond_loc, precond_alts, precond_action, precond_name, precond_input = precond_step
-                self.execute_action(driver, precond_by, precond_loc, precond_action, precond_input, precond_alts)
-                sleep(0.5)
+            self.run_precondition(driver, PreCondition.PRECONDITION_DATA)
             TestCtripFlight_R004._precondition_executed = True
 
-        # 执行业务步骤
-        self.execute_action(driver, by_type, locator, action_type, input_data, alternative_locators)
-        self.take_screenshot(driver, f"{test_case_id}.png")
-        sleep(1)
+        # 执行业务步骤（失败时恢复检查点重试一次，仍失败则跳过剩余步骤）
+        self.run_step(driver, test_case_id, by_type, locator, action_type, input_data, alternative_locators)
+        self.take_screenshot(driver, f"{test_case_id}.png",
+                             keep=STEP_OPTIONS.get(test_case_id, {}).get("keep_artifacts", False))
@@ -0,0 +1,148 @@
+"""
+失败时才落盘的截图/DOM环形缓冲
+
+原来每个通过的步骤都写一张PNG，而截图只在排查失败时才会被查看。
+failure 模式下每个步骤的截图和DOM快照只保存在内存中的环形缓冲里：
+- 缓冲按条数（默认最近5步）和总字节数（默认50MB）双重限制，超出时丢弃最旧的记录
+- 步骤失败时先抓取失败瞬间的截图和DOM，再把缓冲中失败前的几步一并写入截图目录
+- 在 STEP_OPTIONS 中标记 "keep_artifacts": True 的步骤通过后也会写盘
+- 全部通过的运行不产生任何截图文件
+
+写入的文件沿用原来的命名：{时间戳}_{测试用例编号}.png，DOM快照为同名 .html
+
+环境变量:
+  CTRIP_ARTIFACT_MODE=always|failure     # always(默认)每步写截图；failure 只在失败或标记时写盘
+  CTRIP_ARTIFACT_BUFFER_SIZE=5           # 缓冲保留的步骤数
+  CTRIP_ARTIFACT_MAX_MB=50               # 缓冲占用内存上限
+"""
+
+import logging
+import os
+from collections import deque
+from datetime import datetime
+from typing import List
+
+
+ARTIFACT_MODE = os.environ.get('CTRIP_ARTIFACT_MODE', 'always')
+ARTIFACT_BUFFER_SIZE = int(os.environ.get('CTRIP_ARTIFACT_BUFFER_SIZE', '5'))
+ARTIFACT_MAX_BYTES = int(float(os.environ.get('CTRIP_ARTIFACT_MAX_MB', '50')) * 1024 * 1024)
+
+
+class _Artifact:
+    __slots__ = ('timestamp', 'name', 'png', 'html')
+
+    def __init__(self, name: str, png: bytes, html: bytes):
+        self.timestamp = datetime.now().strftime("%H%M%S%d%f")
+        self.name = name
+        self.png = png
+        self.html = html
+
+    @property
+    def size(self) -> int:
+        return len(self.png) + len(self.html)
+
+
+class ArtifactBuffer:
+    """按模式直接写截图，或保存在有界环形缓冲中、失败时再写盘"""
+
+    def __init__(self, directory: str = 'screenshots', mode: str = ARTIFACT_MODE,
+                 capacity: int = ARTIFACT_BUFFER_SIZE, max_bytes: int = ARTIFACT_MAX_BYTES):
+        self.directory = directory
+        self.mode = mode
+        self.capacity = max(capacity, 1)
+        self.max_bytes = max_bytes
+        self._buffer = deque()
+        self.buffered_bytes = 0
+        self.stats = {'captured': 0, 'written': 0, 'discarded': 0}
+
+    @staticmethod
+    def _name(file_name: str) -> str:
+        return os.path.splitext(file_name)[0]
+
+    def capture(self, driver, file_name: str, keep: bool = False) -> List[str]:
+        """
+        记录一个步骤的截图
+
+        Args:
+            file_name: 文件名（通常为 测试用例编号.png）
+            keep: 是否立即写盘（标记的步骤）
+
+        Returns:
+            本次写入的文件路径（failure 模式下未写盘时为空列表）
+        """
+        self.stats['captured'] += 1
+        if self.mode != 'failure':
+            return [self._write_screenshot(driver, self._name(file_name))]
+
+        artifact = self._grab(driver, self._name(file_name))
+        if artifact is None:
+            return []
+        self._buffer.append(artifact)
+        self.buffered_bytes += artifact.size
+        # 超出条数或内存上限时丢弃最旧的记录（至少保留刚抓取的这一条）
+        while len(self._buffer) > 1 and (len(self._buffer) > self.capacity or self.buffered_bytes > self.max_bytes):
+            self.buffered_bytes -= self._buffer.popleft().size
+            self.stats['discarded'] += 1
+        return self.flush() if keep else []
+
+    def dump(self, driver, file_name: str) -> List[str]:
+        """步骤失败：抓取当前页面状态，连同缓冲中失败前的步骤一起写盘"""
+        artifact = self._grab(driver, self._name(file_name))
+        if artifact is not None:
+            self._buffer.append(artifact)
+            self.buffered_bytes += artifact.size
+        paths = self.flush()
+        if paths:
+            print(f"📸 失败现场已保存: {len(paths)} 个文件 → {self.directory}")
+        return paths
+
+    def flush(self) -> List[str]:
+        """把缓冲中的全部记录写入截图目录并清空缓冲"""
+        paths = []
+        if not self._buffer:
+            return paths
+        os.makedirs(self.directory, exist_ok=True)
+        while self._buffer:
+            artifact = self._buffer.popleft()
+            base = os.path.join(self.directory, f"{artifact.timestamp}_{artifact.name}")
+            try:
+                with open(f"{base}.png", 'wb') as f:
+                    f.write(artifact.png)
+                paths.append(f"{base}.png")
+                if artifact.html:
+                    with open(f"{base}.html", 'wb') as f:
+                        f.write(artifact.html)
+                    paths.append(f"{base}.html")
+            except OSError as e:
+                logging.warning(f"写入截图失败 {base}: {e}")
+        self.buffered_bytes = 0
+        self.stats['written'] += len(paths)
+        return paths
+
+    def _grab(self, driver, name: str):
+        """在内存中抓取截图和DOM（浏览器已不可用时返回None）"""
+        try:
+            png = driver.get_screenshot_as_png()
+        except Exception as e:
+            logging.warning(f"截图失败 {name}: {e}")
+            return None
+        try:
+            html = driver.page_source.encode('utf-8')
+        except Exception as e:
+            logging.debug(f"读取DOM失败 {name}: {e}")
+            html = b''
+        return _Artifact(name, png, html)
+
+    def _write_screenshot(self, driver, name: str) -> str:
+        timestamp = datetime.now().strftime("%H%M%S%d%f")
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{timestamp}_{name}.png")
+        driver.save_screenshot(path)
+        self.stats['written'] += 1
+        return path
+
+    def print_summary(self):
+        if self.mode != 'failure':
+            return
+        print(f"\n📸 截图缓冲: 抓取 {self.stats['captured']} 次，写盘 {self.stats['written']} 个文件，"
+              f"丢弃 {self.stats['discarded']} 条（缓冲上限 {self.capacity} 步 / {self.max_bytes // (1024 * 1024)} MB）")
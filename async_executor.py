@@ -0,0 +1,866 @@
+"""
+单浏览器多标签页并发执行器
+
+并行运行N个需求原来需要N个Chrome进程，每个进程都要占用几百MB内存。
+本执行器在同一个Chrome中为每个需求打开一个隔离的浏览器上下文（或标签页），直接通过DevTools协议驱动，
+用 asyncio 交错各需求的等待（元素出现、网络请求完成、悬浮停留等）：
+- 步骤语义与生成脚本中的 BaseCtripFlight 一致：主定位器 + 备选定位器容错、组合点击（ACTION_JS）、
+  快速输入（清空后 Input.insertText，值不正确时逐键输入）、语义化日期选择、悬浮、window_switch、
+  点击打开的新标签页、按 STEP_OPTIONS 中的 wait_for 等待请求完成、失败时恢复检查点重试一次
+- 浏览器上下文（--isolation context，默认）之间Cookie和存储互不影响，相当于各自独立的浏览器；
+  --isolation tab 时所有需求共用默认上下文，内存更省但会共享登录状态
+- 前置步骤失败或某个步骤重试后仍失败时，该需求的剩余步骤记为跳过
+
+用法:
+  python async_executor.py                                  # 同一个Chrome中并发运行全部需求
+  python async_executor.py --concurrency 2 --requirements R001 R003
+  python async_executor.py --headless --json async_results.json
+  python async_executor.py --benchmark --headless           # 与"每个需求一个Chrome进程"对比每GB内存的吞吐量
+
+内存按Chrome进程树统计（Linux读取 /proc 中的PSS，其他平台需要安装 psutil）。
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+from element_fingerprint import HEAL_JS, MIN_MARGIN
+from network_wait import POLL_INTERVAL, NetworkMonitor
+from resource_monitor import process_tree_memory
+from step_tables import load_step_tables, load_test_module
+
+
+DEFAULT_CONCURRENCY = 4
+WINDOW_SIZE = (1920, 1080)
+PAGE_LOAD_TIMEOUT = 30
+MEMORY_SAMPLE_INTERVAL = 0.5
+
+# 按By常量的值查找第一个匹配的元素（与 presence_of_element_located 相同：存在于DOM中即可）
+FIND_ELEMENT_JS = """
+(function (by, locator) {
+    switch (by) {
+        case 'css selector': return document.querySelector(locator);
+        case 'xpath':
+            return document.evaluate(locator, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        case 'id': return document.getElementById(locator);
+        case 'name': return document.getElementsByName(locator)[0] || null;
+        case 'class name': return document.getElementsByClassName(locator)[0] || null;
+        case 'tag name': return document.getElementsByTagName(locator)[0] || null;
+        case 'link text':
+        case 'partial link text':
+            var links = document.getElementsByTagName('a');
+            for (var i = 0; i < links.length; i++) {
+                var text = (links[i].innerText || '').trim();
+                if (by === 'link text' ? text === locator : text.indexOf(locator) >= 0) { return links[i]; }
+            }
+            return null;
+    }
+    return null;
+})
+"""
+
+# 滚动到视口中央并返回中心坐标（元素不可见时返回null）
+CENTER_JS = """
+    var el = arguments[0];
+    el.scrollIntoView({block: 'center'});
+    var rect = el.getBoundingClientRect();
+    if (!rect.width && !rect.height) { return null; }
+    return {x: rect.left + rect.width / 2, y: rect.top + rect.height / 2};
+"""
+
+READY_STATE_JS = "document.readyState"
+
+
+# ============ DevTools连接 ============
+class AsyncCdpConnection:
+    """asyncio版的DevTools WebSocket客户端：读线程接收消息，响应和事件交回事件循环处理"""
+
+    def __init__(self, ws_url: str, loop: asyncio.AbstractEventLoop):
+        import websocket
+
+        self.ws = websocket.create_connection(ws_url, suppress_origin=True, enable_multithread=True)
+        self.loop = loop
+        self._next_id = 0
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._listeners: Dict[Optional[str], list] = {}  # sessionId（None为浏览器级）-> 事件处理函数
+        self._closed = False
+        threading.Thread(target=self._read_loop, daemon=True).start()
+
+    @classmethod
+    async def connect(cls, ws_url: str) -> 'AsyncCdpConnection':
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, cls, ws_url, loop)
+
+    def on(self, session_id: Optional[str], handler):
+        """注册某个会话的事件处理函数 handler(method, params)"""
+        self._listeners.setdefault(session_id, []).append(handler)
+
+    def off(self, session_id: Optional[str]):
+        self._listeners.pop(session_id, None)
+
+    async def send(self, method: str, params: dict = None, session_id: str = None, timeout: float = 30) -> dict:
+        self._next_id += 1
+        message_id = self._next_id
+        future = self.loop.create_future()
+        self._pending[message_id] = future
+        message = {'id': message_id, 'method': method, 'params': params or {}}
+        if session_id:
+            message['sessionId'] = session_id
+        self.ws.send(json.dumps(message))
+        try:
+            response = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"DevTools命令超时: {method}")
+        finally:
+            self._pending.pop(message_id, None)
+        if 'error' in response:
+            raise RuntimeError(f"{method}: {response['error'].get('message')}")
+        return response.get('result', {})
+
+    def _read_loop(self):
+        while not self._closed:
+            try:
+                message = json.loads(self.ws.recv())
+            except Exception:
+                break
+            try:
+                self.loop.call_soon_threadsafe(self._dispatch, message)
+            except RuntimeError:
+                break  # 事件循环已关闭
+
+    def _dispatch(self, message: dict):
+        if 'id' in message:
+            future = self._pending.get(message['id'])
+            if future is not None and not future.done():
+                future.set_result(message)
+            return
+        for handler in list(self._listeners.get(message.get('sessionId'), [])):
+            try:
+                handler(message.get('method', ''), message.get('params', {}))
+            except Exception as e:
+                logging.debug(f"处理DevTools事件失败: {e}")
+
+    def close(self):
+        self._closed = True
+        try:
+            self.ws.close()
+        except Exception:
+            pass
+
+
+class _TabNetworkMonitor(NetworkMonitor):
+    """由DevTools事件直接更新的网络监视器（不读取性能日志）"""
+
+    def __init__(self):
+        super().__init__(driver=None)
+        self.available = True
+
+    def poll(self) -> bool:
+        return True
+
+    def handle(self, method: str, params: dict):
+        if method.startswith('Network.'):
+            self._handle_event(method, params)
+
+
+# ============ Chrome进程 ============
+class ChromeProcess:
+    """启动一个开启远程调试的Chrome（临时用户目录，端口由Chrome自动分配）"""
+
+    def __init__(self, headless: bool = False, chrome_binary: str = None):
+        from driver_resolver import find_chrome_binary
+
+        chrome_binary = chrome_binary or find_chrome_binary()
+        if not chrome_binary:
+            raise RuntimeError("未找到Chrome浏览器，请通过环境变量 CHROME_BINARY 指定路径")
+        self.profile_dir = tempfile.mkdtemp(prefix='ctrip_async_')
+        args = [
+            chrome_binary,
+            "--remote-debugging-port=0",
+            f"--user-data-dir={self.profile_dir}",
+            "--no-first-run",
+            "--no-default-browser-check",
+            f"--window-size={WINDOW_SIZE[0]},{WINDOW_SIZE[1]}",
+            "about:blank",
+        ]
+        if headless:
+            args.insert(1, "--headless=new")
+        self.process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.pid = self.process.pid
+        self.ws_url = self._read_ws_url()
+
+    def _read_ws_url(self, timeout: float = 20) -> str:
+        """Chrome启动后把实际端口和浏览器WebSocket路径写入用户目录下的 DevToolsActivePort"""
+        port_file = os.path.join(self.profile_dir, 'DevToolsActivePort')
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                with open(port_file, 'r', encoding='utf-8') as f:
+                    lines = f.read().split()
+                if len(lines) >= 2:
+                    return f"ws://127.0.0.1:{lines[0]}{lines[1]}"
+            except OSError:
+                pass
+            if self.process.poll() is not None:
+                break
+            time.sleep(0.1)
+        self.close()
+        raise RuntimeError("Chrome启动失败：未能读取远程调试端口")
+
+    def close(self):
+        try:
+            self.process.terminate()
+            self.process.wait(timeout=10)
+        except Exception:
+            self.process.kill()
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+class MemorySampler:
+    """在事件循环中定期采样Chrome进程树的内存，记录峰值"""
+
+    def __init__(self, root_pids: List[int]):
+        self.root_pids = root_pids
+        self.peak: Optional[int] = None
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            value = await loop.run_in_executor(None, process_tree_memory, self.root_pids)
+            if value is not None:
+                self.peak = max(self.peak or 0, value)
+            await asyncio.sleep(MEMORY_SAMPLE_INTERVAL)
+
+    async def stop(self) -> Optional[int]:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        return self.peak
+
+
+# ============ 单个需求 ============
+class RequirementRunner:
+    """在一个隔离的浏览器上下文（或标签页）中执行一个需求的全部步骤"""
+
+    def __init__(self, browser: 'AsyncBrowser', req_id: str, steps: List[Dict], precondition_steps: List[Dict]):
+        self.browser = browser
+        self.conn = browser.conn
+        self.module = browser.module
+        self.req_id = req_id
+        self.steps = steps
+        self.precondition_steps = precondition_steps
+        self.context_id: Optional[str] = None
+        self.windows: List[str] = []           # 该需求打开的页面（按打开顺序，对应 window_handles）
+        self.known_windows = set()
+        self.sessions: Dict[str, str] = {}     # targetId -> sessionId
+        self.monitors: Dict[str, _TabNetworkMonitor] = {}
+        self.active: Optional[str] = None
+        self.checkpoint: Optional[Dict] = None
+        self._opened = False
+        self.results: Dict[str, Dict] = {}
+
+    @property
+    def session_id(self) -> str:
+        return self.sessions[self.active]
+
+    @property
+    def monitor(self) -> _TabNetworkMonitor:
+        return self.monitors[self.active]
+
+    # ============ 页面与会话 ============
+    async def open(self):
+        if self.browser.isolation == 'context':
+            self.context_id = (await self.conn.send('Target.createBrowserContext', {'disposeOnDetach': True}))['browserContextId']
+        params = {'url': 'about:blank', 'width': WINDOW_SIZE[0], 'height': WINDOW_SIZE[1]}
+        if self.context_id:
+            params['browserContextId'] = self.context_id
+        target_id = (await self.conn.send('Target.createTarget', params))['targetId']
+        self.browser.claim(target_id, self)
+        self._add_window(target_id)
+        await self._activate(target_id)
+        self.known_windows.add(target_id)
+        await self.navigate(self.module.INITIAL_URL)
+
+    def _add_window(self, target_id: str):
+        if target_id not in self.windows:
+            self.windows.append(target_id)
+
+    async def adopt(self, target_id: str, session_id: str):
+        """自动附加的页面会话：启用事件、屏蔽请求后让页面继续加载，之后才可以切换到该页面"""
+        monitor = _TabNetworkMonitor()
+        self.monitors[target_id] = monitor
+        self._add_window(target_id)
+        self.conn.on(session_id, monitor.handle)
+        try:
+            await self.conn.send('Network.enable', session_id=session_id)
+            blocker = getattr(self.module, 'REQUEST_BLOCKER', None)
+            if blocker is not None and blocker.enabled:
+                await self.conn.send('Network.setBlockedURLs', {'urls': blocker.patterns}, session_id=session_id)
+            await self.conn.send('Page.enable', session_id=session_id)
+            # 后台标签页也按获得焦点处理（焦点事件、:focus样式和键盘输入）
+            await self.conn.send('Emulation.setFocusEmulationEnabled', {'enabled': True}, session_id=session_id)
+        except RuntimeError as e:
+            logging.debug(f"初始化页面会话失败: {e}")
+        finally:
+            await self.conn.send('Runtime.runIfWaitingForDebugger', session_id=session_id)
+            self.sessions[target_id] = session_id
+
+    def forget(self, target_id: str):
+        if target_id in self.windows:
+            self.windows.remove(target_id)
+        session_id = self.sessions.pop(target_id, None)
+        if session_id:
+            self.conn.off(session_id)
+        self.monitors.pop(target_id, None)
+
+    async def _activate(self, target_id: str, timeout: float = 10):
+        """切换当前页面（等待该页面的会话附加完成）"""
+        deadline = time.time() + timeout
+        while target_id not in self.sessions:
+            if time.time() >= deadline:
+                raise RuntimeError(f"页面会话附加超时: {target_id}")
+            await asyncio.sleep(POLL_INTERVAL)
+        self.active = target_id
+
+    async def close(self):
+        for target_id in list(self.windows):
+            try:
+                await self.conn.send('Target.closeTarget', {'targetId': target_id})
+            except RuntimeError:
+                pass
+        if self.context_id:
+            try:
+                await self.conn.send('Target.disposeBrowserContext', {'browserContextId': self.context_id})
+            except RuntimeError as e:
+                logging.debug(f"关闭浏览器上下文失败: {e}")
+
+    async def evaluate(self, expression: str, by_value: bool = True):
+        result = await self.conn.send('Runtime.evaluate', {
+            'expression': expression, 'returnByValue': by_value, 'awaitPromise': True
+        }, session_id=self.session_id)
+        if 'exceptionDetails' in result:
+            raise RuntimeError(result['exceptionDetails'].get('text', 'JavaScript执行失败'))
+        return result['result'] if not by_value else result['result'].get('value')
+
+    async def call(self, element: str, script: str, *args):
+        """以WebDriver execute_script 的方式调用脚本：arguments[0]为元素，其后为参数"""
+        result = await self.conn.send('Runtime.callFunctionOn', {
+            'functionDeclaration': f"function () {{ {script} }}",
+            'objectId': element,
+            'arguments': [{'objectId': element}] + [{'value': arg} for arg in args],
+            'returnByValue': True,
+            'awaitPromise': True,
+        }, session_id=self.session_id)
+        if 'exceptionDetails' in result:
+            raise RuntimeError(result['exceptionDetails'].get('text', 'JavaScript执行失败'))
+        return result['result'].get('value')
+
+    async def navigate(self, url: str):
+        await self.conn.send('Page.navigate', {'url': url}, session_id=self.session_id)
+        await self.wait_for_load()
+
+    async def wait_for_load(self, timeout: float = PAGE_LOAD_TIMEOUT):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                if await self.evaluate(READY_STATE_JS) == 'complete':
+                    return
+            except RuntimeError:
+                pass  # 导航过程中执行上下文被销毁
+            await asyncio.sleep(POLL_INTERVAL)
+        logging.warning(f"{self.req_id} 页面加载超时")
+
+    # ============ 查找元素 ============
+    async def _find_once(self, by_value: str, locator: str) -> Optional[str]:
+        try:
+            result = await self.evaluate(f"{FIND_ELEMENT_JS}({json.dumps(by_value)}, {json.dumps(locator)})",
+                                         by_value=False)
+        except RuntimeError:
+            return None
+        return result.get('objectId') if result.get('subtype') == 'node' else None
+
+    async def _wait_for_element(self, by_value: str, locator: str, timeout: float) -> Optional[str]:
+        deadline = time.time() + timeout
+        while True:
+            element = await self._find_once(by_value, locator)
+            if element or time.time() >= deadline:
+                return element
+            await asyncio.sleep(POLL_INTERVAL * 2)
+
+    async def find_element(self, step: Dict, timeout: float = 10) -> str:
+        """主定位器等待timeout秒（该步骤有指定或学习到的等待时间时使用它），之后每个备选定位器各等5秒；
+        都失败时切换到新打开的页面再找一次，仍找不到时按元素指纹自愈"""
+        from selenium.webdriver.common.by import By
+
+        timeout = self.module.BaseCtripFlight.step_timeout(step['test_case_id']) or timeout
+        locators = [(getattr(By, step['by_type'], step['by_type']), step['locator'], timeout)]
+        locators += [(getattr(By, alt_by.replace('By.', '')), alt_loc, min(5, timeout))
+                     for alt_by, alt_loc in step.get('alternative_locators', [])]
+        for by_value, locator, wait in locators:
+            element = await self._wait_for_element(by_value, locator, wait)
+            if element:
+                return element
+
+        if await self._switch_to_unseen_window():
+            return await self.find_element(step, timeout)
+
+        healer = getattr(self.module, 'HEALER', None)
+        if healer is not None and healer.enabled and step.get('fingerprint'):
+            # 与 BaseCtripFlight 相同的页面内打分；采用时按返回的唯一CSS定位器取回元素
+            result = await self.evaluate(f"(function () {{ {HEAL_JS} }})"
+                                         f"({json.dumps(step['fingerprint'])}, {healer.threshold}, {MIN_MARGIN})") or {}
+            if healer.record(result, step['fingerprint'], locators[0][0], step['locator']):
+                element = await self._find_once('css selector', result['locator'])
+                if element:
+                    return element
+        raise LookupError("无法找到元素: 主定位器和所有备选定位器均失败")
+
+    async def _switch_to_unseen_window(self, windows_before=None) -> bool:
+        new_windows = [w for w in self.windows if w not in (windows_before or self.known_windows)]
+        self.known_windows.update(self.windows)
+        if new_windows:
+            await self._activate(new_windows[0])
+            await self.wait_for_load()
+            return True
+        return False
+
+    # ============ 操作 ============
+    async def _mouse(self, event_type: str, x: float, y: float, click_count: int = 0):
+        params = {'type': event_type, 'x': x, 'y': y}
+        if event_type != 'mouseMoved':
+            params.update({'button': 'left', 'clickCount': click_count})
+        await self.conn.send('Input.dispatchMouseEvent', params, session_id=self.session_id)
+
+    async def _native_click(self, element: str):
+        """逐条操作的点击：滚动到视口中央后在元素中心按下鼠标；元素不可见时改用JS点击"""
+        center = await self.call(element, CENTER_JS)
+        if not center:
+            await self.call(element, "arguments[0].click();")
+            return
+        await self._mouse('mouseMoved', center['x'], center['y'])
+        await self._mouse('mousePressed', center['x'], center['y'], 1)
+        await self._mouse('mouseReleased', center['x'], center['y'], 1)
+
+    async def _click(self, element: str) -> Optional[set]:
+        """组合点击，失败时退回逐条点击；返回值为退回时点击前的页面集合（None表示组合点击成功）"""
+        result = await self.call(element, self.module.ACTION_JS, 'click') or {}
+        if result.get('status') == 'clicked':
+            self._opened = bool(result.get('opened'))
+            return None
+        windows_before = set(self.windows)
+        await self._native_click(element)
+        return windows_before
+
+    async def wait_for_network(self, wait_for: Optional[str], since: float, timeout: float = 15):
+        waiter = self.monitor.start_wait(wait_for, since=since, timeout=timeout)
+        while waiter.check() is None:
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def _type_text(self, element: str, text: str):
+        """清空后一次性插入文本；值不正确（控件只响应键盘事件）时清空后逐键输入"""
+        from input_engine import JS_CLEAR, READ_VALUE_JS
+
+        await self.call(element, JS_CLEAR)
+        await self.conn.send('Input.insertText', {'text': text}, session_id=self.session_id)
+        if await self.call(element, READ_VALUE_JS) == text:
+            return
+        await self.call(element, JS_CLEAR)
+        for char in text:
+            await self.conn.send('Input.dispatchKeyEvent', {'type': 'keyDown', 'text': char}, session_id=self.session_id)
+            await self.conn.send('Input.dispatchKeyEvent', {'type': 'keyUp'}, session_id=self.session_id)
+
+    async def _wait_for_calendar(self, element: str, previous_months: Optional[list] = None):
+        """与 date_picker 相同：打开日历或换月后等日历渲染完成（超时后照常重试）"""
+        from date_picker import CALENDAR_RENDER_TIMEOUT, SELECT_DATE_JS, calendar_rendered
+
+        deadline = time.time() + CALENDAR_RENDER_TIMEOUT
+        while time.time() < deadline:
+            if calendar_rendered(await self.call(element, SELECT_DATE_JS, '', True), previous_months):
+                return
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def _select_date(self, element: str, value: str):
+        from date_picker import MAX_MONTH_NAVIGATION, SELECT_DATE_JS, resolve_date
+
+        target = resolve_date(value)
+        opened = False
+        result = {}
+        for _ in range(MAX_MONTH_NAVIGATION + 1):
+            result = await self.call(element, SELECT_DATE_JS, target.isoformat()) or {}
+            status = result.get('status')
+            if status == 'clicked':
+                return
+            if status == 'navigated':
+                await self._wait_for_calendar(element, result.get('months'))
+                continue
+            if status == 'not_open' and not opened:
+                await self._click(element)
+                opened = True
+                await self._wait_for_calendar(element)
+                continue
+            if status == 'disabled':
+                raise LookupError(f"日期 {target.isoformat()} 在日历中不可选")
+            break
+        months = ', '.join(result.get('months', [])) or '无'
+        raise LookupError(f"日历中找不到日期 {target.isoformat()}（当前显示月份: {months}）")
+
+    async def execute_action(self, step: Dict):
+        """与 BaseCtripFlight.execute_action 相同的步骤语义"""
+        action_type = step['action_type']
+        wait_for = step.get('wait_for')
+        input_data = step.get('input_data') or None
+
+        if action_type == 'click':
+            element = await self.find_element(step)
+            since = time.time()
+            self._opened = False
+            windows_before = await self._click(element)
+            await self.wait_for_network(wait_for, since, timeout=15 if wait_for else 1)
+            if windows_before is not None or self._opened:
+                await self._switch_to_unseen_window(windows_before)
+
+        elif action_type == 'input':
+            element = await self.find_element(step, timeout=20)
+            await self._click(element)
+            since = time.time()
+            await self._type_text(element, input_data or '')
+            if wait_for:
+                await self.wait_for_network(wait_for, since)
+
+        elif action_type == 'select_date':
+            element = await self.find_element(step)
+            since = time.time()
+            await self._select_date(element, input_data)
+            await self.wait_for_network(wait_for, since, timeout=15 if wait_for else 1)
+
+        elif action_type == 'hover':
+            element = await self.find_element(step)
+            since = time.time()
+            result = await self.call(element, self.module.ACTION_JS, 'hover') or {}
+            if result.get('status') != 'ready':
+                result = await self.call(element, CENTER_JS) or {}
+            if result:
+                await self._mouse('mouseMoved', result['x'], result['y'])
+            await self.wait_for_network(wait_for, since, timeout=15 if wait_for else 1)
+
+        elif action_type == 'window_switch':
+            window_index = int(step['locator'].split('_')[1]) - 1
+            await self._activate(self.windows[window_index])
+            self.known_windows.update(self.windows)
+
+    # ============ 检查点 ============
+    async def take_checkpoint(self) -> Dict:
+        state = await self.evaluate(f"(function () {{ {self.module.CHECKPOINT_JS} }})()")
+        state['window'] = self.active
+        return state
+
+    async def restore_checkpoint(self, checkpoint: Dict):
+        if checkpoint['window'] in self.windows:
+            await self._activate(checkpoint['window'])
+        if await self.evaluate("location.href") != checkpoint['url']:
+            await self.navigate(checkpoint['url'])
+            await self.evaluate(f"(function () {{ {self.module.RESTORE_STORAGE_JS} }})"
+                                f".apply(null, [{json.dumps(checkpoint, ensure_ascii=False)}])")
+            await self.conn.send('Page.reload', session_id=self.session_id)
+            await self.wait_for_load()
+
+    # ============ 执行 ============
+    async def run(self) -> Dict[str, Dict]:
+        try:
+            await self.open()
+        except Exception as e:
+            self._mark(self.precondition_steps + self.steps, 'failed', f"打开页面失败: {e}")
+            return self.results
+
+        aborted_by = None
+        for step in self.precondition_steps:
+            start = time.time()
+            try:
+                await self.execute_action(step)
+            except Exception as e:
+                self._record(step, 'failed', str(e), start)
+                aborted_by = "前置步骤"
+                break
+            self._record(step, 'passed', '', start)
+        if aborted_by is None:
+            self.checkpoint = await self._safe_checkpoint()
+
+        for step in self.steps:
+            if aborted_by:
+                self._mark([step], 'skipped', f"{aborted_by} 失败，跳过该需求的剩余步骤")
+                continue
+            start = time.time()
+            try:
+                await self.execute_action(step)
+            except Exception as first_error:
+                if self.checkpoint is None or not await self._retry(step):
+                    self._record(step, 'failed', str(first_error), start)
+                    aborted_by = step['test_case_id']
+                    continue
+            self._record(step, 'passed', '', start)
+            self.checkpoint = await self._safe_checkpoint()
+        return self.results
+
+    async def _retry(self, step: Dict) -> bool:
+        try:
+            await self.restore_checkpoint(self.checkpoint)
+            await self.execute_action(step)
+            return True
+        except Exception:
+            return False
+
+    async def _safe_checkpoint(self) -> Optional[Dict]:
+        try:
+            return await self.take_checkpoint()
+        except Exception as e:
+            logging.debug(f"{self.req_id} 记录检查点失败: {e}")
+            return None
+
+    def _record(self, step: Dict, status: str, error: str, start: float):
+        duration = time.time() - start
+        self.results[step['test_case_id']] = {'status': status, 'error': error, 'duration': duration}
+        mark = '✓' if status == 'passed' else '✗'
+        print(f"  {mark} [{self.req_id}] {step['test_case_id']} {step['test_name']} ({duration:.2f}s)"
+              + (f": {error}" if error else ""))
+
+    def _mark(self, steps: List[Dict], status: str, error: str):
+        for step in steps:
+            self.results.setdefault(step['test_case_id'], {'status': status, 'error': error, 'duration': 0.0})
+
+
+# ============ 浏览器 ============
+class AsyncBrowser:
+    """一个Chrome中的全部需求：浏览器级会话负责自动附加新页面并分派给所属的需求"""
+
+    def __init__(self, conn: AsyncCdpConnection, module, isolation: str = 'context'):
+        self.conn = conn
+        self.module = module
+        self.isolation = isolation
+        self.owners: Dict[str, RequirementRunner] = {}  # targetId -> 需求
+        self._runners: List[RequirementRunner] = []
+        self._early: Dict[str, str] = {}  # createTarget返回前就已附加的页面 targetId -> sessionId
+
+    @classmethod
+    async def connect(cls, ws_url: str, module, isolation: str = 'context') -> 'AsyncBrowser':
+        browser = cls(await AsyncCdpConnection.connect(ws_url), module, isolation)
+        browser.conn.on(None, browser._handle_event)
+        # 新页面（包括点击打开的标签页）先暂停，附加会话并启用网络事件后再继续，不遗漏页面最初的请求
+        await browser.conn.send('Target.setAutoAttach', {
+            'autoAttach': True, 'waitForDebuggerOnStart': True, 'flatten': True
+        })
+        return browser
+
+    def _owner(self, info: dict) -> Optional[RequirementRunner]:
+        owner = self.owners.get(info['targetId']) or self.owners.get(info.get('openerId'))
+        if owner is None and info.get('browserContextId'):
+            owner = next((r for r in self._runners if r.context_id == info['browserContextId']), None)
+        return owner
+
+    def _handle_event(self, method: str, params: dict):
+        if method == 'Target.attachedToTarget':
+            info = params['targetInfo']
+            if info['type'] != 'page':
+                asyncio.ensure_future(self._resume(params['sessionId']))
+                return
+            owner = self._owner(info)
+            if owner is None:
+                self._early[info['targetId']] = params['sessionId']
+                return
+            self.owners[info['targetId']] = owner
+            asyncio.ensure_future(owner.adopt(info['targetId'], params['sessionId']))
+        elif method == 'Target.detachedFromTarget' and params.get('targetId'):
+            owner = self.owners.pop(params['targetId'], None)
+            if owner is not None:
+                owner.forget(params['targetId'])
+
+    async def _resume(self, session_id: str):
+        try:
+            await self.conn.send('Runtime.runIfWaitingForDebugger', session_id=session_id)
+        except RuntimeError:
+            pass
+
+    def register(self, runner: RequirementRunner):
+        self._runners.append(runner)
+
+    def claim(self, target_id: str, runner: RequirementRunner):
+        """登记需求新建的页面；附加事件在createTarget返回前就已到达时在此补上"""
+        self.owners[target_id] = runner
+        session_id = self._early.pop(target_id, None)
+        if session_id is not None:
+            asyncio.ensure_future(runner.adopt(target_id, session_id))
+
+    def close(self):
+        self.conn.close()
+
+
+async def run_requirements(ws_url: str, module, requirements: Dict[str, List[Dict]],
+                           precondition_steps: List[Dict], concurrency: int = DEFAULT_CONCURRENCY,
+                           isolation: str = 'context') -> Dict[str, Dict]:
+    """在同一个Chrome中并发执行多个需求，最多同时运行concurrency个"""
+    browser = await AsyncBrowser.connect(ws_url, module, isolation)
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+    results: Dict[str, Dict] = {}
+
+    async def run_one(req_id: str, steps: List[Dict]):
+        async with semaphore:
+            runner = RequirementRunner(browser, req_id, steps, precondition_steps)
+            browser.register(runner)
+            print(f"▶ {req_id} 开始（{len(steps)} 个步骤）")
+            start = time.time()
+            try:
+                for test_case_id, result in (await runner.run()).items():
+                    # 前置步骤编号在各需求间共用：保留失败的结果
+                    if results.get(test_case_id, {}).get('status') != 'failed':
+                        results[test_case_id] = result
+            finally:
+                await runner.close()
+            print(f"■ {req_id} 完成 ({time.time() - start:.1f}s)")
+
+    try:
+        await asyncio.gather(*(run_one(req_id, steps) for req_id, steps in requirements.items()))
+    finally:
+        browser.close()
+    return results
+
+
+# ============ 运行与基准测试 ============
+async def run_in_one_browser(module, requirements: Dict[str, List[Dict]], precondition_steps: List[Dict],
+                             concurrency: int, isolation: str, headless: bool) -> Dict:
+    """启动一个Chrome，并发执行全部需求（计时包含Chrome启动）"""
+    start = time.time()
+    chrome = ChromeProcess(headless)
+    sampler = MemorySampler([chrome.pid])
+    sampler.start()
+    try:
+        results = await run_requirements(chrome.ws_url, module, requirements, precondition_steps,
+                                         concurrency, isolation)
+    finally:
+        peak = await sampler.stop()
+        chrome.close()
+    return {'results': results, 'seconds': time.time() - start, 'peak_bytes': peak, 'processes': 1}
+
+
+async def run_process_per_requirement(module, requirements: Dict[str, List[Dict]],
+                                      precondition_steps: List[Dict], headless: bool) -> Dict:
+    """对照组：每个需求一个Chrome进程，全部并行"""
+    start = time.time()
+    chromes = []
+    try:
+        for _ in requirements:
+            chromes.append(ChromeProcess(headless))
+        sampler = MemorySampler([chrome.pid for chrome in chromes])
+        sampler.start()
+        try:
+            outcomes = await asyncio.gather(*(
+                run_requirements(chrome.ws_url, module, {req_id: steps}, precondition_steps, 1, 'tab')
+                for chrome, (req_id, steps) in zip(chromes, requirements.items())
+            ))
+        finally:
+            peak = await sampler.stop()
+    finally:
+        for chrome in chromes:
+            chrome.close()
+    results: Dict[str, Dict] = {}
+    for outcome in outcomes:
+        results.update(outcome)
+    return {'results': results, 'seconds': time.time() - start, 'peak_bytes': peak, 'processes': len(chromes)}
+
+
+def passed_requirements(results: Dict[str, Dict], requirements: Dict[str, List[Dict]]) -> int:
+    return sum(
+        1 for steps in requirements.values()
+        if steps and all(results.get(step['test_case_id'], {}).get('status') == 'passed' for step in steps)
+    )
+
+
+def throughput(run: Dict, requirement_count: int) -> Dict:
+    """每分钟完成的需求数，以及按峰值内存折算的每GB吞吐量"""
+    per_minute = requirement_count / run['seconds'] * 60 if run['seconds'] else 0.0
+    peak_gb = run['peak_bytes'] / (1024 ** 3) if run['peak_bytes'] else None
+    return {'per_minute': per_minute, 'peak_gb': peak_gb, 'per_minute_per_gb': per_minute / peak_gb if peak_gb else None}
+
+
+def print_results(results: Dict[str, Dict]):
+    counts = {'passed': 0, 'failed': 0, 'skipped': 0}
+    for result in results.values():
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    print(f"\n{'='*80}")
+    print(f"执行完成: 通过 {counts['passed']}, 失败 {counts['failed']}, 跳过 {counts['skipped']}")
+    print(f"{'='*80}")
+
+
+def print_benchmark(runs: Dict[str, Dict], requirements: Dict[str, List[Dict]]):
+    print(f"\n{'='*80}")
+    print(f"吞吐量对比（{len(requirements)} 个需求）")
+    print(f"{'='*80}")
+    print(f"  {'方式':<24}{'进程':>6}{'耗时(s)':>10}{'通过需求':>10}{'峰值内存(MB)':>14}{'需求/分钟':>12}{'需求/分钟/GB':>14}")
+    for label, run in runs.items():
+        stats = throughput(run, len(requirements))
+        memory = f"{stats['peak_gb'] * 1024:.0f}" if stats['peak_gb'] else '-'
+        per_gb = f"{stats['per_minute_per_gb']:.2f}" if stats['per_minute_per_gb'] is not None else '-'
+        print(f"  {label:<24}{run['processes']:>6}{run['seconds']:>10.1f}"
+              f"{passed_requirements(run['results'], requirements):>10}{memory:>14}"
+              f"{stats['per_minute']:>12.2f}{per_gb:>14}")
+    print(f"{'='*80}")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="单浏览器多标签页并发执行器")
+    parser.add_argument('--script', default='TestCtripFlight.py', help="生成的测试脚本路径")
+    parser.add_argument('--requirements', nargs='*', help="只运行这些需求（如 R001 R003）")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="同时运行的需求数")
+    parser.add_argument('--isolation', choices=['context', 'tab'], default='context',
+                        help="context=每个需求独立的浏览器上下文；tab=共用默认上下文")
+    parser.add_argument('--headless', action='store_true', help="无界面运行Chrome")
+    parser.add_argument('--benchmark', action='store_true', help="与每个需求一个Chrome进程对比吞吐量")
+    parser.add_argument('--json', dest='json_file', help="把运行结果写入JSON文件")
+    args = parser.parse_args(argv)
+
+    module = load_test_module(args.script)
+    precondition_steps, requirements = load_step_tables(module)
+    if args.requirements:
+        requirements = {req_id: steps for req_id, steps in requirements.items() if req_id in args.requirements}
+    if not requirements:
+        print("没有可运行的需求")
+        return 1
+
+    print(f"\n{'='*80}")
+    print(f"并发执行 {len(requirements)} 个需求（并发数 {args.concurrency}，隔离方式 {args.isolation}）")
+    print(f"{'='*80}")
+    runs = {f"单浏览器（{args.isolation}）": asyncio.run(run_in_one_browser(
+        module, requirements, precondition_steps, args.concurrency, args.isolation, args.headless))}
+    print_results(next(iter(runs.values()))['results'])
+
+    if args.benchmark:
+        print("\n对照组：每个需求一个Chrome进程")
+        runs["每个需求一个进程"] = asyncio.run(run_process_per_requirement(
+            module, requirements, precondition_steps, args.headless))
+        print_results(runs["每个需求一个进程"]['results'])
+        print_benchmark(runs, requirements)
+
+    if args.json_file:
+        with open(args.json_file, 'w', encoding='utf-8') as f:
+            json.dump({label: dict(run, throughput=throughput(run, len(requirements))) for label, run in runs.items()},
+                      f, ensure_ascii=False, indent=2)
+    results = next(iter(runs.values()))['results']
+    return 0 if results and all(r['status'] == 'passed' for r in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""
+常驻浏览器守护进程
+
+每次运行pytest或启动录制工具都要冷启动Chrome，在CI机器上每次要花好几秒。
+守护进程在本机常驻一个开启远程调试端口的Chrome，测试运行和录制工具通过调试地址
+（debugger address）连接到它，冷启动只需在每台机器上付出一次。
+
+- 健康检查：访问 http://127.0.0.1:<端口>/json/version
+- 自动重启：连接前健康检查失败时清理残留进程并重新启动
+- 状态重置：每次连接时关闭多余窗口、清空Cookie/缓存和上次会话访问过的站点存储
+
+用法:
+  python browser_daemon.py start      # 启动守护进程
+  python browser_daemon.py status     # 查看状态
+  python browser_daemon.py stop       # 停止守护进程
+  python browser_daemon.py restart
+
+  # 让生成的测试脚本连接守护进程中的浏览器
+  CTRIP_BROWSER_DAEMON=1 pytest TestCtripFlight.py -v
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import List
+from urllib.parse import urlparse
+
+from driver_resolver import find_chrome_binary
+
+
+DEFAULT_PORT = int(os.environ.get('CTRIP_BROWSER_DAEMON_PORT', '9222'))
+STATE_FILE = os.path.join(tempfile.gettempdir(), 'ctrip_browser_daemon.json')
+PROFILE_DIR = os.path.join(tempfile.gettempdir(), 'ctrip_browser_daemon_profile')
+STARTUP_TIMEOUT = 20
+
+
+class BrowserDaemon:
+    """常驻Chrome进程的管理与连接"""
+
+    def __init__(self, port: int = DEFAULT_PORT, chrome_binary: str = None,
+                 profile_dir: str = PROFILE_DIR, state_file: str = STATE_FILE):
+        self.port = port
+        self.chrome_binary = chrome_binary
+        self.profile_dir = profile_dir
+        self.state_file = state_file
+
+    @property
+    def debugger_address(self) -> str:
+        return f"127.0.0.1:{self.port}"
+
+    # ============ 状态文件 ============
+    def _read_state(self) -> dict:
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_state(self, state: dict):
+        with open(self.state_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+
+    # ============ 生命周期 ============
+    def is_healthy(self, timeout: float = 1.0) -> bool:
+        """健康检查：调试端口能返回浏览器版本信息即视为健康"""
+        try:
+            with urllib.request.urlopen(f"http://{self.debugger_address}/json/version", timeout=timeout) as resp:
+                return resp.status == 200 and 'Browser' in json.loads(resp.read().decode('utf-8'))
+        except Exception:
+            return False
+
+    def start(self) -> bool:
+        """启动常驻Chrome（已健康运行时直接返回）"""
+        if self.is_healthy():
+            return True
+
+        chrome_binary = self.chrome_binary or find_chrome_binary()
+        if not chrome_binary:
+            logging.error("未找到Chrome浏览器，请通过环境变量 CHROME_BINARY 指定路径")
+            return False
+
+        args = [
+            chrome_binary,
+            f"--remote-debugging-port={self.port}",
+            f"--user-data-dir={self.profile_dir}",
+            "--no-first-run",
+            "--no-default-browser-check",
+            "--start-maximized",
+            "about:blank",
+        ]
+        if os.environ.get('CTRIP_BROWSER_DAEMON_HEADLESS') == '1':
+            args.insert(1, "--headless=new")
+
+        popen_kwargs = {'stdout': subprocess.DEVNULL, 'stderr': subprocess.DEVNULL}
+        if sys.platform == 'win32':
+            popen_kwargs['creationflags'] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            popen_kwargs['start_new_session'] = True
+        process = subprocess.Popen(args, **popen_kwargs)
+
+        deadline = time.time() + STARTUP_TIMEOUT
+        while time.time() < deadline:
+            if self.is_healthy():
+                state = self._read_state()
+                state.update({'pid': process.pid, 'port': self.port, 'started_at': time.time()})
+                self._write_state(state)
+                return True
+            if process.poll() is not None:
+                break
+            time.sleep(0.2)
+
+        logging.error(f"浏览器守护进程启动失败（端口 {self.port}）")
+        return False
+
+    def stop(self):
+        """停止常驻Chrome并清理状态文件"""
+        pid = self._read_state().get('pid')
+        if pid:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+        try:
+            os.remove(self.state_file)
+        except OSError:
+            pass
+
+    def ensure_running(self) -> bool:
+        """连接前确认守护进程可用，不可用时自动重启"""
+        if self.is_healthy():
+            return True
+        if self._read_state():
+            print("⚠ 浏览器守护进程无响应，正在重启...")
+            self.stop()
+        return self.start()
+
+    # ============ 连接与重置 ============
+    def attach(self, service=None, options=None):
+        """连接到守护进程中的浏览器，返回已重置状态的WebDriver（options中的启动参数对已运行的浏览器无效）"""
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+
+        if not self.ensure_running():
+            raise RuntimeError("浏览器守护进程不可用")
+
+        options = options or Options()
+        options.debugger_address = self.debugger_address
+        driver = webdriver.Chrome(service=service, options=options) if service else webdriver.Chrome(options=options)
+        driver.browser_daemon = self
+        self.reset(driver)
+        return driver
+
+    def reset(self, driver):
+        """重置浏览器状态：只保留一个空白标签页，清空Cookie、缓存和上次访问过的站点存储"""
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            try:
+                driver.switch_to.window(handle)
+                driver.close()
+            except Exception as e:
+                logging.debug(f"关闭多余窗口失败: {e}")
+        driver.switch_to.window(handles[0])
+        driver.get("about:blank")
+
+        try:
+            driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+            driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+            for origin in self._read_state().get('visited_origins', []):
+                driver.execute_cdp_cmd('Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': 'all'})
+        except Exception as e:
+            logging.warning(f"重置浏览器状态失败: {e}")
+
+    def detach(self, driver):
+        """断开与守护进程浏览器的会话（浏览器保持运行），并记录本次会话访问过的站点"""
+        origins = set(self._read_state().get('visited_origins', []))
+        try:
+            for handle in driver.window_handles:
+                driver.switch_to.window(handle)
+                parsed = urlparse(driver.current_url)
+                if parsed.scheme in ('http', 'https'):
+                    origins.add(f"{parsed.scheme}://{parsed.netloc}")
+        except Exception as e:
+            logging.debug(f"读取访问过的站点失败: {e}")
+
+        state = self._read_state()
+        state['visited_origins'] = sorted(origins)
+        self._write_state(state)
+
+        try:
+            # 连接已有浏览器时，quit只结束chromedriver会话，不会关闭浏览器
+            driver.quit()
+        except Exception:
+            pass
+
+    def status(self) -> dict:
+        state = self._read_state()
+        state['healthy'] = self.is_healthy()
+        state['debugger_address'] = self.debugger_address
+        return state
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="常驻浏览器守护进程")
+    parser.add_argument('command', choices=['start', 'stop', 'restart', 'status'])
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="远程调试端口")
+    args = parser.parse_args(argv)
+
+    daemon = BrowserDaemon(port=args.port)
+    if args.command in ('stop', 'restart'):
+        daemon.stop()
+        print("浏览器守护进程已停止")
+    if args.command in ('start', 'restart'):
+        if not daemon.start():
+            return 1
+        print(f"✓ 浏览器守护进程已启动: {daemon.debugger_address}")
+    if args.command == 'status':
+        status = daemon.status()
+        print(f"{'✓ 运行中' if status['healthy'] else '✗ 未运行'}: {status['debugger_address']}")
+        if status.get('pid'):
+            print(f"  进程ID: {status['pid']}")
+        return 0 if status['healthy'] else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
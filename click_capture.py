@@ -0,0 +1,169 @@
+"""
+页面内操作捕获
+
+原来录制一个步骤要先输入元素的可见文本，再由 find_and_click_element 执行XPath搜索，匹配到多个元素时还要从列表中选择。
+捕获模式直接在浏览器中操作：
+- 注入到每个页面（包括之后跳转到的页面和新打开的标签页）的监听脚本在捕获阶段拦截操作人员的真实操作：
+  点击、输入（输入框失去焦点时的最终值）、悬浮（鼠标停在元素上时按 Alt 键）
+- 脚本在页面内一次性读取元素属性、完整CSS路径和元素指纹（定位器都失效时用于自愈），Python端只按录制工具原有的规则组合定位器，不再逐个属性往返
+- 事件通过 DevTools 的 Runtime.addBinding 推送到Python端的队列；绑定和脚本注册在DevTools会话上，页面跳转后依然有效
+- 只记录用户真实触发的事件（isTrusted），页面脚本模拟的点击不会被记录
+
+用法（录制工具中输入'捕获'进入捕获模式，Ctrl+C 退出）:
+  capture = ClickCapture(driver)
+  event = capture.next_event(timeout=0.5)   # {'type': 'click'|'input'|'hover', 'attributes': {...}, 'css_path': ..., 'fingerprint': {...}, 'target_id': ...}
+  capture.stop()
+"""
+
+import json
+import logging
+import queue
+import threading
+from typing import Dict, Optional
+
+from element_fingerprint import FINGERPRINT_FUNCTION_JS
+from locator_pipeline import SNAPSHOT_FUNCTION_JS
+from network_replay import CdpConnection, browser_websocket_url
+
+
+BINDING_NAME = '__ctripCapture'
+
+# 元素属性与完整CSS路径与录制工具点击前的元素快照（locator_pipeline）共用同一个函数；元素指纹与 element_fingerprint 共用同一个函数
+CAPTURE_JS = FINGERPRINT_FUNCTION_JS + SNAPSHOT_FUNCTION_JS + """
+(function () {
+    if (window.__ctripCaptureInstalled) { return; }
+    window.__ctripCaptureInstalled = true;
+
+    var pointed = null;
+
+    function send(event) {
+        if (typeof window.__ctripCapture === 'function') {
+            window.__ctripCapture(JSON.stringify(event));
+        }
+    }
+
+    // 图标等没有文本和属性的元素改为记录外层可交互的元素
+    function meaningful(el) {
+        var svg = el.closest && el.closest('svg');
+        if (svg) { el = svg.parentElement || el; }
+        if ((el.innerText || '').trim() || el.id || el.getAttribute('name')) { return el; }
+        return el.closest('a, button, [role=button], label, li') || el;
+    }
+
+    function isTextInput(el) {
+        if (el.tagName === 'TEXTAREA' || el.isContentEditable) { return true; }
+        return el.tagName === 'INPUT' && !/^(checkbox|radio|button|submit|reset|image|file)$/i.test(el.type);
+    }
+
+    function capture(type, el, extra) {
+        var started = performance.now();
+        var snapshot = __ctripSnapshot(el);
+        var event = {type: type, attributes: snapshot.attributes, css_path: snapshot.css_path,
+                     fingerprint: __ctripFingerprint(el), url: location.href};
+        for (var key in extra) { event[key] = extra[key]; }
+        event.duration_ms = Math.round((performance.now() - started) * 10) / 10;
+        send(event);
+    }
+
+    document.addEventListener('click', function (e) {
+        if (!e.isTrusted || !(e.target instanceof Element)) { return; }
+        // 输入框的点击由输入步骤完成
+        if (isTextInput(e.target)) { return; }
+        capture('click', meaningful(e.target), {});
+    }, true);
+
+    document.addEventListener('change', function (e) {
+        if (!e.isTrusted || !(e.target instanceof Element) || !isTextInput(e.target)) { return; }
+        capture('input', e.target, {value: e.target.value});
+    }, true);
+
+    document.addEventListener('mouseover', function (e) {
+        if (e.target instanceof Element) { pointed = e.target; }
+    }, true);
+
+    document.addEventListener('keydown', function (e) {
+        if (e.isTrusted && e.key === 'Alt' && !e.repeat && pointed) {
+            capture('hover', meaningful(pointed), {});
+        }
+    }, true);
+})();
+"""
+
+
+class ClickCapture:
+    """附加到WebDriver所控制的浏览器上，把所有页面中的真实操作推送到队列"""
+
+    def __init__(self, driver):
+        self.events: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, str] = {}  # targetId -> sessionId
+        self.connection = CdpConnection(browser_websocket_url(driver), self._handle_event)
+
+        # 新打开的标签页先暂停，注入监听脚本后再继续
+        self.connection.send('Target.setAutoAttach', {
+            'autoAttach': True, 'waitForDebuggerOnStart': True, 'flatten': True
+        })
+        for target in self.connection.send('Target.getTargets')['targetInfos']:
+            if target['type'] == 'page' and target['targetId'] not in self._sessions:
+                session_id = self.connection.send('Target.attachToTarget', {
+                    'targetId': target['targetId'], 'flatten': True
+                })['sessionId']
+                self._install(target['targetId'], session_id, current_document=True)
+
+    def _install(self, target_id: str, session_id: str, current_document: bool = False):
+        """在页面会话上注册绑定和监听脚本（每个页面只保留一个会话）"""
+        with self._lock:
+            existing = self._sessions.get(target_id)
+            if existing is None:
+                self._sessions[target_id] = session_id
+        if existing is not None:
+            if existing != session_id:
+                self._resume(session_id)
+                self.connection.send('Target.detachFromTarget', {'sessionId': session_id})
+            return
+
+        self.connection.send('Runtime.addBinding', {'name': BINDING_NAME}, session_id=session_id)
+        self.connection.send('Page.addScriptToEvaluateOnNewDocument', {'source': CAPTURE_JS}, session_id=session_id)
+        if current_document:
+            self.connection.send('Runtime.evaluate', {'expression': CAPTURE_JS}, session_id=session_id)
+        self._resume(session_id)
+
+    def _resume(self, session_id: str):
+        try:
+            self.connection.send('Runtime.runIfWaitingForDebugger', session_id=session_id)
+        except RuntimeError:
+            pass
+
+    def _handle_event(self, method: str, params: dict, session_id: Optional[str]):
+        if method == 'Target.attachedToTarget':
+            if params['targetInfo']['type'] == 'page':
+                self._install(params['targetInfo']['targetId'], params['sessionId'])
+            else:
+                self._resume(params['sessionId'])
+        elif method == 'Runtime.bindingCalled' and params.get('name') == BINDING_NAME:
+            try:
+                event = json.loads(params['payload'])
+            except ValueError:
+                return
+            with self._lock:
+                event['target_id'] = next(
+                    (target for target, session in self._sessions.items() if session == session_id), None
+                )
+            self.events.put(event)
+
+    def next_event(self, timeout: float = 0.5) -> Optional[dict]:
+        """取出下一个捕获的操作（超时返回None，便于调用方响应Ctrl+C）"""
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stop(self):
+        """断开DevTools会话（注册在会话上的绑定和脚本随之失效）"""
+        try:
+            self.connection.send('Target.setAutoAttach', {'autoAttach': False, 'waitForDebuggerOnStart': False})
+            for session_id in list(self._sessions.values()):
+                self.connection.send('Target.detachFromTarget', {'sessionId': session_id})
+        except Exception as e:
+            logging.debug(f"断开捕获会话失败: {e}")
+        self.connection.close()
@@ -0,0 +1,203 @@
+"""
+语义化日期选择
+
+录制得到的日历单元格定位器是一长串 nth-child 路径，对应的日期是录制当天随手点的，
+日历换月或布局微调后就会失效，还要白白等完所有备选定位器的超时。
+
+select_date 动作改为按真实日期选择：
+- 输入数据是日期：2026-10-26 / 2026/10/26，或相对今天的天数 +7
+- 一次浏览器调用完成：读取日历中单元格携带的日期数据（data-date 等属性），
+  没有日期属性时按"YYYY年M月"月份标题定位到对应月份面板再找日期数字
+- 目标月份未显示时点击上一月/下一月按钮，等显示的月份变化（日历异步渲染）后重试；
+  点击输入框打开日历后同样先等日历渲染出来
+- 定位器可以是日期输入框（在整个页面中查找已打开的日历，日历未打开时先点击输入框）或日历容器
+"""
+
+import re
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from selenium.common.exceptions import NoSuchElementException
+
+
+MAX_MONTH_NAVIGATION = 12
+CALENDAR_RENDER_TIMEOUT = 3  # 打开日历或换月后等待日历渲染的最长秒数
+
+SELECT_DATE_JS = """
+    var root = arguments[0], target = arguments[1];
+    var probe = arguments[2];  // 只读取日历当前显示的月份和日期单元格数量，不点击
+    var parts = target.split('-');
+    var year = +parts[0], month = +parts[1], day = +parts[2];
+
+    function visible(el) { return !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length); }
+    function disabled(el, stop) {
+        for (var n = el; n && n !== stop; n = n.parentElement) {
+            if (/disable|forbid|invalid|gray|grey/i.test(typeof n.className === 'string' ? n.className : '')
+                || n.getAttribute('aria-disabled') === 'true') { return true; }
+        }
+        return false;
+    }
+    function normalize(value) {
+        if (!value) { return null; }
+        if (/^\\d{10,13}$/.test(value)) {
+            var t = new Date(value.length === 10 ? value * 1000 : +value);
+            return [t.getFullYear(), t.getMonth() + 1, t.getDate()];
+        }
+        var m = value.match(/^(\\d{4})[-\\/.](\\d{1,2})[-\\/.](\\d{1,2})/);
+        return m ? [+m[1], +m[2], +m[3]] : null;
+    }
+    function click(el) {
+        el.scrollIntoView({block: 'center'});
+        el.click();
+        return {status: 'clicked'};
+    }
+
+    // 日期输入框：在整个页面中查找已打开的日历
+    var scope = (root && root.tagName !== 'INPUT') ? root : document.body;
+
+    // 1. 单元格自带日期数据
+    var attrs = ['data-date', 'data-day', 'data-value', 'data-time', 'date'];
+    var cells = scope.querySelectorAll('[' + attrs.join('],[') + ']');
+    var dated = 0;
+    for (var i = 0; i < cells.length; i++) {
+        for (var a = 0; a < attrs.length; a++) {
+            var d = normalize(cells[i].getAttribute(attrs[a]));
+            if (d && probe) {
+                if (visible(cells[i])) { dated++; }
+                break;
+            }
+            if (d && d[0] === year && d[1] === month && d[2] === day && visible(cells[i])) {
+                if (disabled(cells[i], scope)) { return {status: 'disabled'}; }
+                return click(cells[i]);
+            }
+        }
+    }
+
+    // 2. 按月份标题定位月份面板
+    var walker = document.createTreeWalker(scope, NodeFilter.SHOW_TEXT);
+    var panels = [];
+    while (walker.nextNode()) {
+        var text = walker.currentNode.nodeValue.trim();
+        var m = text.match(/^(\\d{4})\\s*年\\s*(\\d{1,2})\\s*月$/) || text.match(/^(\\d{4})[-\\/.](\\d{1,2})$/);
+        var header = walker.currentNode.parentElement;
+        if (!m || !visible(header)) { continue; }
+        // 向上找到包含整月日期数字的面板
+        for (var panel = header; panel && panel !== scope.parentElement; panel = panel.parentElement) {
+            var numbers = 0;
+            var leaves = panel.querySelectorAll('*');
+            for (var k = 0; k < leaves.length && numbers < 28; k++) {
+                if (!leaves[k].children.length && /^\\d{1,2}$/.test(leaves[k].textContent.trim())) { numbers++; }
+            }
+            if (numbers >= 28) {
+                // 月份标题在公共表头中时多个月份会找到同一个面板，按标题顺序取第几次出现的日期
+                var order = panels.filter(function (x) { return x.panel === panel; }).length;
+                panels.push({year: +m[1], month: +m[2], panel: panel, order: order});
+                break;
+            }
+        }
+    }
+    var months = panels.map(function (x) { return x.year + '-' + x.month; });
+    if (probe) { return {months: months, dated: dated}; }
+    if (!panels.length) { return {status: 'not_open'}; }
+
+    for (var p = 0; p < panels.length; p++) {
+        if (panels[p].year !== year || panels[p].month !== month) { continue; }
+        // 跳过置灰的单元格（相邻月份的补位日期、已过去的日期）
+        var candidates = panels[p].panel.querySelectorAll('*');
+        var skip = panels[p].order, greyed = false;
+        for (var c = 0; c < candidates.length; c++) {
+            var el = candidates[c];
+            if (el.children.length || el.textContent.trim() !== String(day) || !visible(el)) { continue; }
+            if (disabled(el, panels[p].panel)) { greyed = true; continue; }
+            if (skip-- === 0) { return click(el); }
+        }
+        return greyed ? {status: 'disabled'} : {status: 'not_found', months: [year + '-' + month]};
+    }
+
+    // 3. 目标月份未显示：点击上一月/下一月
+    var first = panels[0], last = panels[panels.length - 1];
+    var forward = (year * 12 + month) > (last.year * 12 + last.month);
+    var pattern = forward ? /next|right|forward|后|下/i : /prev|left|back|前|上/i;
+    var container = first.panel.parentElement || scope;
+    for (var level = 0; level < 4 && container; level++, container = container.parentElement) {
+        var buttons = container.querySelectorAll('a, button, i, span, div');
+        for (var b = 0; b < buttons.length; b++) {
+            var btn = buttons[b];
+            var label = (typeof btn.className === 'string' ? btn.className : '') + ' ' + (btn.getAttribute('aria-label') || '');
+            if (btn.children.length <= 1 && pattern.test(label) && /month|arrow|btn|icon|page|nav/i.test(label) && visible(btn)) {
+                btn.click();
+                return {status: 'navigated', months: months};
+            }
+        }
+    }
+    return {status: 'not_found', months: months};
+"""
+
+
+def resolve_date(value: str, today: Optional[date] = None) -> date:
+    """把输入数据解析为日期：+N/-N 表示相对今天的天数，否则按 YYYY-MM-DD 解析"""
+    value = (value or '').strip()
+    today = today or date.today()
+    if re.fullmatch(r'[+-]\d+', value):
+        return today + timedelta(days=int(value))
+    try:
+        return datetime.strptime(value.replace('/', '-').replace('.', '-'), '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f"无法识别的日期: {value!r}（支持 YYYY-MM-DD 或 +N）")
+
+
+def calendar_rendered(state: Optional[dict], previous_months: Optional[list] = None) -> bool:
+    """按 SELECT_DATE_JS 的只读结果判断日历是否渲染完成：
+    打开后出现月份面板或日期单元格；换月后显示的月份与换月前不同"""
+    state = state or {}
+    months = state.get('months') or []
+    if previous_months is None:
+        return bool(months or state.get('dated'))
+    return bool(months) and months != previous_months
+
+
+def _wait_for_calendar(driver, element, previous_months=None, timeout: float = CALENDAR_RENDER_TIMEOUT):
+    """等待日历渲染（超时后照常重试）"""
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+            lambda d: calendar_rendered(d.execute_script(SELECT_DATE_JS, element, '', True), previous_months)
+        )
+    except TimeoutException:
+        pass
+
+
+def select_date(driver, element, value: str) -> date:
+    """
+    在日期选择器中选择日期
+
+    Args:
+        element: 日期输入框或日历容器
+        value: 日期（YYYY-MM-DD）或相对今天的天数（+N）
+
+    Returns:
+        实际选择的日期
+    """
+    target = resolve_date(value)
+    opened = False
+    for _ in range(MAX_MONTH_NAVIGATION + 1):
+        result = driver.execute_script(SELECT_DATE_JS, element, target.isoformat()) or {}
+        status = result.get('status')
+        if status == 'clicked':
+            return target
+        if status == 'navigated':
+            _wait_for_calendar(driver, element, previous_months=result.get('months'))
+            continue
+        if status == 'not_open' and not opened:
+            # 日历还没打开：点击日期输入框，等日历渲染出来后重试
+            element.click()
+            opened = True
+            _wait_for_calendar(driver, element)
+            continue
+        if status == 'disabled':
+            raise NoSuchElementException(f"日期 {target.isoformat()} 在日历中不可选")
+        break
+    months = ', '.join(result.get('months', [])) or '无'
+    raise NoSuchElementException(f"日历中找不到日期 {target.isoformat()}（当前显示月份: {months}）")
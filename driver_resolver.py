@@ -0,0 +1,226 @@
+"""
+本地浏览器驱动解析与缓存
+
+录制工具和生成的测试脚本原来直接调用 webdriver.Chrome()（或写死Windows上的chromedriver路径），
+由 Selenium Manager 在每次启动时联网解析驱动：在隔离网络的机器上很慢甚至直接失败。
+这里在本机查找Chrome和与其主版本号匹配的chromedriver，结果按浏览器版本缓存：
+
+- Chrome：环境变量 CHROME_BINARY，或各平台的常见安装位置
+- chromedriver：环境变量 CHROMEDRIVER → Chrome安装目录 → PATH → Selenium Manager 以前下载到本机缓存（~/.cache/selenium）的驱动
+- 缓存：Chrome可执行文件（路径+修改时间）→ 浏览器版本 → chromedriver路径；
+  缓存命中时启动浏览器前不再执行任何子进程，Chrome升级后按新版本重新查找
+
+本机找不到匹配的chromedriver时仍交给 Selenium Manager 解析（需要联网）。
+
+用法:
+  python driver_resolver.py             # 显示解析结果
+  python driver_resolver.py --refresh   # 丢弃缓存重新查找
+
+环境变量:
+  CHROME_BINARY=...                     # 指定Chrome可执行文件
+  CHROMEDRIVER=...                      # 指定chromedriver（跳过查找和版本检查）
+  CTRIP_DRIVER_CACHE=...                # 缓存文件位置（默认在系统临时目录），设为空字符串关闭缓存
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Optional
+
+
+DRIVER_CACHE_FILE = os.environ.get('CTRIP_DRIVER_CACHE', os.path.join(tempfile.gettempdir(), 'ctrip_driver_cache.json'))
+VERSION_TIMEOUT = 10
+
+# 常见的Chrome安装位置（按平台）
+CHROME_CANDIDATES = {
+    'win32': [
+        r"C:\Program Files\Google\Chrome\Application\chrome.exe",
+        r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
+    ],
+    'darwin': [
+        "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+    ],
+    'linux': [
+        "google-chrome", "google-chrome-stable", "chromium", "chromium-browser",
+    ],
+}
+
+DRIVER_NAME = 'chromedriver.exe' if sys.platform == 'win32' else 'chromedriver'
+VERSION_PATTERN = re.compile(r'(\d+)\.\d+\.\d+(?:\.\d+)?')
+
+
+def find_chrome_binary() -> Optional[str]:
+    """查找本机Chrome可执行文件（可通过环境变量 CHROME_BINARY 指定）"""
+    if os.environ.get('CHROME_BINARY'):
+        return os.environ['CHROME_BINARY']
+    platform_key = 'linux' if sys.platform.startswith('linux') else sys.platform
+    for candidate in CHROME_CANDIDATES.get(platform_key, []):
+        path = candidate if os.path.isabs(candidate) else shutil.which(candidate)
+        if path and os.path.exists(path):
+            return path
+    return None
+
+
+def binary_version(path: str) -> Optional[str]:
+    """执行 `<可执行文件> --version` 读取版本号（如 120.0.6099.109）"""
+    try:
+        output = subprocess.run([path, '--version'], capture_output=True, text=True,
+                                timeout=VERSION_TIMEOUT).stdout
+    except (OSError, subprocess.SubprocessError) as e:
+        logging.debug(f"读取版本号失败: {path}: {e}")
+        return None
+    match = VERSION_PATTERN.search(output)
+    return match.group(0) if match else None
+
+
+def chrome_version(chrome_binary: str) -> Optional[str]:
+    """Chrome版本号：Windows上chrome.exe --version不输出内容，改为读取安装目录中以版本号命名的子目录"""
+    if sys.platform == 'win32':
+        application_dir = os.path.dirname(chrome_binary)
+        try:
+            names = os.listdir(application_dir)
+        except OSError:
+            names = []
+        versions = [name for name in names
+                    if VERSION_PATTERN.fullmatch(name) and os.path.isdir(os.path.join(application_dir, name))]
+        if versions:
+            return max(versions, key=lambda v: [int(part) for part in v.split('.')])
+    return binary_version(chrome_binary)
+
+
+def major(version: Optional[str]) -> Optional[str]:
+    return version.split('.')[0] if version else None
+
+
+def driver_candidates(chrome_binary: Optional[str], version: Optional[str]) -> List[str]:
+    """按优先级列出本机可能的chromedriver"""
+    candidates = []
+    if chrome_binary:
+        candidates.append(os.path.join(os.path.dirname(chrome_binary), DRIVER_NAME))
+    on_path = shutil.which('chromedriver')
+    if on_path:
+        candidates.append(on_path)
+    # Selenium Manager 的下载缓存：~/.cache/selenium/chromedriver/<平台>/<版本>/chromedriver
+    cache_root = os.environ.get('SE_CACHE_PATH') or os.path.join(os.path.expanduser('~'), '.cache', 'selenium')
+    pattern = os.path.join(cache_root, 'chromedriver', '*', f"{major(version) or '*'}.*", DRIVER_NAME)
+    candidates.extend(sorted(glob.glob(pattern), reverse=True))
+    return [path for path in dict.fromkeys(candidates) if os.path.isfile(path)]
+
+
+class DriverResolver:
+    """本机Chrome与chromedriver的解析，结果按浏览器版本缓存"""
+
+    def __init__(self, cache_file: str = DRIVER_CACHE_FILE):
+        self.cache_file = cache_file
+        self._cache = self._load()
+
+    def _load(self) -> Dict:
+        if not self.cache_file:
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        if not self.cache_file:
+            return
+        try:
+            with open(self.cache_file, 'w', encoding='utf-8') as f:
+                json.dump(self._cache, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            logging.warning(f"保存驱动解析缓存失败: {e}")
+
+    def clear(self):
+        self._cache = {}
+        self._save()
+
+    def _browser_version(self, chrome_binary: str) -> Optional[str]:
+        """浏览器版本号，按可执行文件路径和修改时间缓存（Chrome升级后修改时间变化，重新读取）"""
+        try:
+            mtime = os.path.getmtime(chrome_binary)
+        except OSError:
+            return None
+        browsers = self._cache.setdefault('browsers', {})
+        entry = browsers.get(chrome_binary)
+        if entry and entry.get('mtime') == mtime:
+            return entry['version']
+        version = chrome_version(chrome_binary)
+        if version:
+            browsers[chrome_binary] = {'mtime': mtime, 'version': version}
+            self._save()
+        return version
+
+    def resolve(self) -> Dict[str, Optional[str]]:
+        """返回 {'chrome_binary', 'browser_version', 'chromedriver'}，找不到的项为None"""
+        chrome_binary = find_chrome_binary()
+        version = self._browser_version(chrome_binary) if chrome_binary else None
+        result = {'chrome_binary': chrome_binary, 'browser_version': version, 'chromedriver': None}
+
+        if os.environ.get('CHROMEDRIVER'):
+            result['chromedriver'] = os.environ['CHROMEDRIVER']
+            return result
+        if not version:
+            return result
+
+        drivers = self._cache.setdefault('drivers', {})
+        cached = drivers.get(version)
+        if cached and os.path.isfile(cached):
+            result['chromedriver'] = cached
+            return result
+
+        # 只使用主版本号与浏览器一致的驱动，版本不匹配的驱动启动时会直接报错
+        for path in driver_candidates(chrome_binary, version):
+            if major(binary_version(path)) == major(version):
+                result['chromedriver'] = drivers[version] = path
+                self._save()
+                break
+        return result
+
+    def chrome_service(self, options=None):
+        """返回使用本机chromedriver的Service，并把找到的Chrome写入options
+
+        本机没有匹配的chromedriver时返回不指定路径的Service，由 Selenium Manager 解析
+        """
+        from selenium.webdriver.chrome.service import Service
+
+        result = self.resolve()
+        if options is not None and result['chrome_binary'] and not options.binary_location:
+            options.binary_location = result['chrome_binary']
+        if not result['chromedriver']:
+            logging.warning(f"本机未找到与Chrome {result['browser_version'] or '?'} 匹配的chromedriver，"
+                            f"交给 Selenium Manager 解析（需要联网），可通过环境变量 CHROMEDRIVER 指定")
+        return Service(executable_path=result['chromedriver'])
+
+
+def chrome_service(options=None):
+    """使用默认缓存解析驱动（录制工具和生成的测试脚本共用）"""
+    return DriverResolver().chrome_service(options)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="本地浏览器驱动解析与缓存")
+    parser.add_argument('--refresh', action='store_true', help="丢弃缓存重新查找")
+    args = parser.parse_args(argv)
+
+    resolver = DriverResolver()
+    if args.refresh:
+        resolver.clear()
+    result = resolver.resolve()
+    print(f"Chrome:       {result['chrome_binary'] or '未找到（可通过环境变量 CHROME_BINARY 指定）'}")
+    print(f"浏览器版本:   {result['browser_version'] or '未知'}")
+    print(f"chromedriver: {result['chromedriver'] or '未找到匹配的版本（启动时交给 Selenium Manager 解析，需要联网）'}")
+    print(f"缓存文件:     {resolver.cache_file or '已关闭'}")
+    return 0 if result['chromedriver'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
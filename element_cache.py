@@ -0,0 +1,69 @@
+"""
+已解析元素缓存
+
+同一个逻辑元素在一个页面状态中往往要查找多次（先点击日期输入框再选择日期、多个需求共用的输入框……），
+原来每次都从头解析：主定位器失效时，每次都要先等满主定位器的超时才轮到备选定位器。
+生成的测试脚本按逻辑元素（共享定位器表中的主定位器）缓存解析到的元素：
+- 再次查找时只用一次调用确认缓存的元素仍在当前文档中（isConnected），不再等待任何定位器
+- 页面跳转、切换到其他窗口、元素被重新渲染或浏览器被回收后确认失败，自动丢弃并重新解析
+- 操作执行中遇到 StaleElementReferenceException 时丢弃该元素的缓存，重新查找并再执行一次
+
+环境变量:
+  CTRIP_ELEMENT_CACHE=1    # 设为0关闭缓存（每次都重新解析）
+"""
+
+import logging
+import os
+from typing import Any, Dict, Optional, Tuple
+
+
+ELEMENT_CACHE_ENABLED = os.environ.get('CTRIP_ELEMENT_CACHE', '1') == '1'
+
+# 缓存的元素仍属于当前窗口的当前文档；元素所在文档已卸载或元素属于其他窗口时调用本身会报错
+CONNECTED_JS = "return arguments[0].isConnected;"
+
+
+class ElementCache:
+    """按主定位器缓存已解析的元素及生效的定位器下标"""
+
+    def __init__(self, enabled: bool = ELEMENT_CACHE_ENABLED):
+        self.enabled = enabled
+        self._entries: Dict[Tuple[str, str], Tuple[Any, int]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def get(self, driver, by_type: str, locator: str) -> Optional[Tuple[Any, int]]:
+        """返回 (元素, 生效的定位器下标)；没有缓存或缓存的元素已失效时返回None"""
+        if not self.enabled:
+            return None
+        entry = self._entries.get((by_type, locator))
+        if entry is None:
+            self.misses += 1
+            return None
+        try:
+            connected = driver.execute_script(CONNECTED_JS, entry[0])
+        except Exception as e:
+            logging.debug(f"缓存的元素已失效: {locator}: {e}")
+            connected = False
+        if not connected:
+            self.invalidate(by_type, locator)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, by_type: str, locator: str, element, locator_index: int = 0):
+        if self.enabled:
+            self._entries[(by_type, locator)] = (element, locator_index)
+
+    def invalidate(self, by_type: str, locator: str):
+        if self._entries.pop((by_type, locator), None) is not None:
+            self.invalidated += 1
+
+    def print_summary(self):
+        lookups = self.hits + self.misses
+        if not self.enabled or not lookups:
+            return
+        print(f"\n🧩 元素缓存: 查找 {lookups} 次，命中 {self.hits} 次（{self.hits / lookups:.0%}），"
+              f"失效后重新解析 {self.invalidated} 次")
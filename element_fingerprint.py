@@ -0,0 +1,315 @@
+"""
+元素指纹与定位器自愈
+
+主定位器和所有备选定位器都失效时，_find_element_with_fallback 原来在等满全部超时后直接抛出 NoSuchElementException。
+录制时 TestScriptGenerator 为每个步骤的元素保存一个紧凑的指纹（写入生成脚本的 STEP_OPTIONS）：
+- 标签、文本（前50个字符）、关键属性（id/name/type/placeholder/title/aria-label/alt/role/href/class 与 data-*）
+- 在同标签兄弟元素中的位置以及向上5层祖先的路径（遇到带id的祖先为止）
+- 页面坐标下的位置和尺寸
+运行时所有定位器都失效后，在页面内一次调用为候选元素打分（同标签的元素优先，都不够相似时再扩大到全部元素），
+置信度超过阈值且明显高于第二名时使用最匹配的元素继续执行，并把自愈得到的唯一CSS定位器追加到日志，便于替换原定位器。
+
+用法:
+  python element_fingerprint.py                                  # 汇总自愈日志：哪些定位器被自愈、建议替换成什么、涉及哪些步骤
+  python element_fingerprint.py --log healed_locators.jsonl --script TestCtripFlight.py
+
+环境变量:
+  CTRIP_SELF_HEALING=1                      # 设为0关闭自愈
+  CTRIP_HEAL_THRESHOLD=0.75                 # 置信度阈值（0~1）
+  CTRIP_HEALED_LOG=healed_locators.jsonl    # 自愈日志（JSONL）
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+
+HEALING_ENABLED = os.environ.get('CTRIP_SELF_HEALING', '1') == '1'
+HEAL_THRESHOLD = float(os.environ.get('CTRIP_HEAL_THRESHOLD', '0.75'))
+HEALED_LOG = os.environ.get('CTRIP_HEALED_LOG', 'healed_locators.jsonl')
+# 最佳候选至少比第二名高出这么多才采用，避免在几个相同的输入框之间随便选一个
+MIN_MARGIN = 0.05
+
+# 读取元素指纹的函数（录制工具的页面捕获脚本也注入同一个函数）
+FINGERPRINT_FUNCTION_JS = """
+function __ctripFingerprint(el) {
+    var ATTRIBUTES = ['id', 'name', 'type', 'placeholder', 'title', 'aria-label', 'alt', 'role', 'href', 'class'];
+
+    function sameTagIndex(node) {
+        var index = 0;
+        for (var sibling = node.previousElementSibling; sibling; sibling = sibling.previousElementSibling) {
+            if (sibling.tagName === node.tagName) { index++; }
+        }
+        return index;
+    }
+
+    var attrs = {};
+    ATTRIBUTES.forEach(function (name) {
+        var value = el.getAttribute(name);
+        if (value) { attrs[name] = value.slice(0, 120); }
+    });
+    for (var i = 0; i < el.attributes.length; i++) {
+        var attr = el.attributes[i];
+        if (attr.name.indexOf('data-') === 0 && attr.value.length <= 60) { attrs[attr.name] = attr.value; }
+    }
+
+    var path = [];
+    for (var node = el.parentElement, depth = 0; node && node !== document.body && depth < 5; node = node.parentElement, depth++) {
+        if (node.id) {
+            path.push(node.tagName.toLowerCase() + '#' + node.id);
+            break;
+        }
+        path.push(node.tagName.toLowerCase() + ':' + sameTagIndex(node));
+    }
+
+    var rect = el.getBoundingClientRect();
+    return {
+        tag: el.tagName.toLowerCase(),
+        text: (el.textContent || '').replace(/\\s+/g, ' ').trim().slice(0, 50),
+        attrs: attrs,
+        index: sameTagIndex(el),
+        path: path,
+        rect: [Math.round(rect.left + window.scrollX), Math.round(rect.top + window.scrollY),
+               Math.round(rect.width), Math.round(rect.height)]
+    };
+}
+"""
+
+FINGERPRINT_JS = FINGERPRINT_FUNCTION_JS + "return __ctripFingerprint(arguments[0]);"
+
+# 一次调用为页面中的候选元素打分：arguments[0]=录制时的指纹，arguments[1]=置信度阈值
+HEAL_JS = FINGERPRINT_FUNCTION_JS + """
+var fp = arguments[0], threshold = arguments[1], margin = arguments[2], started = performance.now();
+var WEIGHTS = {'id': 3, 'name': 2.5, 'placeholder': 2, 'aria-label': 2, 'title': 1.5, 'alt': 1.5,
+               'class': 1.5, 'type': 1, 'role': 1, 'href': 1};
+
+function classSimilarity(a, b) {
+    var left = a.split(/\\s+/).filter(Boolean), right = (b || '').split(/\\s+/).filter(Boolean);
+    var shared = left.filter(function (c) { return right.indexOf(c) >= 0; }).length;
+    var union = left.length + right.length - shared;
+    return union ? shared / union : 0;
+}
+
+function textSimilarity(a, b) {
+    if (!a || !b) { return 0; }
+    if (a === b) { return 1; }
+    return (a.indexOf(b) >= 0 || b.indexOf(a) >= 0) ? 0.5 : 0;
+}
+
+function score(candidate) {
+    var total = 0, max = 0;
+    function add(weight, similarity) { max += weight; total += weight * similarity; }
+
+    if (fp.text) { add(3, textSimilarity(fp.text, candidate.text)); }
+    for (var name in fp.attrs) {
+        var value = fp.attrs[name];
+        if (name === 'class') {
+            add(WEIGHTS[name], classSimilarity(value, candidate.attrs['class']));
+        } else {
+            add(WEIGHTS[name] || 1, candidate.attrs[name] === value ? 1 : 0);
+        }
+    }
+    if (fp.path.length) {
+        // 祖先逐层比较：标签和位置都相同记1分，只有标签相同记0.5分
+        var matched = 0;
+        fp.path.forEach(function (entry, i) {
+            var other = candidate.path[i];
+            if (other === entry) { matched += 1; }
+            else if (other && other.split(/[:#]/)[0] === entry.split(/[:#]/)[0]) { matched += 0.5; }
+        });
+        add(2, matched / fp.path.length);
+    }
+    add(0.5, candidate.index === fp.index ? 1 : 0);
+    if (fp.rect[2] && fp.rect[3]) {
+        var dx = (candidate.rect[0] + candidate.rect[2] / 2) - (fp.rect[0] + fp.rect[2] / 2);
+        var dy = (candidate.rect[1] + candidate.rect[3] / 2) - (fp.rect[1] + fp.rect[3] / 2);
+        var position = Math.max(0, 1 - Math.sqrt(dx * dx + dy * dy) / 400);
+        var size = Math.min(candidate.rect[2], fp.rect[2]) / Math.max(candidate.rect[2], fp.rect[2])
+                 * Math.min(candidate.rect[3], fp.rect[3]) / Math.max(candidate.rect[3], fp.rect[3]);
+        add(1.5, 0.7 * position + 0.3 * size);
+    }
+    return max ? total / max : 0;
+}
+
+function rank(elements, penalty, ranked) {
+    for (var i = 0; i < elements.length; i++) {
+        var candidate = __ctripFingerprint(elements[i]);
+        if (!candidate.rect[2] || !candidate.rect[3]) { continue; }  // 不可见的元素不参与
+        ranked.push({element: elements[i], confidence: score(candidate) * penalty});
+    }
+    return ranked;
+}
+
+function uniqueSelector(el) {
+    if (el.id && document.querySelectorAll('#' + CSS.escape(el.id)).length === 1) { return '#' + CSS.escape(el.id); }
+    var parts = [];
+    for (var node = el; node && node !== document.documentElement; node = node.parentElement) {
+        if (node !== el && node.id && document.querySelectorAll('#' + CSS.escape(node.id)).length === 1) {
+            parts.unshift('#' + CSS.escape(node.id));
+            break;
+        }
+        var index = 1;
+        for (var sibling = node.previousElementSibling; sibling; sibling = sibling.previousElementSibling) {
+            if (sibling.tagName === node.tagName) { index++; }
+        }
+        parts.unshift(node.tagName.toLowerCase() + ':nth-of-type(' + index + ')');
+    }
+    return parts.join(' > ');
+}
+
+var ranked = rank(document.getElementsByTagName(fp.tag), 1, []);
+var best = ranked.reduce(function (a, b) { return b.confidence > a.confidence ? b : a; }, {confidence: 0});
+if (best.confidence < threshold) {
+    // 标签也变了（如 span 改成 div）：扩大到全部元素，标签不同的打八折
+    var others = Array.prototype.filter.call(document.body.getElementsByTagName('*'), function (el) {
+        return el.tagName.toLowerCase() !== fp.tag;
+    });
+    rank(others, 0.8, ranked);
+}
+ranked.sort(function (a, b) { return b.confidence - a.confidence; });
+
+var top = ranked[0], runnerUp = ranked[1] ? ranked[1].confidence : 0;
+var accepted = !!top && top.confidence >= threshold && top.confidence - runnerUp >= margin;
+return {
+    element: accepted ? top.element : null,
+    confidence: top ? Math.round(top.confidence * 1000) / 1000 : 0,
+    runner_up: Math.round(runnerUp * 1000) / 1000,
+    locator: top ? uniqueSelector(top.element) : null,
+    candidates: ranked.length,
+    duration_ms: Math.round((performance.now() - started) * 10) / 10,
+    url: location.href
+};
+"""
+
+
+def fingerprint_element(driver, element) -> Optional[Dict]:
+    """录制时读取元素指纹（读取失败返回None，不影响录制）"""
+    try:
+        return driver.execute_script(FINGERPRINT_JS, element)
+    except Exception as e:
+        logging.debug(f"读取元素指纹失败: {e}")
+        return None
+
+
+class LocatorHealer:
+    """所有定位器都失效时按指纹在页面中找回元素，并记录自愈得到的定位器"""
+
+    def __init__(self, enabled: bool = HEALING_ENABLED, threshold: float = HEAL_THRESHOLD,
+                 log_file: str = HEALED_LOG):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.log_file = log_file
+        self.healed = 0
+        self.rejected = 0
+
+    def heal(self, driver, fingerprint: Optional[Dict], by_type: str, locator: str):
+        """一次浏览器调用为候选元素打分，置信度达到阈值时返回最匹配的元素，否则返回None"""
+        if not self.enabled or not fingerprint:
+            return None
+        try:
+            result = driver.execute_script(HEAL_JS, fingerprint, self.threshold, MIN_MARGIN) or {}
+        except Exception as e:
+            logging.warning(f"指纹自愈失败: {e}")
+            return None
+        return result.get('element') if self.record(result, fingerprint, by_type, locator) else None
+
+    def record(self, result: Dict, fingerprint: Dict, by_type: str, locator: str) -> bool:
+        """输出并记录一次打分结果，返回是否采用（异步执行器等不经过 heal() 的调用方也用它记录）"""
+        accepted = result.get('element') is not None
+        label = fingerprint.get('text') or fingerprint.get('tag')
+        if not accepted:
+            self.rejected += 1
+            print(f"🩹 指纹自愈未采用: {label}（最高置信度 {result.get('confidence', 0):.2f}，"
+                  f"第二名 {result.get('runner_up', 0):.2f}，阈值 {self.threshold:.2f}）")
+            return False
+
+        self.healed += 1
+        print(f"🩹 指纹自愈: {label} → {result['locator']}（置信度 {result['confidence']:.2f}，"
+              f"{result['candidates']} 个候选，{result['duration_ms']}ms）")
+        entry = {
+            'time': round(time.time(), 3), 'by': by_type, 'locator': locator,
+            'healed_locator': result['locator'], 'confidence': result['confidence'],
+            'runner_up': result['runner_up'], 'url': result.get('url'), 'text': fingerprint.get('text'),
+        }
+        try:
+            with open(self.log_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        except OSError as e:
+            logging.warning(f"写入自愈日志失败: {e}")
+        return True
+
+
+# ============ 汇总 ============
+def load_healed(log_file: str) -> List[Dict]:
+    entries = []
+    with open(log_file, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+    return entries
+
+
+def promotion_candidates(entries: List[Dict]) -> List[Dict]:
+    """按原定位器汇总自愈记录：自愈次数、最常得到的定位器（建议替换成它）及其占比、平均置信度"""
+    groups: Dict[tuple, List[Dict]] = {}
+    for entry in entries:
+        groups.setdefault((entry['by'], entry['locator']), []).append(entry)
+
+    candidates = []
+    for (by_type, locator), group in groups.items():
+        counts: Dict[str, int] = {}
+        for entry in group:
+            counts[entry['healed_locator']] = counts.get(entry['healed_locator'], 0) + 1
+        healed_locator = max(counts, key=counts.get)
+        candidates.append({
+            'by': by_type, 'locator': locator, 'healed': len(group),
+            'healed_locator': healed_locator, 'agreement': counts[healed_locator] / len(group),
+            'confidence': sum(entry['confidence'] for entry in group) / len(group),
+            'last_seen': max(entry['time'] for entry in group),
+        })
+    candidates.sort(key=lambda c: c['healed'], reverse=True)
+    return candidates
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="汇总自愈日志，列出建议替换的定位器")
+    parser.add_argument('--log', default=HEALED_LOG, help="自愈日志路径")
+    parser.add_argument('--script', default='TestCtripFlight.py', help="生成的测试脚本（用于列出使用该定位器的步骤）")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.log):
+        print(f"没有自愈记录: {args.log}")
+        return 0
+
+    steps_by_locator: Dict[str, List[str]] = {}
+    if os.path.exists(args.script):
+        from step_tables import load_step_tables, load_test_module
+
+        precondition_steps, requirements = load_step_tables(load_test_module(args.script))
+        for step in precondition_steps + [step for steps in requirements.values() for step in steps]:
+            steps_by_locator.setdefault(step['locator'], []).append(step['test_case_id'])
+
+    candidates = promotion_candidates(load_healed(args.log))
+    print(f"\n{'='*80}")
+    print(f"🩹 自愈记录: {sum(c['healed'] for c in candidates)} 次，涉及 {len(candidates)} 个定位器")
+    print(f"{'='*80}")
+    for candidate in candidates:
+        print(f"  {candidate['by']}: {candidate['locator']}")
+        print(f"    → {candidate['healed_locator']}")
+        print(f"    自愈 {candidate['healed']} 次，一致率 {candidate['agreement']:.0%}，平均置信度 {candidate['confidence']:.2f}，"
+              f"最近 {time.strftime('%Y-%m-%d %H:%M', time.localtime(candidate['last_seen']))}")
+        steps = steps_by_locator.get(candidate['locator'])
+        if steps:
+            print(f"    步骤: {', '.join(steps)}")
+    print(f"{'='*80}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+录制事件日志
+
+录制工具的所有活动原来只通过 print 输出，clicked_elements.log 每次启动被清空后再也没有写入。
+本模块把录制过程中的每个事件写成一行JSON（JSONL）：
+- 事件：元素搜索及候选数量、用户选择、生成的主定位器与备选定位器、交互类型、窗口切换、网络等待等，
+  带 duration_ms 的事件记录了该环节的耗时（工具耗时与等待用户输入的耗时分开记录）
+- 写入经过内存缓冲：攒够一批或距上次写入超过一定时间才落盘，不拖慢交互循环；退出时自动写完剩余事件
+- 按文件大小轮转：超过上限时 clicked_elements.log → clicked_elements.log.1 → ...，保留若干个历史文件
+
+用法:
+  python event_log.py                          # 汇总 clicked_elements.log（含轮转文件）中各类事件的耗时
+  python event_log.py path/to/events.log
+"""
+
+import atexit
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+
+DEFAULT_LOG_FILE = 'clicked_elements.log'
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUPS = 3
+DEFAULT_BUFFER_SIZE = 50       # 缓冲这么多条事件后写盘
+DEFAULT_FLUSH_INTERVAL = 2.0   # 距上次写盘超过这么久（秒）时写盘
+
+
+class EventLogger:
+    """带缓冲和大小轮转的JSONL事件日志"""
+
+    def __init__(self, path: str = DEFAULT_LOG_FILE, max_bytes: int = DEFAULT_MAX_BYTES,
+                 backups: int = DEFAULT_BACKUPS, buffer_size: int = DEFAULT_BUFFER_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._buffer: List[str] = []
+        self._last_flush = time.monotonic()
+        self._seq = 0
+        self._size = os.path.getsize(path) if os.path.exists(path) else 0
+        # 录制工具的后台定位器生成线程也会写入事件
+        self._lock = threading.RLock()
+        atexit.register(self.close)
+
+    # ============ 写入 ============
+    def log(self, event: str, **fields):
+        """记录一个事件（只写入内存缓冲）"""
+        with self._lock:
+            self._seq += 1
+            record = {'ts': round(time.time(), 3), 'seq': self._seq, 'event': event}
+            record.update(fields)
+            self._buffer.append(json.dumps(record, ensure_ascii=False, default=str))
+            if len(self._buffer) >= self.buffer_size or time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+
+    @contextmanager
+    def timed(self, event: str, **fields) -> Iterator[Dict]:
+        """
+        记录一段操作的耗时，调用方可以在代码块中往返回的字典里补充字段
+
+        用法:
+            with event_log.timed('search', text=text) as event:
+                elements = find(...)
+                event['candidates'] = len(elements)
+        """
+        started = time.perf_counter()
+        try:
+            yield fields
+        except Exception as e:
+            fields['error'] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            fields['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            self.log(event, **fields)
+
+    def flush(self):
+        """把缓冲中的事件写入文件，超过大小上限时轮转"""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._buffer:
+                return
+            data = ('\n'.join(self._buffer) + '\n').encode('utf-8')
+            self._buffer = []
+            if self._size and self._size + len(data) > self.max_bytes:
+                self.rotate()
+            try:
+                with open(self.path, 'ab') as f:
+                    f.write(data)
+                self._size += len(data)
+            except OSError as e:
+                logging.warning(f"写入事件日志失败: {e}")
+
+    def rotate(self):
+        """当前日志 → .1，.1 → .2 ...，超出保留数量的最旧文件被删除"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            if self.backups <= 0:
+                os.remove(self.path)
+            else:
+                for index in range(self.backups - 1, 0, -1):
+                    source = f"{self.path}.{index}"
+                    if os.path.exists(source):
+                        os.replace(source, f"{self.path}.{index + 1}")
+                os.replace(self.path, f"{self.path}.1")
+        except OSError as e:
+            logging.warning(f"轮转事件日志失败: {e}")
+        self._size = 0
+
+    def start_session(self, **fields):
+        """开始新的录制会话：上一次会话的日志轮转为历史文件，当前文件只包含本次会话"""
+        if self._size:
+            self.rotate()
+        self.log('session_start', **fields)
+
+    def close(self):
+        self.flush()
+
+
+# ============ 汇总 ============
+def read_events(path: str = DEFAULT_LOG_FILE, backups: int = DEFAULT_BACKUPS) -> List[Dict]:
+    """读取日志及其轮转文件中的全部事件（按时间先后）"""
+    events = []
+    files = [f"{path}.{index}" for index in range(backups, 0, -1)] + [path]
+    for file_path in files:
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    continue
+    return events
+
+
+def summarize(events: List[Dict]) -> List[Dict]:
+    """按事件类型（交互事件按交互方式细分）汇总次数和耗时，按总耗时降序"""
+    groups: Dict[str, List[float]] = {}
+    for event in events:
+        name = event.get('event', '?')
+        if event.get('kind'):
+            name = f"{name}:{event['kind']}"
+        groups.setdefault(name, []).append(event.get('duration_ms'))
+
+    rows = []
+    for name, durations in groups.items():
+        timed = sorted(d for d in durations if d is not None)
+        rows.append({
+            'event': name,
+            'count': len(durations),
+            'total_ms': sum(timed),
+            'avg_ms': sum(timed) / len(timed) if timed else None,
+            'max_ms': timed[-1] if timed else None,
+        })
+    rows.sort(key=lambda row: row['total_ms'], reverse=True)
+    return rows
+
+
+def main(argv: List[str] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    path = argv[0] if argv else DEFAULT_LOG_FILE
+    events = read_events(path)
+    if not events:
+        print(f"没有事件记录: {path}")
+        return 1
+
+    sessions = sum(1 for event in events if event.get('event') == 'session_start')
+    print(f"\n{'='*80}")
+    print(f"录制事件汇总: {path}（{len(events)} 个事件，{sessions} 次会话）")
+    print(f"{'='*80}")
+    print(f"  {'事件':<28}{'次数':>8}{'总耗时(s)':>12}{'平均(ms)':>12}{'最长(ms)':>12}")
+    for row in summarize(events):
+        avg = f"{row['avg_ms']:.0f}" if row['avg_ms'] is not None else '-'
+        longest = f"{row['max_ms']:.0f}" if row['max_ms'] is not None else '-'
+        print(f"  {row['event']:<28}{row['count']:>8}{row['total_ms'] / 1000:>12.1f}{avg:>12}{longest:>12}")
+    print(f"{'='*80}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
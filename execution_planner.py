@@ -0,0 +1,336 @@
+"""
+共享前缀执行计划器
+
+把所有需求的完整步骤序列（前置步骤 + 业务步骤）合并成一棵前缀树：
+- 多个需求共同的前缀步骤只执行一次
+- 在分叉节点为除最后一个分支外的每个分支复制当前页面状态到新标签页
+- 最后一个分支直接沿用当前标签页，无需复制
+
+页面状态复制策略：
+  携程页面的表单状态（已输入的城市、已选中的单程等）只存在于页面内存中，无法仅凭URL复制。
+  因此执行器会记录"锚点"——最近一次导航（URL或窗口变化）后的URL和sessionStorage，
+  以及锚点之后执行过的页内步骤。复制状态时在新标签页打开锚点URL、恢复sessionStorage，
+  再重放锚点之后的页内步骤。锚点之前的步骤永远不会重复执行。
+
+用法:
+  python execution_planner.py                  # 显示执行计划和节省的步骤数
+  python execution_planner.py --run            # 按执行计划运行整个套件
+  python execution_planner.py --script TestCtripFlight.py --run
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from step_tables import load_step_tables, load_test_module
+
+
+def step_key(step: Dict) -> Tuple:
+    """步骤的共享判定键：定位器 + 操作 + 输入数据完全相同才视为同一步骤"""
+    return (step['by_type'], step['locator'], step['action_type'], step.get('input_data') or '')
+
+
+class StepNode:
+    """前缀树节点，代表一个可被多个需求共享的步骤"""
+
+    def __init__(self, step: Optional[Dict] = None, parent: 'StepNode' = None):
+        self.step = step
+        self.parent = parent
+        self.children: Dict[Tuple, 'StepNode'] = {}  # 保持插入顺序
+        self.test_case_ids: List[str] = []  # 该节点覆盖的所有测试用例编号
+        self.requirements: List[str] = []  # 经过该节点的需求编号
+
+    @property
+    def depth(self) -> int:
+        depth = 0
+        node = self.parent
+        while node is not None:
+            depth += 1
+            node = node.parent
+        return depth
+
+    def iter_subtree(self):
+        """深度优先遍历子树（包含自身）"""
+        yield self
+        for child in self.children.values():
+            yield from child.iter_subtree()
+
+
+class _Anchor:
+    """当前标签页的页面状态：最近一次导航后的URL、sessionStorage以及之后的页内步骤"""
+
+    def __init__(self, url: str, session_storage: Dict[str, str], replay: List[Dict] = None):
+        self.url = url
+        self.session_storage = session_storage
+        self.replay = replay or []
+
+    def after_in_page_step(self, step: Dict) -> '_Anchor':
+        return _Anchor(self.url, self.session_storage, self.replay + [step])
+
+
+class ExecutionPlanner:
+    """基于前缀树的共享前缀执行计划器"""
+
+    def __init__(self, precondition_steps: List[Dict], requirements: Dict[str, List[Dict]]):
+        self.root = StepNode()
+        self.paths: Dict[str, List[Dict]] = {}
+        for req_id in sorted(requirements):
+            path = list(precondition_steps) + list(requirements[req_id])
+            self.paths[req_id] = path
+            self._insert(req_id, path)
+
+        # 运行结果 {test_case_id: {'status': passed/failed/skipped, 'error': str, 'duration': float}}
+        self.results: Dict[str, Dict] = {}
+        self.executed_steps = 0  # 实际执行次数（含复制状态时的重放）
+        self.replayed_steps = 0
+
+    @classmethod
+    def from_test_module(cls, module) -> 'ExecutionPlanner':
+        """从生成的测试脚本模块构建执行计划"""
+        precondition_steps, requirements = load_step_tables(module)
+        return cls(precondition_steps, requirements)
+
+    def _insert(self, req_id: str, path: List[Dict]):
+        node = self.root
+        for step in path:
+            key = step_key(step)
+            child = node.children.get(key)
+            if child is None:
+                child = StepNode(step, node)
+                node.children[key] = child
+            if step['test_case_id'] not in child.test_case_ids:
+                child.test_case_ids.append(step['test_case_id'])
+            child.requirements.append(req_id)
+            node = child
+
+    # ============ 计划统计 ============
+    @property
+    def naive_step_count(self) -> int:
+        """每个需求独立从头执行时的步骤总数"""
+        return sum(len(path) for path in self.paths.values())
+
+    @property
+    def planned_step_count(self) -> int:
+        """按前缀树执行时的步骤总数（不含复制状态时的重放）"""
+        return sum(1 for node in self.root.iter_subtree() if node.step is not None)
+
+    def summary(self) -> Dict:
+        naive = self.naive_step_count
+        planned = self.planned_step_count
+        branch_points = sum(1 for node in self.root.iter_subtree() if len(node.children) > 1)
+        return {
+            'requirements': len(self.paths),
+            'naive_steps': naive,
+            'planned_steps': planned,
+            'saved_steps': naive - planned,
+            'saved_ratio': round((naive - planned) / naive, 3) if naive else 0.0,
+            'branch_points': branch_points,
+        }
+
+    def print_plan(self):
+        """打印前缀树形式的执行计划"""
+        print(f"\n{'='*80}")
+        print("共享前缀执行计划")
+        print(f"{'='*80}")
+        for node in self.root.iter_subtree():
+            if node.step is None:
+                continue
+            indent = '  ' * (node.depth - 1)
+            shared = f" 【共享×{len(node.requirements)}】" if len(node.requirements) > 1 else ""
+            input_text = f" = {node.step['input_data']}" if node.step.get('input_data') else ""
+            print(f"{indent}- {node.step['action_type']} {node.step['test_name']}{input_text}"
+                  f"  ({', '.join(node.test_case_ids)}){shared}")
+
+        summary = self.summary()
+        print(f"\n{'-'*80}")
+        print(f"  需求数量: {summary['requirements']}")
+        print(f"  独立执行步骤数: {summary['naive_steps']}")
+        print(f"  计划执行步骤数: {summary['planned_steps']}")
+        print(f"  节省步骤数: {summary['saved_steps']} ({summary['saved_ratio']:.1%})")
+        print(f"  分叉点数量: {summary['branch_points']}")
+        print(f"{'='*80}")
+
+    # ============ 执行 ============
+    def run(self, driver, executor) -> Dict[str, Dict]:
+        """
+        按执行计划运行所有需求
+
+        Args:
+            driver: 已打开初始页面的WebDriver
+            executor: 提供 execute_action(driver, by_type, locator, action_type, input_data, alternative_locators, wait_for,
+                      fingerprint, timeout) 和 step_timeout(step_id)
+                      的对象（通常是生成脚本中的 BaseCtripFlight 实例）
+        """
+        self.results = {}
+        self.executed_steps = 0
+        self.replayed_steps = 0
+
+        anchor = _Anchor(driver.current_url, self._read_session_storage(driver))
+        self._run_children(driver, executor, self.root, anchor)
+        return self.results
+
+    def _run_children(self, driver, executor, node: StepNode, anchor: _Anchor):
+        children = list(node.children.values())
+        for index, child in enumerate(children):
+            if index == len(children) - 1:
+                # 最后一个分支沿用当前标签页
+                self._run_node(driver, executor, child, anchor)
+                continue
+
+            parent_handle = driver.current_window_handle
+            handles_before = set(driver.window_handles)
+            try:
+                self._fork(driver, executor, anchor)
+            except Exception as e:
+                logging.error(f"复制页面状态失败: {e}")
+                self._mark_subtree(child, 'failed', f"复制页面状态失败: {e}")
+                self._close_new_windows(driver, handles_before, parent_handle)
+                continue
+
+            self._run_node(driver, executor, child, anchor)
+            self._close_new_windows(driver, handles_before, parent_handle)
+
+    def _run_node(self, driver, executor, node: StepNode, anchor: _Anchor):
+        step = node.step
+        url_before = driver.current_url
+        handle_before = driver.current_window_handle
+        start = time.time()
+        try:
+            self._execute_step(driver, executor, step)
+        except Exception as e:
+            duration = time.time() - start
+            print(f"  ✗ {step['test_case_id']} {step['test_name']}: {e}")
+            for test_case_id in node.test_case_ids:
+                self.results[test_case_id] = {'status': 'failed', 'error': str(e), 'duration': duration}
+            for child in node.children.values():
+                self._mark_subtree(child, 'skipped', f"前缀步骤 {step['test_case_id']} 失败")
+            return
+
+        duration = time.time() - start
+        print(f"  ✓ {step['test_case_id']} {step['test_name']} ({duration:.2f}s)")
+        for test_case_id in node.test_case_ids:
+            self.results[test_case_id] = {'status': 'passed', 'error': '', 'duration': duration}
+
+        # 发生导航（URL或窗口变化）时更新锚点，否则把该步骤记为页内步骤
+        if driver.current_url != url_before or driver.current_window_handle != handle_before:
+            next_anchor = _Anchor(driver.current_url, self._read_session_storage(driver))
+        else:
+            next_anchor = anchor.after_in_page_step(step)
+
+        self._run_children(driver, executor, node, next_anchor)
+
+    def _execute_step(self, driver, executor, step: Dict, replay: bool = False):
+        from selenium.webdriver.common.by import By
+
+        by_type = getattr(By, step['by_type'], step['by_type'])
+        alternative_locators = [
+            (getattr(By, alt_by.replace('By.', '')), alt_loc)
+            for alt_by, alt_loc in step.get('alternative_locators', [])
+        ]
+        executor.execute_action(driver, by_type, step['locator'], step['action_type'],
+                                step.get('input_data') or None, alternative_locators, step.get('wait_for'),
+                                step.get('fingerprint'), executor.step_timeout(step['test_case_id']))
+        self.executed_steps += 1
+        if replay:
+            self.replayed_steps += 1
+
+    def _fork(self, driver, executor, anchor: _Anchor):
+        """在新标签页中复制锚点状态"""
+        driver.switch_to.new_window('tab')
+        # 登记为已知窗口：步骤中"切换到新打开的窗口"不会把分支标签页当成步骤打开的窗口
+        self._known_windows(driver).add(driver.current_window_handle)
+        driver.get(anchor.url)
+        if anchor.session_storage:
+            driver.execute_script(
+                "var items = arguments[0];"
+                "for (var key in items) { sessionStorage.setItem(key, items[key]); }",
+                anchor.session_storage
+            )
+            driver.refresh()
+        for step in anchor.replay:
+            self._execute_step(driver, executor, step, replay=True)
+
+    @staticmethod
+    def _known_windows(driver) -> set:
+        """生成脚本中 create_driver 记录的已知窗口（driver.known_windows）"""
+        known = getattr(driver, 'known_windows', None)
+        if known is None:
+            known = driver.known_windows = set(driver.window_handles)
+        return known
+
+    @staticmethod
+    def _close_new_windows(driver, handles_before, parent_handle: str):
+        """关闭分支执行期间新开的所有窗口并回到父标签页"""
+        known = ExecutionPlanner._known_windows(driver)
+        for handle in set(driver.window_handles) - handles_before:
+            try:
+                driver.switch_to.window(handle)
+                driver.close()
+                known.discard(handle)
+            except Exception as e:
+                logging.debug(f"关闭窗口失败: {e}")
+        driver.switch_to.window(parent_handle)
+
+    @staticmethod
+    def _read_session_storage(driver) -> Dict[str, str]:
+        try:
+            return driver.execute_script(
+                "var items = {};"
+                "for (var i = 0; i < sessionStorage.length; i++) {"
+                "  var key = sessionStorage.key(i); items[key] = sessionStorage.getItem(key);"
+                "}"
+                "return items;"
+            ) or {}
+        except Exception:
+            return {}
+
+    def _mark_subtree(self, node: StepNode, status: str, error: str):
+        for sub in node.iter_subtree():
+            for test_case_id in sub.test_case_ids:
+                self.results.setdefault(test_case_id, {'status': status, 'error': error, 'duration': 0.0})
+
+    def print_results(self):
+        counts = {'passed': 0, 'failed': 0, 'skipped': 0}
+        for result in self.results.values():
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+        print(f"\n{'='*80}")
+        print(f"执行完成: 通过 {counts['passed']}, 失败 {counts['failed']}, 跳过 {counts['skipped']}")
+        print(f"  实际执行步骤数: {self.executed_steps}（其中复制状态重放 {self.replayed_steps}）")
+        print(f"  独立执行步骤数: {self.naive_step_count}")
+        print(f"{'='*80}")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="共享前缀执行计划器")
+    parser.add_argument('--script', default='TestCtripFlight.py', help="生成的测试脚本路径")
+    parser.add_argument('--run', action='store_true', help="按执行计划运行整个套件")
+    parser.add_argument('--json', dest='json_file', help="把运行结果写入JSON文件")
+    args = parser.parse_args(argv)
+
+    module = load_test_module(args.script)
+    planner = ExecutionPlanner.from_test_module(module)
+    planner.print_plan()
+
+    if not args.run:
+        return 0
+
+    driver = module.create_driver()
+    try:
+        planner.run(driver, module.BaseCtripFlight())
+    finally:
+        module.release_driver(driver)
+
+    planner.print_results()
+    if args.json_file:
+        with open(args.json_file, 'w', encoding='utf-8') as f:
+            json.dump({'summary': planner.summary(), 'executed_steps': planner.executed_steps,
+                       'replayed_steps': planner.replayed_steps, 'results': planner.results},
+                      f, ensure_ascii=False, indent=2)
+    return 0 if all(r['status'] == 'passed' for r in planner.results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
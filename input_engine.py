@@ -0,0 +1,207 @@
+"""
+自适应快速输入引擎
+
+原来的输入步骤对每个输入框都执行固定的一串操作：点击、clear()、JS清空并触发事件、
+Ctrl+A、Backspace、send_keys，至少6次往返外加约0.9秒的固定等待。
+
+本引擎按定位器记录"哪种清空方式有效、是否需要逐键输入"：
+- 清空方式：首次遇到某个定位器时依次探测 js / clear / keys，第一个能把值清空的方式被缓存下来
+- 输入方式：默认通过 DevTools 的 Input.insertText 一次性插入整个字符串；
+  插入后值不正确（例如控件只响应键盘事件）时回退到完整的逐键输入流程，并把该定位器标记为 keys
+- 缓存写入 input_strategies.json，录制工具、测试脚本和后续运行共享；也可以手动把某个定位器改为 keys
+
+环境变量:
+  CTRIP_INPUT_MODE=auto|insert|keys     # auto(默认)按缓存自适应；insert/keys 强制使用一种输入方式
+  CTRIP_INPUT_STRATEGY_FILE=path.json   # 缓存文件位置
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+
+STRATEGY_FILE = os.environ.get('CTRIP_INPUT_STRATEGY_FILE', 'input_strategies.json')
+INPUT_MODE = os.environ.get('CTRIP_INPUT_MODE', 'auto')
+
+# 清空方式的探测顺序（js 一次往返就能同时完成清空和校验，最便宜）
+CLEAR_METHODS = ['js', 'clear', 'keys']
+
+# 通过原生setter清空，框架（React等）受控组件也能感知到值的变化；返回清空后的值用于校验
+JS_CLEAR = """
+    var el = arguments[0];
+    el.focus();
+    var proto = el instanceof HTMLTextAreaElement ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+    var descriptor = Object.getOwnPropertyDescriptor(proto, 'value');
+    if (descriptor && descriptor.set) { descriptor.set.call(el, ''); } else { el.value = ''; }
+    el.dispatchEvent(new Event('input', { bubbles: true }));
+    el.dispatchEvent(new Event('change', { bubbles: true }));
+    return el.value;
+"""
+
+READ_VALUE_JS = "return arguments[0].value;"
+FOCUS_JS = "arguments[0].focus();"
+
+
+class FastInputEngine:
+    """按定位器自适应选择清空方式和输入方式"""
+
+    def __init__(self, strategy_file: str = STRATEGY_FILE, mode: str = INPUT_MODE):
+        self.strategy_file = strategy_file
+        self.mode = mode
+        self._strategies: Optional[Dict[str, Dict[str, str]]] = None
+        self.stats = {'fast': 0, 'keys': 0, 'probes': 0, 'fallbacks': 0}
+
+    # ============ 缓存 ============
+    @property
+    def strategies(self) -> Dict[str, Dict[str, str]]:
+        if self._strategies is None:
+            self._strategies = {}
+            if self.strategy_file and os.path.exists(self.strategy_file):
+                try:
+                    with open(self.strategy_file, 'r', encoding='utf-8') as f:
+                        self._strategies = json.load(f)
+                except (OSError, ValueError) as e:
+                    logging.warning(f"读取输入策略缓存失败: {e}")
+        return self._strategies
+
+    def _save(self):
+        if not self.strategy_file:
+            return
+        temp_file = f"{self.strategy_file}.tmp"
+        try:
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.strategies, f, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(temp_file, self.strategy_file)
+        except OSError as e:
+            logging.warning(f"保存输入策略缓存失败: {e}")
+
+    @staticmethod
+    def locator_key(by_type: str, locator: str) -> str:
+        return f"{by_type}={locator}"
+
+    def _update(self, key: Optional[str], **values):
+        if key is None:
+            return
+        strategy = self.strategies.setdefault(key, {})
+        if all(strategy.get(name) == value for name, value in values.items()):
+            return
+        strategy.update(values)
+        self._save()
+
+    # ============ 输入 ============
+    def type_text(self, driver, element, text: str, key: Optional[str] = None) -> str:
+        """
+        清空输入框并输入文本（调用方负责先点击/聚焦元素）
+
+        Args:
+            key: 定位器缓存键（locator_key生成），为None时每次都重新探测且不写缓存
+
+        Returns:
+            实际使用的输入方式：insert 或 keys
+        """
+        strategy = self.strategies.get(key, {}) if key else {}
+
+        clear_method = strategy.get('clear')
+        if clear_method is None or not self._clear(driver, element, clear_method):
+            clear_method = self._probe_clear(driver, element)
+            self._update(key, clear=clear_method)
+
+        if clear_method == 'clear':
+            # WebDriver的clear()结束时会让元素失去焦点，而insertText插入到当前焦点元素
+            driver.execute_script(FOCUS_JS, element)
+
+        insert_method = self.mode if self.mode in ('insert', 'keys') else strategy.get('insert', 'insert')
+        if insert_method == 'insert' and self._insert_text(driver, text):
+            if self._read_value(driver, element) in (text, None):
+                self.stats['fast'] += 1
+                return 'insert'
+            # 插入后的值不正确：控件需要真实键盘事件，回退到完整的逐键输入流程
+            self.stats['fallbacks'] += 1
+            self.full_input(driver, element, text)
+            if self.mode == 'auto':
+                self._update(key, insert='keys', clear='all')
+            return 'keys'
+
+        if insert_method == 'keys':
+            element.send_keys(text)
+        else:
+            # 驱动不支持DevTools命令（非Chrome或远程驱动）
+            self.full_input(driver, element, text)
+        self.stats['keys'] += 1
+        return 'keys'
+
+    def _probe_clear(self, driver, element) -> str:
+        """依次尝试各种清空方式，返回第一个能把值清空的方式；都不行时使用全部方式组合"""
+        self.stats['probes'] += 1
+        for method in CLEAR_METHODS:
+            if self._clear(driver, element, method):
+                return method
+        self._clear(driver, element, 'all')
+        return 'all'
+
+    def _clear(self, driver, element, method: str) -> bool:
+        """执行一种清空方式，返回清空后值是否为空（无法读取值的控件视为成功）"""
+        from selenium.webdriver import Keys
+
+        try:
+            if method == 'js':
+                value = driver.execute_script(JS_CLEAR, element)
+                return not value
+            if method == 'clear':
+                element.clear()
+            elif method == 'keys':
+                element.send_keys(Keys.CONTROL + 'a', Keys.BACKSPACE)
+            else:
+                self._clear_all(driver, element)
+                return True
+        except Exception as e:
+            logging.debug(f"清空方式 {method} 失败: {e}")
+            return False
+        return not self._read_value(driver, element)
+
+    @staticmethod
+    def _clear_all(driver, element):
+        """原有的组合清空流程：clear()、JS清空、Ctrl+A + Backspace"""
+        from selenium.webdriver import Keys
+
+        try:
+            element.clear()
+            time.sleep(0.2)
+        except Exception:
+            pass
+        try:
+            driver.execute_script(JS_CLEAR, element)
+            time.sleep(0.2)
+        except Exception:
+            pass
+        try:
+            element.send_keys(Keys.CONTROL + 'a')
+            time.sleep(0.1)
+            element.send_keys(Keys.BACKSPACE)
+            time.sleep(0.1)
+        except Exception:
+            pass
+
+    def full_input(self, driver, element, text: str):
+        """完整的逐键输入流程（最慢但兼容性最好）"""
+        self._clear_all(driver, element)
+        element.send_keys(text)
+
+    @staticmethod
+    def _insert_text(driver, text: str) -> bool:
+        """通过DevTools一次性插入整个字符串（插入到当前焦点元素）"""
+        try:
+            driver.execute_cdp_cmd('Input.insertText', {'text': text})
+            return True
+        except Exception as e:
+            logging.debug(f"Input.insertText 不可用: {e}")
+            return False
+
+    @staticmethod
+    def _read_value(driver, element):
+        try:
+            return driver.execute_script(READ_VALUE_JS, element)
+        except Exception:
+            return None
@@ -0,0 +1,154 @@
+"""
+录制工具的后台定位器生成
+
+录制工具原来在点击元素之前同步生成定位器：逐个读取元素属性、沿父元素逐级读取CSS路径、挑选备选定位器，
+每一项都是一次WebDriver往返，再加上2秒的高亮，操作人员要等这些都做完页面才有反应。
+现在点击前只做一次快照：一次 execute_script 在页面内读取元素属性、完整CSS路径和元素指纹；
+按快照组合定位器、挑选主/备选定位器并写入 TestScriptGenerator 的工作交给后台线程，点击立即执行。
+
+- 后台只有一个工作线程，按提交顺序依次处理，生成的步骤按录制顺序写入
+- 后台线程不使用WebDriver（WebDriver不是线程安全的），只处理快照中的数据
+- 写入其他步骤、设置步骤的等待请求、显示下一个输入提示或生成脚本之前，先等后台任务全部完成（drain）
+- 后台线程不直接打印（会打断正在等待的输入提示）：生成的定位器、收集的步骤和错误先排队，
+  由主线程在 drain 之后按顺序显示
+
+环境变量:
+  CTRIP_BACKGROUND_LOCATORS=1   # 设为0时在点击前同步生成（仍使用快照，只是不交给后台线程）
+"""
+
+import logging
+import os
+import queue
+import threading
+from typing import Callable, Dict, List, Optional
+
+from element_fingerprint import FINGERPRINT_FUNCTION_JS
+
+
+BACKGROUND_LOCATORS = os.environ.get('CTRIP_BACKGROUND_LOCATORS', '1') == '1'
+
+# 元素属性与完整CSS路径的读取规则与 ElementLocatorGenerator 保持一致（捕获模式的监听脚本共用同一个函数）
+SNAPSHOT_FUNCTION_JS = """
+function __ctripSnapshot(el) {
+    var CONTAINER_WORDS = ['container', 'wrapper', 'module', 'holder', 'box', 'header', 'footer', 'main', 'sidebar', 'aside'];
+    var SKIP_SUFFIXES = ['item', 'text', 'content', 'inner', 'link', 'btn', 'button', 'icon', 'img', 'title', 'desc'];
+    var SKIP_PREFIXES = ['layout', 'page', 'section'];
+    var ATTRIBUTES = ['id', 'class', 'name', 'type', 'placeholder', 'title', 'aria-label', 'alt', 'role'];
+
+    function attributes(el) {
+        var attrs = {tag_name: el.tagName.toLowerCase(), text: (el.innerText || '').trim()};
+        ATTRIBUTES.forEach(function (name) { attrs[name] = el.getAttribute(name); });
+        attrs.href = el.href || null;
+        attrs.value = el.value !== undefined ? String(el.value) : null;
+        for (var i = 0; i < el.attributes.length; i++) {
+            if (el.attributes[i].name.indexOf('data-') === 0) { attrs[el.attributes[i].name] = el.attributes[i].value; }
+        }
+        return attrs;
+    }
+
+    function containerClasses(el) {
+        var result = [];
+        (el.getAttribute('class') || '').trim().split(/\\s+/).forEach(function (c) {
+            if (!c) { return; }
+            var parts = c.split('_'), lower = c.toLowerCase();
+            // CSS Modules哈希、过长的class不使用
+            if ((parts.length > 1 && /[A-Z]/.test(parts[parts.length - 1])) || parts.length > 2 || c.length > 25) { return; }
+            if (SKIP_SUFFIXES.some(function (s) { return lower.slice(-s.length) === s || lower.indexOf('-' + s) >= 0; })) { return; }
+            if (SKIP_PREFIXES.some(function (p) { return lower.indexOf(p) === 0; })) { return; }
+            if (CONTAINER_WORDS.some(function (w) { return lower.indexOf(w) >= 0; })) { result.push(c); }
+        });
+        return result;
+    }
+
+    function cssPath(el) {
+        var path = [];
+        for (var node = el, depth = 0; node && node.nodeType === 1 && depth < 10; node = node.parentElement, depth++) {
+            var id = node.getAttribute('id');
+            if (id) {
+                path.unshift(/^\\d/.test(id) ? "[id='" + id + "']" : '#' + id);
+                break;
+            }
+            var tag = node.tagName.toLowerCase(), part = tag, classes = containerClasses(node);
+            if (classes.length) {
+                part = tag + '.' + classes.slice(0, 3).join('.');
+            } else if (node.parentElement) {
+                var siblings = Array.prototype.filter.call(node.parentElement.children, function (s) {
+                    return s.tagName === node.tagName;
+                });
+                if (siblings.length > 1) { part += ':nth-child(' + (siblings.indexOf(node) + 1) + ')'; }
+            }
+            path.unshift(part);
+        }
+        return path.join(' > ');
+    }
+
+    return {attributes: attributes(el), css_path: cssPath(el)};
+}
+"""
+
+SNAPSHOT_JS = FINGERPRINT_FUNCTION_JS + SNAPSHOT_FUNCTION_JS + """
+var snapshot = __ctripSnapshot(arguments[0]);
+snapshot.fingerprint = __ctripFingerprint(arguments[0]);
+return snapshot;
+"""
+
+
+def snapshot_element(driver, element) -> Optional[Dict]:
+    """一次调用读取元素快照：{'attributes', 'css_path', 'fingerprint'}（元素已失效时返回None）"""
+    try:
+        return driver.execute_script(SNAPSHOT_JS, element)
+    except Exception as e:
+        logging.error(f"读取元素快照失败: {e}")
+        return None
+
+
+class LocatorPipeline:
+    """单个后台线程按提交顺序执行定位器生成任务，输出和错误留到下一个输入提示前显示"""
+
+    def __init__(self, enabled: bool = BACKGROUND_LOCATORS):
+        self.enabled = enabled
+        self._jobs: queue.Queue = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._messages: List[str] = []
+        self._lock = threading.Lock()
+
+    def submit(self, label: str, func: Callable, *args):
+        """提交任务；关闭后台生成时直接在当前线程执行"""
+        if not self.enabled:
+            self._run(label, func, args)
+            return
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._loop, name='locator-pipeline', daemon=True)
+            self._worker.start()
+        self._jobs.put((label, func, args))
+
+    def _run(self, label: str, func: Callable, args: tuple):
+        try:
+            func(*args)
+        except Exception as e:
+            logging.debug(f"生成定位器失败（{label}）: {e}")
+            self.say(f"⚠ 后台生成定位器失败: {label}: {e}")
+
+    def _loop(self):
+        while True:
+            label, func, args = self._jobs.get()
+            try:
+                self._run(label, func, args)
+            finally:
+                self._jobs.task_done()
+
+    def say(self, message: str):
+        """输出信息：在后台线程中先排队，其余情况直接打印"""
+        if threading.current_thread() is self._worker:
+            with self._lock:
+                self._messages.append(message)
+        else:
+            print(message)
+
+    def drain(self) -> List[str]:
+        """等待已提交的任务全部完成，返回并清空期间排队的输出（包括错误）"""
+        if self._worker is not None:
+            self._jobs.join()
+        with self._lock:
+            messages, self._messages = self._messages, []
+        return messages
@@ -0,0 +1,342 @@
+"""
+网络录制与回放
+
+录制模式：每个需求运行时通过 DevTools 的 Fetch 域截获所有响应，按请求（方法 + URL + 请求体）保存到本地归档
+回放模式：同样截获所有请求，由本地归档直接返回响应（fulfillRequest），不再访问 ctrip.com；
+         归档中没有的请求直接失败，保证运行完全可重复（hermetic）
+
+每个需求类使用独立的归档目录（network_archive/TestCtripFlight_R001/ 等），
+同一请求出现多次时按出现顺序依次返回录制时的各次响应。
+请求键中的日期（YYYY-MM-DD、YYYY/MM/DD）换算为相对当天的天数：步骤中的 +N 日期每天都不同，
+换算后隔天回放仍能命中录制时的请求。
+
+环境变量:
+  CTRIP_NETWORK_MODE=record|replay      # 默认 live（不截获）
+  CTRIP_NETWORK_ARCHIVE=network_archive # 归档根目录
+
+用法:
+  CTRIP_NETWORK_MODE=record pytest TestCtripFlight.py    # 录制一次
+  CTRIP_NETWORK_MODE=replay pytest TestCtripFlight.py    # 之后离线反复运行
+  python network_replay.py                               # 查看归档统计
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+from datetime import date
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+
+NETWORK_MODE = os.environ.get('CTRIP_NETWORK_MODE', 'live')
+ARCHIVE_ROOT = os.environ.get('CTRIP_NETWORK_ARCHIVE', 'network_archive')
+
+# 计算请求键时忽略的易变查询参数（时间戳、防缓存随机数等）
+VOLATILE_QUERY_PARAMS = {'_', 't', 'ts', 'timestamp', 'rand', 'random', 'nocache', 'callback'}
+
+# 回放时不能原样返回的响应头（响应体已由浏览器解压，长度也会重新计算）
+DROPPED_RESPONSE_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+# URL和请求体中的日期（也匹配 2024-05-01T08:00:00 中的日期部分）
+DATE_PATTERN = re.compile(r'(?<!\d)(\d{4})([-/])(\d{2})\2(\d{2})(?!\d)')
+
+
+def relative_dates(text: str, today: date = None) -> str:
+    """把文本中的日期换成相对今天的天数（如 {D+7}），不是合法日期的数字保持原样"""
+    today = today or date.today()
+
+    def replace(match) -> str:
+        try:
+            value = date(int(match.group(1)), int(match.group(3)), int(match.group(4)))
+        except ValueError:
+            return match.group(0)
+        return f"{{D{(value - today).days:+d}}}"
+
+    return DATE_PATTERN.sub(replace, text)
+
+
+def request_key(method: str, url: str, post_data: str = None, today: date = None) -> str:
+    """请求键：方法 + 去掉易变参数的URL + 请求体，其中的日期按相对今天的天数计算"""
+    url = relative_dates(url, today)
+    parsed = urlparse(url)
+    query = urlencode(sorted(
+        (name, value) for name, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if name not in VOLATILE_QUERY_PARAMS
+    ))
+    normalized = urlunparse(parsed._replace(query=query, fragment=''))
+    body = relative_dates(post_data, today) if post_data else ''
+    digest = hashlib.sha1(f"{method} {normalized}\n{body}".encode('utf-8')).hexdigest()
+    return digest[:20]
+
+
+def browser_websocket_url(driver) -> str:
+    """WebDriver所控制的Chrome的浏览器级DevTools WebSocket地址"""
+    import urllib.request
+
+    debugger_address = driver.capabilities['goog:chromeOptions']['debuggerAddress']
+    with urllib.request.urlopen(f"http://{debugger_address}/json/version", timeout=5) as resp:
+        return json.loads(resp.read().decode('utf-8'))['webSocketDebuggerUrl']
+
+
+class CdpConnection:
+    """最小的DevTools WebSocket客户端：读线程接收消息，事件交给单独的处理线程（处理函数中可以同步发送命令）"""
+
+    def __init__(self, ws_url: str, event_handler: Callable[[str, dict, Optional[str]], None]):
+        import websocket
+
+        self.ws = websocket.create_connection(ws_url, suppress_origin=True, enable_multithread=True)
+        self.event_handler = event_handler
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._pending: Dict[int, list] = {}
+        self._events: queue.Queue = queue.Queue()
+        self._closed = False
+        threading.Thread(target=self._read_loop, daemon=True).start()
+        threading.Thread(target=self._event_loop, daemon=True).start()
+
+    def send(self, method: str, params: dict = None, session_id: str = None, timeout: float = 30) -> dict:
+        with self._lock:
+            self._next_id += 1
+            message_id = self._next_id
+            waiter = [threading.Event(), None]
+            self._pending[message_id] = waiter
+        message = {'id': message_id, 'method': method, 'params': params or {}}
+        if session_id:
+            message['sessionId'] = session_id
+        self.ws.send(json.dumps(message))
+        if not waiter[0].wait(timeout):
+            self._pending.pop(message_id, None)
+            raise TimeoutError(f"DevTools命令超时: {method}")
+        response = waiter[1]
+        if 'error' in response:
+            raise RuntimeError(f"{method}: {response['error'].get('message')}")
+        return response.get('result', {})
+
+    def _read_loop(self):
+        while not self._closed:
+            try:
+                message = json.loads(self.ws.recv())
+            except Exception:
+                break
+            if 'id' in message:
+                waiter = self._pending.pop(message['id'], None)
+                if waiter is not None:
+                    waiter[1] = message
+                    waiter[0].set()
+            else:
+                self._events.put(message)
+        self._events.put(None)
+
+    def _event_loop(self):
+        while True:
+            message = self._events.get()
+            if message is None:
+                break
+            try:
+                self.event_handler(message.get('method', ''), message.get('params', {}), message.get('sessionId'))
+            except Exception as e:
+                logging.debug(f"处理DevTools事件失败: {e}")
+
+    def close(self):
+        self._closed = True
+        try:
+            self.ws.close()
+        except Exception:
+            pass
+
+
+class NetworkArchive:
+    """一个需求的响应归档：index.json + bodies/ 目录"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.index_file = os.path.join(directory, 'index.json')
+        self.entries: Dict[str, List[dict]] = {}
+        self._served: Dict[str, int] = {}
+        if os.path.exists(self.index_file):
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def add(self, key: str, url: str, status: int, headers: List[dict], body: bytes):
+        responses = self.entries.setdefault(key, [])
+        body_file = f"{key}_{len(responses)}.bin"
+        os.makedirs(os.path.join(self.directory, 'bodies'), exist_ok=True)
+        with open(os.path.join(self.directory, 'bodies', body_file), 'wb') as f:
+            f.write(body)
+        responses.append({'url': url, 'status': status, 'headers': headers, 'body': body_file})
+
+    def next_response(self, key: str) -> Optional[dict]:
+        """按出现顺序返回录制的响应，超出录制次数后重复最后一个"""
+        responses = self.entries.get(key)
+        if not responses:
+            return None
+        index = min(self._served.get(key, 0), len(responses) - 1)
+        self._served[key] = index + 1
+        return responses[index]
+
+    def read_body(self, response: dict) -> bytes:
+        with open(os.path.join(self.directory, 'bodies', response['body']), 'rb') as f:
+            return f.read()
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.index_file, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=1)
+
+
+class NetworkReplay:
+    """附加到WebDriver所控制的浏览器上，按模式录制或回放所有页面的网络请求"""
+
+    def __init__(self, driver, mode: str, archive_dir: str):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"未知的网络模式: {mode}")
+        self.mode = mode
+        self.archive = NetworkArchive(archive_dir)
+        if mode == 'record':
+            # 重新录制时覆盖旧归档
+            self.archive.entries = {}
+        self.stats = {'recorded': 0, 'replayed': 0, 'missed': 0}
+        self.missed_urls: List[str] = []
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, str] = {}  # targetId -> sessionId
+        self.connection = CdpConnection(browser_websocket_url(driver), self._handle_event)
+
+        # 新打开的标签页先暂停，启用截获后再继续，保证第一批请求也被截获
+        self.connection.send('Target.setAutoAttach', {
+            'autoAttach': True, 'waitForDebuggerOnStart': True, 'flatten': True
+        })
+        for target in self.connection.send('Target.getTargets')['targetInfos']:
+            if target['type'] == 'page' and target['targetId'] not in self._sessions:
+                session_id = self.connection.send('Target.attachToTarget', {
+                    'targetId': target['targetId'], 'flatten': True
+                })['sessionId']
+                self._adopt(target['targetId'], session_id)
+
+    @classmethod
+    def from_env(cls, driver, archive_name: str) -> Optional['NetworkReplay']:
+        """按环境变量 CTRIP_NETWORK_MODE 启用录制或回放（live模式返回None）"""
+        if NETWORK_MODE not in ('record', 'replay'):
+            return None
+        replay = cls(driver, NETWORK_MODE, os.path.join(ARCHIVE_ROOT, archive_name))
+        print(f"🌐 网络{'录制' if NETWORK_MODE == 'record' else '回放'}模式: {replay.archive.directory}")
+        return replay
+
+    # ============ 事件处理 ============
+    def _adopt(self, target_id: str, session_id: str):
+        """每个页面只保留一个截获会话（自动附加和主动附加可能先后得到同一页面的两个会话）"""
+        with self._lock:
+            existing = self._sessions.get(target_id)
+            if existing == session_id:
+                return
+            if existing is None:
+                self._sessions[target_id] = session_id
+        if existing is not None:
+            self.connection.send('Runtime.runIfWaitingForDebugger', session_id=session_id)
+            self.connection.send('Target.detachFromTarget', {'sessionId': session_id})
+            return
+        self._enable_fetch(session_id)
+
+    def _enable_fetch(self, session_id: str):
+        stage = 'Response' if self.mode == 'record' else 'Request'
+        self.connection.send('Fetch.enable', {'patterns': [{'urlPattern': '*', 'requestStage': stage}]},
+                             session_id=session_id)
+        try:
+            self.connection.send('Runtime.runIfWaitingForDebugger', session_id=session_id)
+        except RuntimeError:
+            pass
+
+    def _handle_event(self, method: str, params: dict, session_id: Optional[str]):
+        if method == 'Target.attachedToTarget':
+            if params['targetInfo']['type'] == 'page':
+                self._adopt(params['targetInfo']['targetId'], params['sessionId'])
+            else:
+                self.connection.send('Runtime.runIfWaitingForDebugger', session_id=params['sessionId'])
+        elif method == 'Fetch.requestPaused':
+            if self.mode == 'record':
+                self._record(params, session_id)
+            else:
+                self._replay(params, session_id)
+
+    def _record(self, params: dict, session_id: str):
+        request = params['request']
+        status = params.get('responseStatusCode', 0)
+        body = b''
+        if status and not 300 <= status < 400:
+            try:
+                result = self.connection.send('Fetch.getResponseBody', {'requestId': params['requestId']},
+                                              session_id=session_id)
+                body = base64.b64decode(result['body']) if result.get('base64Encoded') else result['body'].encode('utf-8')
+            except RuntimeError as e:
+                logging.debug(f"读取响应体失败 {request['url']}: {e}")
+        if status:
+            key = request_key(request['method'], request['url'], request.get('postData'))
+            with self._lock:
+                self.archive.add(key, request['url'], status, params.get('responseHeaders', []), body)
+                self.stats['recorded'] += 1
+        self.connection.send('Fetch.continueRequest', {'requestId': params['requestId']}, session_id=session_id)
+
+    def _replay(self, params: dict, session_id: str):
+        request = params['request']
+        key = request_key(request['method'], request['url'], request.get('postData'))
+        with self._lock:
+            response = self.archive.next_response(key)
+            if response is None:
+                self.stats['missed'] += 1
+                self.missed_urls.append(request['url'])
+            else:
+                self.stats['replayed'] += 1
+
+        if response is None:
+            self.connection.send('Fetch.failRequest', {
+                'requestId': params['requestId'], 'errorReason': 'InternetDisconnected'
+            }, session_id=session_id)
+            return
+        headers = [h for h in response['headers'] if h['name'].lower() not in DROPPED_RESPONSE_HEADERS]
+        self.connection.send('Fetch.fulfillRequest', {
+            'requestId': params['requestId'],
+            'responseCode': response['status'],
+            'responseHeaders': headers,
+            'body': base64.b64encode(self.archive.read_body(response)).decode('ascii'),
+        }, session_id=session_id)
+
+    # ============ 结束 ============
+    def stop(self):
+        """断开连接；录制模式下写入归档索引"""
+        self.connection.close()
+        if self.mode == 'record':
+            self.archive.save()
+            print(f"🌐 已录制 {self.stats['recorded']} 个响应 → {self.archive.directory}")
+        else:
+            print(f"🌐 回放 {self.stats['replayed']} 个响应，未命中 {self.stats['missed']} 个")
+            for url in self.missed_urls[:10]:
+                print(f"   未命中: {url[:100]}")
+
+
+def main(argv: List[str] = None) -> int:
+    root = argv[0] if argv else ARCHIVE_ROOT
+    if not os.path.isdir(root):
+        print(f"归档目录不存在: {root}")
+        return 1
+    print(f"\n{'='*80}")
+    print(f"网络归档: {root}")
+    print(f"{'='*80}")
+    for name in sorted(os.listdir(root)):
+        archive = NetworkArchive(os.path.join(root, name))
+        responses = sum(len(items) for items in archive.entries.values())
+        size = sum(
+            os.path.getsize(os.path.join(archive.directory, 'bodies', item['body']))
+            for items in archive.entries.values() for item in items
+        )
+        print(f"  {name:<40} 请求 {len(archive.entries):>5} 个  响应 {responses:>5} 个  {size / 1024:>10.1f} KB")
+    print(f"{'='*80}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
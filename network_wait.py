@@ -0,0 +1,222 @@
+"""
+网络感知等待
+
+输入出发/到达城市后真正的完成信号是城市联想请求返回，点击"搜索"后是航班查询请求返回。
+本模块通过 ChromeDriver 的性能日志（DevTools Network 事件）跟踪步骤触发的请求：
+- 指定了URL模式的步骤：等待匹配的请求全部完成
+- 未指定URL模式或匹配请求迟迟没有发出：等待网络空闲（没有进行中的请求持续一小段时间）
+- 驱动没有开启性能日志时返回None，由调用方退回到原来的固定等待
+
+用法:
+  options = enable_network_log(Options())
+  driver = webdriver.Chrome(options=options)
+  monitor = NetworkMonitor.for_driver(driver)
+  since = time.time()
+  element.click()
+  monitor.wait(r"/search/api/search/batchSearch", since=since)
+"""
+
+import json
+import logging
+import re
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+
+# 这些类型的请求不影响页面是否"完成"（长连接、埋点、媒体等）
+IGNORED_RESOURCE_TYPES = {'WebSocket', 'EventSource', 'Ping', 'Media', 'Image', 'Font', 'Manifest', 'Other'}
+# 录制时可作为等待目标的请求类型
+WAITABLE_RESOURCE_TYPES = {'XHR', 'Fetch', 'Document'}
+
+DEFAULT_IDLE_TIME = 0.3       # 没有进行中请求持续这么久视为网络空闲（秒）
+DEFAULT_START_TIMEOUT = 3.0   # 匹配的请求在这段时间内没有发出时改为等待网络空闲（秒）
+STALE_REQUEST_AGE = 10.0      # 超过这个时间仍未完成的请求视为长轮询，不再等待（秒）
+POLL_INTERVAL = 0.05
+
+
+def enable_network_log(options):
+    """在Chrome选项中开启只包含Network事件的性能日志"""
+    options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    options.add_experimental_option('perfLoggingPrefs', {'enableNetwork': True, 'enablePage': False})
+    return options
+
+
+class _Request:
+    __slots__ = ('url', 'resource_type', 'started', 'finished', 'failed', 'size')
+
+    def __init__(self, url: str, resource_type: str, started: float):
+        self.url = url
+        self.resource_type = resource_type
+        self.started = started
+        self.finished: Optional[float] = None
+        self.failed = False
+        self.size = 0
+
+
+class NetworkMonitor:
+    """基于性能日志跟踪请求的开始与完成"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.requests: Dict[str, _Request] = {}
+        self.blocked: List[str] = []  # 被DevTools屏蔽的请求URL（供请求屏蔽统计）
+        self.available: Optional[bool] = None
+
+    @classmethod
+    def for_driver(cls, driver) -> 'NetworkMonitor':
+        """每个driver共用一个监视器（性能日志读取后即从浏览器端清空）"""
+        monitor = getattr(driver, 'network_monitor', None)
+        if monitor is None:
+            monitor = cls(driver)
+            try:
+                driver.network_monitor = monitor
+            except AttributeError:
+                pass
+        return monitor
+
+    # ============ 日志解析 ============
+    def poll(self) -> bool:
+        """读取新的性能日志并更新请求状态，返回性能日志是否可用"""
+        if self.available is False:
+            return False
+        try:
+            entries = self.driver.get_log('performance')
+        except Exception as e:
+            logging.debug(f"性能日志不可用: {e}")
+            self.available = False
+            return False
+        self.available = True
+
+        for entry in entries:
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+            self._handle_event(message.get('method', ''), message.get('params', {}))
+        return True
+
+    def _handle_event(self, method: str, params: dict):
+        request_id = params.get('requestId')
+        if method == 'Network.requestWillBeSent':
+            request = self.requests.get(request_id)
+            if request is not None and request.finished is None:
+                # 重定向沿用同一个requestId，只更新URL
+                request.url = params['request']['url']
+                return
+            self.requests[request_id] = _Request(
+                params['request']['url'], params.get('type', 'Other'),
+                params.get('wallTime') or time.time()
+            )
+        elif method in ('Network.loadingFinished', 'Network.loadingFailed'):
+            request = self.requests.get(request_id)
+            if request is not None:
+                request.finished = time.time()
+                request.failed = method == 'Network.loadingFailed'
+                request.size = params.get('encodedDataLength', 0)
+                if params.get('blockedReason'):
+                    self.blocked.append(request.url)
+
+    # ============ 等待 ============
+    def _pending(self, now: float) -> List[_Request]:
+        return [
+            request for request in self.requests.values()
+            if request.finished is None
+            and request.resource_type not in IGNORED_RESOURCE_TYPES
+            and now - request.started < STALE_REQUEST_AGE
+        ]
+
+    def wait(self, pattern: str = None, since: float = None, timeout: float = 15.0,
+             idle_time: float = DEFAULT_IDLE_TIME, start_timeout: float = DEFAULT_START_TIMEOUT) -> Optional[bool]:
+        """
+        等待步骤触发的请求完成
+
+        Args:
+            pattern: 请求URL的正则表达式；为空时直接等待网络空闲
+            since: 步骤开始的时间戳，只统计此后发出的请求
+            timeout: 最长等待时间
+
+        Returns:
+            True=等到了完成点，False=超时，None=性能日志不可用（调用方应退回固定等待）
+        """
+        waiter = self.start_wait(pattern, since, timeout, idle_time, start_timeout)
+        while True:
+            if not self.poll():
+                return None
+            result = waiter.check()
+            if result is not None:
+                return result
+            time.sleep(POLL_INTERVAL)
+
+    def start_wait(self, pattern: str = None, since: float = None, timeout: float = 15.0,
+                   idle_time: float = DEFAULT_IDLE_TIME,
+                   start_timeout: float = DEFAULT_START_TIMEOUT) -> '_NetworkWait':
+        """开始一次等待，由调用方在更新请求状态后反复调用 check()（异步执行器在事件循环中使用）"""
+        since = since if since is not None else time.time()
+        self.forget_finished(since)
+        return _NetworkWait(self, pattern, since, timeout, idle_time, start_timeout)
+
+    def finished_requests(self, since: float) -> List[str]:
+        """since之后发出并已完成的XHR/Fetch/文档请求URL（录制时供选择等待目标）"""
+        urls = []
+        for request in self.requests.values():
+            if (request.started >= since and request.finished is not None and not request.failed
+                    and request.resource_type in WAITABLE_RESOURCE_TYPES and request.url not in urls):
+                urls.append(request.url)
+        return urls
+
+    def take_blocked(self) -> List[str]:
+        """取出并清空已记录的被屏蔽请求"""
+        blocked, self.blocked = self.blocked, []
+        return blocked
+
+    def forget_finished(self, before: float):
+        """清理before之前发出且已完成的请求记录，避免长时间运行时无限增长"""
+        self.requests = {
+            key: r for key, r in self.requests.items()
+            if r.finished is None or r.started >= before
+        }
+
+
+class _NetworkWait:
+    """一次网络等待的状态：check() 返回 True=等到了完成点，False=超时，None=继续等待"""
+
+    def __init__(self, monitor: NetworkMonitor, pattern: Optional[str], since: float, timeout: float,
+                 idle_time: float, start_timeout: float):
+        self.monitor = monitor
+        self.pattern = pattern
+        self.regex = re.compile(pattern) if pattern else None
+        self.since = since
+        self.deadline = time.time() + timeout
+        self.idle_time = idle_time
+        self.start_timeout = start_timeout
+        self.idle_since: Optional[float] = None
+
+    def check(self) -> Optional[bool]:
+        now = time.time()
+        if self.regex is not None:
+            matched = [r for r in self.monitor.requests.values()
+                       if r.started >= self.since and self.regex.search(r.url)]
+            if matched and all(r.finished is not None for r in matched):
+                return True
+            if not matched and now - self.since >= self.start_timeout:
+                # 匹配的请求没有发出（页面走了缓存或接口变化），改为等待网络空闲
+                self.regex = None
+
+        if self.regex is None:
+            if self.monitor._pending(now):
+                self.idle_since = None
+            elif self.idle_since is None:
+                self.idle_since = now
+            elif now - self.idle_since >= self.idle_time:
+                return True
+
+        if now >= self.deadline:
+            logging.warning(f"等待网络请求超时: {self.pattern or '网络空闲'}")
+            return False
+        return None
+
+
+def url_to_pattern(url: str) -> str:
+    """把具体请求URL转换为等待用的正则：只保留路径部分，忽略域名和查询参数"""
+    return re.escape(urlparse(url).path)
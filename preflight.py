@@ -0,0 +1,351 @@
+"""
+定位器预检
+
+携程改版后，原来要等套件逐个步骤执行到失效的定位器，每个都要等满10~25秒的查找超时才知道。
+预检只走一遍套件需要的页面状态，在每个页面状态用一次浏览器调用批量检查所有待检步骤的主定位器和备选定位器：
+- 是否存在、是否唯一、是否可见（有尺寸且未被 display/visibility/opacity 隐藏）
+- 当前步骤的定位器可用时才执行它推进到下一个页面状态；不可用则立即停止，其后的步骤报告为无法到达，不等待任何查找超时
+- 各需求的定位器序列相同（只是输入数据不同）时只走一遍，结果按位置对应到每个需求的步骤
+
+步骤状态:
+  ok           主定位器唯一且可见
+  fallback     主定位器失效，某个备选定位器唯一且可见（套件能通过，但应更新主定位器）
+  ambiguous    匹配到多个元素（套件会操作第一个，可能点错）
+  hidden       元素存在但不可见
+  missing      主定位器和所有备选定位器都找不到元素            ← 失效
+  failed       定位器可用，但执行该步骤推进页面状态时出错        ← 失效
+  unreachable  前面的步骤失效，无法到达该步骤所在的页面状态     ← 失效
+
+用法:
+  python preflight.py                               # 预检 TestCtripFlight.py，有失效步骤时返回1
+  python preflight.py --script TestCtripFlight.py --json preflight_report.json
+  CTRIP_PREFLIGHT=report pytest TestCtripFlight.py -s   # 套件运行前先预检并输出报告
+  CTRIP_PREFLIGHT=abort pytest TestCtripFlight.py -s    # 有失效步骤时中止整个运行
+
+环境变量:
+  CTRIP_PREFLIGHT=off|report|abort     # 生成的测试脚本中是否在运行前预检（默认off）
+  CTRIP_PREFLIGHT_SETTLE=2             # 当前步骤暂时找不到时的重新检查时长（秒），等待弹层动画、异步渲染
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from step_tables import load_step_tables, load_test_module
+
+
+SETTLE_SECONDS = float(os.environ.get('CTRIP_PREFLIGHT_SETTLE', '2'))
+BROKEN_STATUSES = ('missing', 'failed', 'unreachable')
+WARNING_STATUSES = ('fallback', 'ambiguous', 'hidden')
+
+# 一次调用检查一组定位器：返回当前URL以及每个定位器的匹配数、可见匹配数（定位器语法错误时返回error）
+LOCATOR_CHECK_JS = """
+var locators = arguments[0];
+
+function byCss(selector) {
+    return Array.prototype.slice.call(document.querySelectorAll(selector));
+}
+
+function byXpath(expression) {
+    var snapshot = document.evaluate(expression, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    var nodes = [];
+    for (var i = 0; i < snapshot.snapshotLength; i++) {
+        if (snapshot.snapshotItem(i).nodeType === 1) { nodes.push(snapshot.snapshotItem(i)); }
+    }
+    return nodes;
+}
+
+function byLinkText(text, partial) {
+    return byCss('a').filter(function (a) {
+        var linkText = (a.innerText || '').trim();
+        return partial ? linkText.indexOf(text) >= 0 : linkText === text;
+    });
+}
+
+function find(by, value) {
+    switch (by) {
+        case 'css selector': return byCss(value);
+        case 'xpath': return byXpath(value);
+        case 'id': return byCss('[id="' + CSS.escape(value) + '"]');
+        case 'name': return byCss('[name="' + CSS.escape(value) + '"]');
+        case 'class name': return byCss('.' + CSS.escape(value));
+        case 'tag name': return byCss(value);
+        case 'link text': return byLinkText(value, false);
+        case 'partial link text': return byLinkText(value, true);
+    }
+    throw new Error('unsupported locator strategy: ' + by);
+}
+
+function visible(el) {
+    var style = window.getComputedStyle(el);
+    if (style.display === 'none' || style.visibility === 'hidden' || Number(style.opacity) === 0) { return false; }
+    var rect = el.getBoundingClientRect();
+    return rect.width > 0 && rect.height > 0;
+}
+
+return {
+    url: location.href,
+    results: locators.map(function (locator) {
+        try {
+            var elements = find(locator[0], locator[1]);
+            return {count: elements.length, visible: elements.filter(visible).length};
+        } catch (e) {
+            return {count: 0, visible: 0, error: String(e.message || e)};
+        }
+    })
+};
+"""
+
+
+def _by_value(by_name: str) -> str:
+    """把步骤表中的By名称（'CSS_SELECTOR' 或 'By.CSS_SELECTOR'）还原为定位策略（'css selector'）"""
+    from selenium.webdriver.common.by import By
+
+    return getattr(By, by_name.replace('By.', ''), by_name)
+
+
+def step_locators(step: Dict) -> List[Tuple[str, str]]:
+    """步骤的主定位器和备选定位器，按查找顺序"""
+    return [(_by_value(step['by_type']), step['locator'])] + [
+        (_by_value(alt_by), alt_locator) for alt_by, alt_locator in step.get('alternative_locators', [])
+    ]
+
+
+def classify(checks: List[Dict]) -> Tuple[str, Optional[int]]:
+    """
+    根据一个步骤所有定位器的检查结果判定状态
+
+    Returns:
+        (状态, 生效的定位器下标) —— 0为主定位器，i为第i个备选定位器，没有可用定位器时为None
+    """
+    for index, check in enumerate(checks):
+        if check['count'] == 1 and check['visible'] == 1:
+            return ('ok' if index == 0 else 'fallback'), index
+    # 没有唯一且可见的定位器：按查找顺序取第一个能匹配到元素的（套件实际会使用它）
+    for index, check in enumerate(checks):
+        if check['visible'] > 0:
+            return 'ambiguous', index
+    for index, check in enumerate(checks):
+        if check['count'] > 0:
+            return 'hidden', index
+    return 'missing', None
+
+
+class LocatorPreflight:
+    """沿套件的页面状态批量检查每个步骤的定位器"""
+
+    def __init__(self, precondition_steps: List[Dict], requirements: Dict[str, List[Dict]],
+                 settle: float = SETTLE_SECONDS):
+        self.settle = settle
+        # 定位器序列相同的需求只走一遍：[(需求编号列表, 完整步骤序列)]
+        self.walks: List[Tuple[List[str], List[Dict]]] = []
+        self.paths: Dict[str, List[Dict]] = {}
+        signatures: Dict[Tuple, int] = {}
+        for req_id in sorted(requirements):
+            path = self.paths[req_id] = list(precondition_steps) + list(requirements[req_id])
+            signature = tuple((step['action_type'], tuple(step_locators(step))) for step in path)
+            if signature in signatures:
+                self.walks[signatures[signature]][0].append(req_id)
+            else:
+                signatures[signature] = len(self.walks)
+                self.walks.append(([req_id], path))
+
+        # {test_case_id: {'status', 'locator_index', 'locators': [...], 'url', 'error'}}
+        self.results: Dict[str, Dict] = {}
+        self.queries = 0
+        self.duration = 0.0
+
+    @classmethod
+    def from_test_module(cls, module, **kwargs) -> 'LocatorPreflight':
+        """从生成的测试脚本模块读取步骤表"""
+        precondition_steps, requirements = load_step_tables(module)
+        return cls(precondition_steps, requirements, **kwargs)
+
+    @property
+    def broken(self) -> List[str]:
+        return [test_case_id for test_case_id, result in self.results.items() if result['status'] in BROKEN_STATUSES]
+
+    @property
+    def warnings(self) -> List[str]:
+        return [test_case_id for test_case_id, result in self.results.items() if result['status'] in WARNING_STATUSES]
+
+    # ============ 执行 ============
+    def run(self, driver, executor, restart_url: str = None) -> Dict[str, Dict]:
+        """
+        依次走完每组需求的页面状态
+
+        Args:
+            driver: 已打开初始页面的WebDriver
+            executor: 提供 execute_action 和 step_timeout 的对象（通常是生成脚本中的 BaseCtripFlight 实例）
+            restart_url: 开始下一组需求前重新打开的URL（默认为开始时的URL）
+        """
+        started = time.time()
+        restart_url = restart_url or driver.current_url
+        home = driver.current_window_handle
+        self.results = {}
+        self.queries = 0
+
+        for index, (req_ids, path) in enumerate(self.walks):
+            if index > 0:
+                self._restart(driver, home, restart_url)
+            print(f"🛫 预检 {', '.join(req_ids)}（{len(path)} 个步骤）")
+            walk_results = self._walk(driver, executor, path)
+            for req_id in req_ids:
+                # 同一组的需求步骤数和顺序相同，结果按位置对应；共享的前置步骤只保留第一次的结果
+                for step, result in zip(self.paths[req_id], walk_results):
+                    self.results.setdefault(step['test_case_id'], dict(result, test_name=step['test_name'],
+                                                                       action_type=step['action_type']))
+
+        self.duration = time.time() - started
+        return self.results
+
+    def _walk(self, driver, executor, path: List[Dict]) -> List[Dict]:
+        results: List[Optional[Dict]] = [None] * len(path)
+        stopped_at = None
+        for i, step in enumerate(path):
+            if step['action_type'] != 'window_switch':
+                # 当前页面状态：一次调用检查当前步骤及其后所有尚未确认可用的步骤
+                pending = [j for j in range(i, len(path)) if path[j]['action_type'] != 'window_switch'
+                           and (results[j] is None or results[j]['status'] != 'ok')]
+                self._check(driver, path, pending, results)
+                deadline = time.time() + self.settle
+                while results[i]['status'] == 'missing' and time.time() < deadline:
+                    # 弹层动画、异步渲染：只重新检查当前步骤
+                    time.sleep(0.2)
+                    self._check(driver, path, [i], results)
+                if results[i]['status'] == 'missing':
+                    stopped_at = i
+                    break
+            else:
+                results[i] = {'status': 'ok', 'locator_index': None, 'locators': [], 'url': None, 'error': None}
+
+            try:
+                self._execute_step(driver, executor, step, results[i]['locator_index'])
+            except Exception as e:
+                logging.debug(f"预检执行步骤失败: {step['test_case_id']}: {e}")
+                results[i]['status'] = 'failed'
+                results[i]['error'] = str(e).strip().split('\n')[0]
+                stopped_at = i
+                break
+
+        if stopped_at is not None:
+            blocked_by = path[stopped_at]['test_case_id']
+            for j in range(stopped_at + 1, len(path)):
+                if results[j] is None or results[j]['status'] != 'ok':
+                    results[j] = dict(results[j] or {'locator_index': None, 'locators': [], 'url': None},
+                                      status='unreachable', error=f"{blocked_by} 失效")
+        return results
+
+    def _check(self, driver, path: List[Dict], indexes: List[int], results: List[Optional[Dict]]):
+        """一次浏览器调用检查多个步骤的全部定位器，更新这些步骤的结果（已可用的结果不会被覆盖）"""
+        locators, owners = [], []
+        for j in indexes:
+            for locator in step_locators(path[j]):
+                locators.append(list(locator))
+                owners.append(j)
+        self.queries += 1
+        response = driver.execute_script(LOCATOR_CHECK_JS, locators) or {}
+        checks = response.get('results') or [{'count': 0, 'visible': 0}] * len(locators)
+
+        for j in indexes:
+            step_checks = [
+                dict(check, by=locator[0], locator=locator[1])
+                for check, locator, owner in zip(checks, locators, owners) if owner == j
+            ]
+            status, locator_index = classify(step_checks)
+            previous = results[j]
+            if previous is not None and previous['status'] != 'missing' and status == 'missing':
+                continue  # 以前的页面状态中能找到，保留（该步骤到自己的页面状态时会再检查）
+            errors = [check['error'] for check in step_checks if check.get('error')]
+            results[j] = {'status': status, 'locator_index': locator_index, 'locators': step_checks,
+                          'url': response.get('url'), 'error': errors[0] if errors else None}
+
+    @staticmethod
+    def _execute_step(driver, executor, step: Dict, locator_index: Optional[int]):
+        """执行步骤推进页面状态；预检已确认可用的定位器放在首位，查找不用等待失效定位器的超时"""
+        locators = step_locators(step)
+        if locator_index:
+            locators.insert(0, locators.pop(locator_index))
+        by_type, locator = locators[0]
+        executor.execute_action(driver, by_type, locator, step['action_type'],
+                                step.get('input_data') or None, locators[1:], step.get('wait_for'),
+                                step.get('fingerprint'), executor.step_timeout(step['test_case_id']))
+
+    @staticmethod
+    def _restart(driver, home: str, url: str):
+        """关闭上一组需求打开的窗口，回到初始页面"""
+        for handle in driver.window_handles:
+            if handle != home:
+                try:
+                    driver.switch_to.window(handle)
+                    driver.close()
+                except Exception as e:
+                    logging.debug(f"关闭窗口失败: {e}")
+        driver.switch_to.window(home)
+        driver.get(url)
+
+    # ============ 报告 ============
+    def print_report(self):
+        counts = {}
+        for result in self.results.values():
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+        print(f"\n{'='*80}")
+        print(f"🛫 定位器预检: {len(self.results)} 个步骤，用时 {self.duration:.1f}s，批量查询 {self.queries} 次")
+        print('   ' + '  '.join(f"{status} {count}" for status, count in sorted(counts.items())))
+        print(f"{'='*80}")
+
+        for test_case_id in self.broken + self.warnings:
+            result = self.results[test_case_id]
+            icon = '✗' if result['status'] in BROKEN_STATUSES else '⚠'
+            print(f"  {icon} {test_case_id} {result['test_name']} [{result['status']}]"
+                  f"{'  ' + result['error'] if result.get('error') else ''}")
+            for index, check in enumerate(result['locators']):
+                label = '主定位器' if index == 0 else f"备选{index}"
+                mark = ' ←' if index == result['locator_index'] else ''
+                print(f"      {label}: {check['locator']}  匹配 {check['count']}，可见 {check['visible']}{mark}")
+
+        if not self.broken and not self.warnings:
+            print("  ✓ 所有步骤的主定位器唯一且可见")
+        print(f"{'='*80}")
+
+    def write_report(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'duration': round(self.duration, 2), 'queries': self.queries,
+                       'broken': self.broken, 'warnings': self.warnings, 'results': self.results},
+                      f, ensure_ascii=False, indent=2)
+
+
+def run_preflight(module, abort: bool = False) -> LocatorPreflight:
+    """用生成脚本的 create_driver / BaseCtripFlight 预检整个套件（生成脚本的 fixture 与命令行共用）"""
+    preflight = LocatorPreflight.from_test_module(module)
+    driver = module.create_driver("preflight")
+    try:
+        preflight.run(driver, module.BaseCtripFlight(), restart_url=getattr(module, 'INITIAL_URL', None))
+    finally:
+        module.release_driver(driver)
+    preflight.print_report()
+    if abort and preflight.broken:
+        import pytest
+
+        pytest.exit(f"定位器预检发现 {len(preflight.broken)} 个失效步骤，已中止运行", returncode=1)
+    return preflight
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="定位器预检")
+    parser.add_argument('--script', default='TestCtripFlight.py', help="生成的测试脚本路径")
+    parser.add_argument('--json', dest='json_file', help="把预检结果写入JSON文件")
+    args = parser.parse_args(argv)
+
+    preflight = run_preflight(load_test_module(args.script))
+    if args.json_file:
+        preflight.write_report(args.json_file)
+    return 1 if preflight.broken else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
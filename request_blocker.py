@@ -0,0 +1,311 @@
+"""
+第三方请求屏蔽
+
+携程页面会加载大量与机票查询流程无关的统计、广告和追踪请求，拖慢每次 driver.get 和页面稳定等待。
+本模块通过 DevTools 的 Network.setBlockedURLs 按URL模式屏蔽这些请求
+（浏览器级连接自动附加新打开的页面，每个页面都在发出第一个请求前启用屏蔽）；
+资源类型（Image、Media、Font）换算为对应扩展名的URL模式一并屏蔽。
+
+- 录制工具：Config.BLOCK_REQUESTS / BLOCKED_URL_PATTERNS / BLOCKED_RESOURCE_TYPES
+- 生成的测试脚本：脚本头部的 BLOCKED_URL_PATTERNS / BLOCKED_RESOURCE_TYPES，
+  设置环境变量 CTRIP_BLOCK_REQUESTS=0 关闭
+- 每次运行统计被屏蔽的请求数和节省的流量（流量按基准测试中记录的请求大小估算）
+
+用法:
+  python request_blocker.py --benchmark                  # 屏蔽/不屏蔽交替加载页面，对比页面就绪时间
+  python request_blocker.py --benchmark --repeat 5 --url https://flights.ctrip.com
+"""
+
+import argparse
+import fnmatch
+import json
+import logging
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+
+# 默认屏蔽的统计、广告、追踪请求（Network.setBlockedURLs 的通配符格式）
+DEFAULT_BLOCKED_URL_PATTERNS = [
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*googlesyndication.com*",
+    "*hm.baidu.com*",
+    "*cnzz.com*",
+    "*ubt*.ctrip.com*",
+    "*/bf.gif*",
+    "*/ubtrace*",
+    "*/sensorsdata*",
+]
+
+# 默认屏蔽的资源类型（Image会改变部分页面布局，需要时再手动加入）
+DEFAULT_BLOCKED_RESOURCE_TYPES = ['Media']
+
+# 资源类型对应的URL扩展名
+RESOURCE_TYPE_EXTENSIONS = {
+    'Image': ['png', 'jpg', 'jpeg', 'gif', 'webp', 'svg', 'ico', 'bmp'],
+    'Media': ['mp4', 'webm', 'mp3', 'm3u8', 'ogg', 'wav', 'flv'],
+    'Font': ['woff', 'woff2', 'ttf', 'otf', 'eot'],
+}
+
+SIZE_FILE = 'blocked_request_sizes.json'
+
+
+class RequestBlocker:
+    """通过DevTools屏蔽请求，并统计屏蔽数量和节省的流量"""
+
+    def __init__(self, url_patterns: List[str] = None, resource_types: List[str] = None,
+                 enabled: bool = True, size_file: str = SIZE_FILE):
+        self.url_patterns = list(DEFAULT_BLOCKED_URL_PATTERNS if url_patterns is None else url_patterns)
+        self.resource_types = list(DEFAULT_BLOCKED_RESOURCE_TYPES if resource_types is None else resource_types)
+        self.enabled = enabled
+        self.size_file = size_file
+        self._sizes: Optional[Dict[str, int]] = None
+        self.blocked_requests = 0
+        self.blocked_bytes = 0
+        self.unknown_size_requests = 0
+
+    @property
+    def patterns(self) -> List[str]:
+        """URL模式 + 资源类型换算得到的扩展名模式"""
+        patterns = list(self.url_patterns)
+        for resource_type in self.resource_types:
+            for extension in RESOURCE_TYPE_EXTENSIONS.get(resource_type, []):
+                patterns.append(f"*.{extension}")
+                patterns.append(f"*.{extension}?*")
+        return patterns
+
+    def matches(self, url: str) -> bool:
+        return any(fnmatch.fnmatchcase(url, pattern) for pattern in self.patterns)
+
+    def apply(self, driver) -> bool:
+        """在浏览器中启用屏蔽（驱动不支持DevTools命令时返回False）
+
+        execute_cdp_cmd 只作用于当前页面；另外通过浏览器级DevTools连接自动附加之后打开的页面，
+        新页面先暂停，启用屏蔽后再继续加载，点击打开的新窗口从第一个请求起就被屏蔽
+        """
+        if not self.enabled:
+            return False
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.patterns})
+        except Exception as e:
+            logging.warning(f"启用请求屏蔽失败: {e}")
+            return False
+        self._attach_targets(driver)
+        return True
+
+    def _attach_targets(self, driver):
+        from network_replay import CdpConnection, browser_websocket_url
+
+        def block(session_id: str):
+            try:
+                connection.send('Network.enable', session_id=session_id)
+                connection.send('Network.setBlockedURLs', {'urls': patterns}, session_id=session_id)
+            except RuntimeError as e:
+                logging.debug(f"新页面启用请求屏蔽失败: {e}")
+
+        def handle_event(method: str, params: dict, session_id: Optional[str]):
+            if method != 'Target.attachedToTarget':
+                return
+            if params['targetInfo']['type'] == 'page':
+                block(params['sessionId'])
+            try:
+                connection.send('Runtime.runIfWaitingForDebugger', session_id=params['sessionId'])
+            except RuntimeError:
+                pass
+
+        patterns = self.patterns
+        self.detach(driver)
+        try:
+            connection = CdpConnection(browser_websocket_url(driver), handle_event)
+        except Exception as e:
+            logging.debug(f"连接浏览器级DevTools失败，只屏蔽当前页面: {e}")
+            return
+        try:
+            driver.request_blocking = connection
+        except AttributeError:
+            pass
+        try:
+            connection.send('Target.setAutoAttach', {
+                'autoAttach': True, 'waitForDebuggerOnStart': True, 'flatten': True
+            })
+        except (RuntimeError, TimeoutError) as e:
+            logging.debug(f"自动附加新页面失败: {e}")
+
+    @staticmethod
+    def detach(driver):
+        """断开浏览器级连接（释放驱动前调用；常驻浏览器守护进程中的浏览器不会再屏蔽之后打开的页面）"""
+        connection = getattr(driver, 'request_blocking', None)
+        if connection is not None:
+            connection.close()
+            try:
+                driver.request_blocking = None
+            except AttributeError:
+                pass
+
+    @classmethod
+    def remove(cls, driver):
+        cls.detach(driver)
+        try:
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': []})
+        except Exception as e:
+            logging.debug(f"取消请求屏蔽失败: {e}")
+
+    # ============ 统计 ============
+    @property
+    def sizes(self) -> Dict[str, int]:
+        """基准测试中不屏蔽时记录的请求大小 {host+path: 字节数}"""
+        if self._sizes is None:
+            self._sizes = {}
+            if self.size_file and os.path.exists(self.size_file):
+                try:
+                    with open(self.size_file, 'r', encoding='utf-8') as f:
+                        self._sizes = json.load(f)
+                except (OSError, ValueError) as e:
+                    logging.warning(f"读取请求大小记录失败: {e}")
+        return self._sizes
+
+    @staticmethod
+    def size_key(url: str) -> str:
+        parsed = urlparse(url)
+        return f"{parsed.netloc}{parsed.path}"
+
+    def collect(self, driver):
+        """从驱动的网络监视器中汇总被屏蔽的请求（释放驱动前调用）"""
+        from network_wait import NetworkMonitor
+
+        monitor = NetworkMonitor.for_driver(driver)
+        monitor.poll()
+        for url in monitor.take_blocked():
+            self.blocked_requests += 1
+            size = self.sizes.get(self.size_key(url))
+            if size is None:
+                self.unknown_size_requests += 1
+            else:
+                self.blocked_bytes += size
+
+    def summary(self) -> Dict:
+        return {
+            'blocked_requests': self.blocked_requests,
+            'blocked_bytes': self.blocked_bytes,
+            'unknown_size_requests': self.unknown_size_requests,
+        }
+
+    def print_summary(self):
+        if not self.enabled:
+            return
+        print(f"\n🚫 已屏蔽第三方请求: {self.blocked_requests} 个，"
+              f"节省流量约 {self.blocked_bytes / 1024:.1f} KB"
+              + (f"（{self.unknown_size_requests} 个请求大小未知）" if self.unknown_size_requests else ""))
+
+    def learn_sizes(self, monitor):
+        """记录不屏蔽时会被屏蔽的请求的实际大小，用于估算节省的流量"""
+        for request in monitor.requests.values():
+            if request.finished is not None and request.size and self.matches(request.url):
+                self.sizes[self.size_key(request.url)] = request.size
+        if self.size_file:
+            with open(self.size_file, 'w', encoding='utf-8') as f:
+                json.dump(self.sizes, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+# ============ A/B 基准测试 ============
+PAGE_LOAD_JS = """
+    var nav = performance.getEntriesByType('navigation')[0];
+    return nav ? {dom_ready: nav.domContentLoadedEventEnd, load: nav.loadEventEnd} : null;
+"""
+
+
+def _load_page(driver, monitor, url: str) -> Dict:
+    """冷缓存加载一次页面，返回页面就绪耗时和流量"""
+    driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+    driver.get('about:blank')
+    monitor.poll()
+    monitor.take_blocked()
+
+    since = time.time()
+    driver.get(url)
+    monitor.wait(since=since, timeout=30, idle_time=0.5)
+    ready_ms = (time.time() - since) * 1000
+    timing = driver.execute_script(PAGE_LOAD_JS) or {}
+
+    finished = [r for r in monitor.requests.values() if r.started >= since and r.finished is not None]
+    return {
+        'ready_ms': ready_ms,
+        'dom_ready_ms': timing.get('dom_ready', 0),
+        'load_ms': timing.get('load', 0),
+        'requests': len(finished),
+        'bytes': sum(r.size for r in finished),
+        'blocked': len(monitor.take_blocked()),
+    }
+
+
+def run_benchmark(url: str, repeat: int = 3, blocker: RequestBlocker = None) -> Dict[str, Dict]:
+    """屏蔽/不屏蔽交替加载页面（降低网络波动的影响），返回两种模式的中位数"""
+    import statistics
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from network_wait import NetworkMonitor, enable_network_log
+
+    blocker = blocker or RequestBlocker()
+    driver = webdriver.Chrome(options=enable_network_log(Options()))
+    monitor = NetworkMonitor.for_driver(driver)
+    samples: Dict[str, List[Dict]] = {'off': [], 'on': []}
+    try:
+        for i in range(repeat):
+            for mode in ('off', 'on'):
+                if mode == 'on':
+                    blocker.apply(driver)
+                else:
+                    blocker.remove(driver)
+                sample = _load_page(driver, monitor, url)
+                samples[mode].append(sample)
+                if mode == 'off':
+                    blocker.learn_sizes(monitor)
+                print(f"  第{i + 1}轮 {'屏蔽' if mode == 'on' else '不屏蔽'}: 就绪 {sample['ready_ms']:.0f} ms，"
+                      f"load {sample['load_ms']:.0f} ms，请求 {sample['requests']} 个，"
+                      f"{sample['bytes'] / 1024:.0f} KB，屏蔽 {sample['blocked']} 个")
+    finally:
+        driver.quit()
+
+    return {
+        mode: {key: statistics.median(s[key] for s in runs) for key in runs[0]}
+        for mode, runs in samples.items() if runs
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="第三方请求屏蔽")
+    parser.add_argument('--benchmark', action='store_true', help="对比屏蔽前后的页面就绪时间")
+    parser.add_argument('--url', default='https://www.ctrip.com', help="基准测试页面")
+    parser.add_argument('--repeat', type=int, default=3, help="每种模式的加载次数")
+    args = parser.parse_args(argv)
+
+    blocker = RequestBlocker()
+    if not args.benchmark:
+        print("屏蔽的URL模式:")
+        for pattern in blocker.patterns:
+            print(f"  {pattern}")
+        return 0
+
+    print(f"\n{'='*80}")
+    print(f"请求屏蔽基准测试: {args.url}（每种模式 {args.repeat} 次，冷缓存）")
+    print(f"{'='*80}")
+    result = run_benchmark(args.url, args.repeat, blocker)
+    off, on = result['off'], result['on']
+    print(f"\n{'-'*80}")
+    print(f"  {'指标（中位数）':<16}{'不屏蔽':>12}{'屏蔽':>12}{'变化':>12}")
+    for key, label, unit in [('ready_ms', '页面就绪', 'ms'), ('load_ms', 'load事件', 'ms'),
+                             ('dom_ready_ms', 'DOMContentLoaded', 'ms'), ('requests', '请求数', '个'),
+                             ('bytes', '流量', 'B')]:
+        change = f"{(on[key] - off[key]) / off[key]:+.1%}" if off[key] else "-"
+        print(f"  {label:<16}{off[key]:>10.0f}{unit:>2}{on[key]:>10.0f}{unit:>2}{change:>12}")
+    print(f"{'='*80}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,423 @@
+"""
+浏览器资源监控与自动回收
+
+driver在整个需求类（或更长时间）内复用，Chrome占用的内存随步骤不断增长，最终拖慢运行甚至导致渲染进程崩溃。
+本模块在每个步骤通过后采样一次浏览器资源：
+- Chrome进程树的内存（Linux读取PSS，避免多进程共享页被重复计算；其他平台需要安装 psutil，统计RSS）
+  以及其中渲染进程（--type=renderer）的内存
+- 进程树的CPU占用率（两次采样之间的CPU时间 / 经过的时间）
+- 当前页面的JS堆大小和DOM节点数（DevTools Performance.getMetrics）
+
+超过任一阈值（步骤数、进程树内存、JS堆）时在下一个步骤开始前回收浏览器：保留全部Cookie，关闭旧浏览器并创建新的。
+携程的表单状态（已输入的城市、选中的日期等）只存在于页面内存中，URL和存储恢复不了，
+所以生成的测试脚本在新浏览器中从初始页面重放该需求已通过的步骤（前置步骤 + 业务步骤）后再继续；
+不重放时（restore=True）按原顺序重新打开各窗口的URL并恢复存储。
+测试拿到的是 RecyclableDriver 代理，回收前后是同一个对象。
+连接浏览器守护进程时不回收：守护进程中的浏览器在断开会话后依然存在，重新连接的还是同一个浏览器，内存不会下降。
+
+运行结束时按浏览器实例输出内存曲线，并把全部采样写入JSON报告。
+
+环境变量:
+  CTRIP_RESOURCE_MONITOR=1          # 0 关闭采样和回收
+  CTRIP_RECYCLE_STEPS=0             # 同一浏览器执行这么多步骤后回收（0表示不按步骤数回收）
+  CTRIP_RECYCLE_MB=2048             # 进程树内存超过这么多MB时回收（0表示不限制）
+  CTRIP_RECYCLE_HEAP_MB=512         # 当前页面JS堆超过这么多MB时回收（0表示不限制）
+  CTRIP_RESOURCE_REPORT=resource_usage.json
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+
+RESOURCE_MONITOR = os.environ.get('CTRIP_RESOURCE_MONITOR', '1') == '1'
+RECYCLE_STEPS = int(os.environ.get('CTRIP_RECYCLE_STEPS', '0'))
+RECYCLE_MB = float(os.environ.get('CTRIP_RECYCLE_MB', '2048'))
+RECYCLE_HEAP_MB = float(os.environ.get('CTRIP_RECYCLE_HEAP_MB', '512'))
+RESOURCE_REPORT = os.environ.get('CTRIP_RESOURCE_REPORT', 'resource_usage.json')
+
+MB = 1024 * 1024
+SPARKLINE = '▁▂▃▄▅▆▇█'
+
+# 读取当前窗口的URL和localStorage/sessionStorage：生成的测试脚本的检查点和回收前的窗口快照共用
+CHECKPOINT_JS = """
+    function dump(storage) {
+        var items = {};
+        for (var i = 0; i < storage.length; i++) {
+            var key = storage.key(i);
+            items[key] = storage.getItem(key);
+        }
+        return items;
+    }
+    return {url: location.href, local: dump(localStorage), session: dump(sessionStorage)};
+"""
+
+# 恢复 CHECKPOINT_JS 读取的存储
+RESTORE_STORAGE_JS = """
+    var state = arguments[0];
+    for (var key in state.local) { localStorage.setItem(key, state.local[key]); }
+    for (var key in state.session) { sessionStorage.setItem(key, state.session[key]); }
+"""
+
+
+# ============ 进程采样 ============
+def _proc_tree(root_pids: List[int]) -> List[int]:
+    """/proc 中以root_pids为根的全部进程"""
+    parents: Dict[int, int] = {}
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat', 'r') as f:
+                # comm字段可能包含空格，从最后一个')'之后解析
+                parents[int(name)] = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    tree, frontier = [pid for pid in root_pids if pid in parents], list(root_pids)
+    while frontier:
+        pid = frontier.pop()
+        for child, parent in parents.items():
+            if parent == pid and child not in tree:
+                tree.append(child)
+                frontier.append(child)
+    return tree
+
+
+def _proc_memory(pid: int) -> int:
+    for path, field in ((f'/proc/{pid}/smaps_rollup', 'Pss:'), (f'/proc/{pid}/status', 'VmRSS:')):
+        try:
+            with open(path, 'r') as f:
+                for line in f:
+                    if line.startswith(field):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError):
+            continue
+    return 0
+
+
+def _proc_cpu_seconds(pid: int) -> float:
+    try:
+        with open(f'/proc/{pid}/stat', 'r') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, IndexError, ValueError):
+        return 0.0
+
+
+def _proc_is_renderer(pid: int) -> bool:
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            return b'--type=renderer' in f.read()
+    except OSError:
+        return False
+
+
+def process_tree_stats(root_pids: List[int]) -> Optional[Dict]:
+    """
+    进程树的资源占用（/proc 和 psutil 都不可用时返回None）
+
+    Returns:
+        {'processes': 进程数, 'memory': 字节数, 'renderer_memory': 渲染进程字节数, 'cpu_seconds': 累计CPU秒数}
+    """
+    stats = {'processes': 0, 'memory': 0, 'renderer_memory': 0, 'cpu_seconds': 0.0}
+    if os.path.isdir('/proc'):
+        for pid in _proc_tree(root_pids):
+            memory = _proc_memory(pid)
+            stats['processes'] += 1
+            stats['memory'] += memory
+            stats['cpu_seconds'] += _proc_cpu_seconds(pid)
+            if _proc_is_renderer(pid):
+                stats['renderer_memory'] += memory
+        return stats
+
+    try:
+        import psutil
+    except ImportError:
+        return None
+    for root in root_pids:
+        try:
+            process = psutil.Process(root)
+            processes = [process] + process.children(recursive=True)
+        except psutil.Error:
+            continue
+        for p in processes:
+            try:
+                memory = p.memory_info().rss
+                cpu = p.cpu_times()
+                stats['processes'] += 1
+                stats['memory'] += memory
+                stats['cpu_seconds'] += cpu.user + cpu.system
+                if '--type=renderer' in p.cmdline():
+                    stats['renderer_memory'] += memory
+            except psutil.Error:
+                continue
+    return stats
+
+
+def process_tree_memory(root_pids: List[int]) -> Optional[int]:
+    """进程树占用的内存字节数（不可用时返回None）"""
+    stats = process_tree_stats(root_pids)
+    return stats['memory'] if stats is not None else None
+
+
+def browser_root_pids(driver) -> List[int]:
+    """driver所控制的Chrome进程树的根：chromedriver进程（Chrome是它的子进程）或守护进程中的Chrome"""
+    daemon = getattr(driver, 'browser_daemon', None)
+    if daemon is not None:
+        pid = daemon.status().get('pid')
+        return [pid] if pid else []
+    process = getattr(getattr(driver, 'service', None), 'process', None)
+    return [process.pid] if process is not None else []
+
+
+# ============ 监控与回收 ============
+class ResourceMonitor:
+    """每步采样浏览器资源，判断是否需要回收，并汇总每个浏览器实例的内存曲线"""
+
+    def __init__(self, enabled: bool = RESOURCE_MONITOR, max_steps: int = RECYCLE_STEPS,
+                 max_mb: float = RECYCLE_MB, max_heap_mb: float = RECYCLE_HEAP_MB,
+                 report_file: str = RESOURCE_REPORT):
+        self.enabled = enabled
+        self.max_steps = max_steps
+        self.max_mb = max_mb
+        self.max_heap_mb = max_heap_mb
+        self.report_file = report_file
+        self.browsers: List[Dict] = []   # 每个浏览器实例：{'name', 'started', 'recycled', 'samples': [...]}
+
+    def start_browser(self, driver, name: str) -> Dict:
+        """登记一个新创建的浏览器实例"""
+        browser = {'name': name, 'started': round(time.time(), 3), 'recycled': None, 'samples': []}
+        self.browsers.append(browser)
+        driver.resource_browser = browser
+        driver.resource_state = {'steps': 0, 'cpu_seconds': None, 'time': time.monotonic()}
+        if self.enabled:
+            try:
+                driver.execute_cdp_cmd('Performance.enable', {})
+            except Exception as e:
+                logging.debug(f"启用性能指标失败: {e}")
+        return browser
+
+    def sample(self, driver, label: str) -> Optional[Dict]:
+        """采样一次（进程树内存与CPU、JS堆、DOM节点数），返回采样记录"""
+        browser = getattr(driver, 'resource_browser', None)
+        if not self.enabled or browser is None:
+            return None
+        state = driver.resource_state
+        state['steps'] += 1
+        record = {'label': label, 'step': state['steps'], 'ts': round(time.time(), 3)}
+
+        stats = process_tree_stats(browser_root_pids(driver))
+        now = time.monotonic()
+        if stats is not None:
+            record['memory_mb'] = round(stats['memory'] / MB, 1)
+            record['renderer_mb'] = round(stats['renderer_memory'] / MB, 1)
+            record['processes'] = stats['processes']
+            if state['cpu_seconds'] is not None and now > state['time']:
+                record['cpu_percent'] = round((stats['cpu_seconds'] - state['cpu_seconds']) / (now - state['time']) * 100, 1)
+            state['cpu_seconds'] = stats['cpu_seconds']
+        state['time'] = now
+
+        metrics = self._page_metrics(driver)
+        if metrics:
+            record['js_heap_mb'] = round(metrics.get('JSHeapUsedSize', 0) / MB, 1)
+            record['dom_nodes'] = int(metrics.get('Nodes', 0))
+
+        browser['samples'].append(record)
+        return record
+
+    @staticmethod
+    def _page_metrics(driver) -> Dict[str, float]:
+        """当前页面的性能指标（切换到的新窗口还没有启用Performance域时先启用）"""
+        for attempt in range(2):
+            try:
+                return {m['name']: m['value'] for m in driver.execute_cdp_cmd('Performance.getMetrics', {})['metrics']}
+            except Exception as e:
+                if attempt:
+                    logging.debug(f"读取性能指标失败: {e}")
+                    break
+                try:
+                    driver.execute_cdp_cmd('Performance.enable', {})
+                except Exception:
+                    break
+        return {}
+
+    def recycle_reason(self, record: Optional[Dict]) -> Optional[str]:
+        """超过阈值时返回回收原因"""
+        if not record:
+            return None
+        if self.max_steps and record['step'] >= self.max_steps:
+            return f"已执行 {record['step']} 个步骤"
+        if self.max_mb and record.get('memory_mb', 0) >= self.max_mb:
+            return f"进程树内存 {record['memory_mb']:.0f} MB ≥ {self.max_mb:.0f} MB"
+        if self.max_heap_mb and record.get('js_heap_mb', 0) >= self.max_heap_mb:
+            return f"JS堆 {record['js_heap_mb']:.0f} MB ≥ {self.max_heap_mb:.0f} MB"
+        return None
+
+    def after_step(self, driver, label: str) -> Optional[str]:
+        """步骤通过后采样，超过阈值时标记待回收（driver为 RecyclableDriver 时），返回回收原因
+
+        回收不在这里进行：由调用方在下一个步骤开始前通过 pending_recycle 取出并回收，
+        最后一个步骤之后不会白白回收一次
+        """
+        reason = self.recycle_reason(self.sample(driver, label))
+        if not reason or not hasattr(driver, 'recycle'):
+            return None
+        if getattr(driver, 'browser_daemon', None) is not None:
+            if not driver.resource_state.get('daemon_warned'):
+                driver.resource_state['daemon_warned'] = True
+                print(f"⚠ 浏览器资源超过阈值（{reason}），但连接的是浏览器守护进程，不回收"
+                      f"（可运行 python browser_daemon.py restart 重启守护进程中的浏览器）")
+            return None
+        driver.resource_state['recycle'] = reason
+        return reason
+
+    @staticmethod
+    def pending_recycle(driver) -> Optional[str]:
+        """取出上一个步骤标记的回收原因（没有时返回None）"""
+        state = getattr(driver, 'resource_state', None)
+        return state.pop('recycle', None) if state else None
+
+    # ============ 报告 ============
+    @staticmethod
+    def sparkline(values: List[float], width: int = 40) -> str:
+        if not values:
+            return ''
+        if len(values) > width:
+            # 按区间取最大值压缩到固定宽度（保留峰值）
+            size = len(values) / width
+            values = [max(values[int(i * size):max(int((i + 1) * size), int(i * size) + 1)]) for i in range(width)]
+        low, high = min(values), max(values)
+        span = (high - low) or 1
+        return ''.join(SPARKLINE[min(int((v - low) / span * len(SPARKLINE)), len(SPARKLINE) - 1)] for v in values)
+
+    def print_summary(self):
+        browsers = [b for b in self.browsers if b['samples']]
+        if not browsers:
+            return
+        limits = [f"{value:g}" if value else '-' for value in (self.max_steps, self.max_mb, self.max_heap_mb)]
+        print(f"\n🧠 浏览器资源（每步采样，回收阈值: 步骤 {limits[0]} / 内存 {limits[1]} MB / JS堆 {limits[2]} MB）:")
+        for browser in browsers:
+            memory = [s['memory_mb'] for s in browser['samples'] if 'memory_mb' in s]
+            heap = [s['js_heap_mb'] for s in browser['samples'] if 'js_heap_mb' in s]
+            cpu = [s['cpu_percent'] for s in browser['samples'] if 'cpu_percent' in s]
+            recycled = f"  ♻ 回收: {browser['recycled']}" if browser['recycled'] else ""
+            print(f"   {browser['name']}  {len(browser['samples'])} 步{recycled}")
+            if memory:
+                print(f"     内存 {memory[0]:>7.0f} → {memory[-1]:>7.0f} MB（峰值 {max(memory):.0f}） {self.sparkline(memory)}")
+            if heap:
+                print(f"     JS堆 {heap[0]:>7.1f} → {heap[-1]:>7.1f} MB（峰值 {max(heap):.1f}） {self.sparkline(heap)}")
+            if cpu:
+                print(f"     CPU  平均 {sum(cpu) / len(cpu):.0f}%，峰值 {max(cpu):.0f}%")
+
+    def write_report(self) -> Optional[str]:
+        if not self.report_file or not any(b['samples'] for b in self.browsers):
+            return None
+        report = {
+            'thresholds': {'steps': self.max_steps, 'memory_mb': self.max_mb, 'js_heap_mb': self.max_heap_mb},
+            'browsers': self.browsers,
+        }
+        try:
+            with open(self.report_file, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            logging.warning(f"写入资源报告失败: {e}")
+            return None
+        return self.report_file
+
+
+class RecyclableDriver:
+    """
+    可透明回收的driver代理：属性读写都转发给当前的WebDriver，recycle() 用新浏览器替换它并恢复状态
+
+    Args:
+        factory: 创建并初始化新driver的函数（通常是生成脚本中的 create_driver）
+        release: 释放driver的函数（release_driver）
+        monitor: 资源监控器
+        name: 报告中的浏览器名称（通常是需求类名）
+    """
+
+    def __init__(self, factory: Callable, release: Callable, monitor: ResourceMonitor, name: str = 'default'):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_release', release)
+        object.__setattr__(self, '_monitor', monitor)
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_generation', 1)
+        object.__setattr__(self, '_driver', factory())
+        monitor.start_browser(self._driver, name)
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._driver, name, value)
+
+    @property
+    def wrapped_driver(self):
+        return self._driver
+
+    def release(self):
+        self._release(self._driver)
+
+    def recycle(self, reason: str = '', restore: bool = True):
+        """记录状态 → 关闭旧浏览器 → 创建新浏览器 → 恢复Cookie；restore为True时再按原顺序重新打开窗口并恢复存储
+
+        restore为False时新浏览器停在初始页面，由调用方重放步骤恢复页面内存中的状态
+        """
+        old = self._driver
+        started = time.time()
+        windows, current_index = self._snapshot(old) if restore else ([], 0)
+        try:
+            cookies = old.execute_cdp_cmd('Network.getAllCookies', {}).get('cookies', [])
+        except Exception as e:
+            logging.warning(f"读取Cookie失败: {e}")
+            cookies = []
+        old.resource_browser['recycled'] = reason
+        replay = getattr(old, 'network_replay', None)
+        self._release(old)
+
+        object.__setattr__(self, '_generation', self._generation + 1)
+        new = self._factory()
+        object.__setattr__(self, '_driver', new)
+        self._monitor.start_browser(new, f"{self._name}#{self._generation}")
+        if replay is not None and getattr(new, 'network_replay', None) is not None:
+            # 网络录制/回放沿用同一份归档：录制不覆盖回收前的响应，回放继续按出现顺序返回
+            new.network_replay.archive = replay.archive
+        if cookies:
+            try:
+                new.execute_cdp_cmd('Network.setCookies', {'cookies': cookies})
+            except Exception as e:
+                logging.warning(f"恢复Cookie失败: {e}")
+        if restore:
+            self._restore(new, windows, current_index)
+            print(f"♻ 已回收浏览器（{reason}），恢复 {len(windows)} 个窗口，耗时 {time.time() - started:.1f}s")
+        else:
+            print(f"♻ 已回收浏览器（{reason}），耗时 {time.time() - started:.1f}s")
+
+    @staticmethod
+    def _snapshot(driver):
+        windows = []
+        current = driver.current_window_handle
+        handles = driver.window_handles
+        for handle in handles:
+            try:
+                driver.switch_to.window(handle)
+                windows.append(driver.execute_script(CHECKPOINT_JS))
+            except Exception as e:
+                logging.warning(f"读取窗口状态失败: {e}")
+        return windows, handles.index(current) if current in handles else 0
+
+    @staticmethod
+    def _restore(driver, windows: List[Dict], current_index: int):
+        for index, state in enumerate(windows):
+            if index > 0:
+                driver.switch_to.new_window('tab')
+            driver.get(state['url'])
+            if state['local'] or state['session']:
+                driver.execute_script(RESTORE_STORAGE_JS, state)
+                driver.refresh()
+        handles = driver.window_handles
+        if handles:
+            driver.switch_to.window(handles[min(current_index, len(handles) - 1)])
+        driver.known_windows = set(handles)
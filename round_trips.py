@@ -0,0 +1,63 @@
+"""
+WebDriver往返次数统计
+
+每个WebDriver命令（查找元素、执行脚本、点击、读取窗口句柄、读取性能日志……）都是一次到ChromeDriver的HTTP往返。
+本模块包装 driver.execute，按步骤的操作类型统计每步发出的命令数，用于比较不同执行方式的往返开销：
+
+  CTRIP_CLICK_MODE=native pytest TestCtripFlight.py -s     # 原来的逐条命令方式
+  CTRIP_CLICK_MODE=composite pytest TestCtripFlight.py -s  # 单次调用的组合操作（默认）
+
+运行结束时输出每种操作平均每步的往返次数（性能日志轮询单独列出，它的次数取决于等待时长）。
+"""
+
+from typing import Dict
+
+
+# 网络等待轮询性能日志的命令，单独统计
+POLLING_COMMANDS = {'getLog'}
+
+
+class RoundTripCounter:
+    """按操作类型统计每步的WebDriver命令数"""
+
+    def __init__(self):
+        self.steps: Dict[str, int] = {}      # 操作类型 -> 步骤数
+        self.commands: Dict[str, int] = {}   # 操作类型 -> 命令数（不含轮询）
+        self.polls: Dict[str, int] = {}      # 操作类型 -> 性能日志轮询次数
+
+    @staticmethod
+    def attach(driver):
+        """包装 driver.execute，记录该driver发出的每个命令"""
+        if getattr(driver, 'command_counts', None) is not None:
+            return driver
+        counts = {'commands': 0, 'polls': 0}
+        execute = driver.execute
+
+        def counting_execute(driver_command, params=None):
+            counts['polls' if driver_command in POLLING_COMMANDS else 'commands'] += 1
+            return execute(driver_command, params)
+
+        driver.execute = counting_execute
+        driver.command_counts = counts
+        return driver
+
+    @staticmethod
+    def mark(driver) -> Dict[str, int]:
+        return dict(getattr(driver, 'command_counts', None) or {'commands': 0, 'polls': 0})
+
+    def record(self, driver, action_type: str, mark: Dict[str, int]):
+        """记录一个步骤自mark以来发出的命令数"""
+        counts = getattr(driver, 'command_counts', None)
+        if counts is None:
+            return
+        self.steps[action_type] = self.steps.get(action_type, 0) + 1
+        self.commands[action_type] = self.commands.get(action_type, 0) + counts['commands'] - mark['commands']
+        self.polls[action_type] = self.polls.get(action_type, 0) + counts['polls'] - mark['polls']
+
+    def print_summary(self, title: str = ""):
+        if not self.steps:
+            return
+        print(f"\n🔁 WebDriver往返次数（平均每步）{title}:")
+        for action_type, steps in sorted(self.steps.items()):
+            print(f"   {action_type:<12} {steps:>4} 步  命令 {self.commands[action_type] / steps:>5.1f} 次"
+                  f"  性能日志轮询 {self.polls[action_type] / steps:>5.1f} 次")
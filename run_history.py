@@ -0,0 +1,458 @@
+"""
+运行历史数据库
+
+每次 pytest 运行 TestCtripFlight.py 的结果原来在运行结束后就丢失了。
+生成的测试脚本把每个步骤的结果写入本地SQLite数据库：
+- 总耗时及各阶段耗时（查找元素 / 网络等待 / 其余操作）
+- 生效的定位器（0=主定位器，1..N=第几个备选定位器，N+1=按元素指纹自愈）
+- 是否经过检查点恢复重试、失败类型（异常类名）与错误信息
+步骤结果先保存在内存中，运行结束时一次性批量写入。
+
+聚合全部在SQLite中按集合完成（GROUP BY），不逐行处理历史记录；分位数只需沿
+(status, test_case_id, duration_ms) 覆盖索引顺序扫描一次，按排名位置直接取值，几个月的历史也能立即返回。
+
+环境变量:
+  CTRIP_RUN_HISTORY=run_history.db      # 数据库路径，设为空字符串关闭记录
+
+用法:
+  python run_history.py runs                          # 最近的运行
+  python run_history.py p95 [--days 30]               # 各步骤耗时的 p50/p95
+  python run_history.py trend [--test-case CtripFlight_R001_008] [--runs 20]
+  python run_history.py fallbacks                     # 最依赖备选定位器（以及重试、失败最多）的步骤
+  python run_history.py slowest                       # 最慢的需求
+"""
+
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+
+HISTORY_DB = os.environ.get('CTRIP_RUN_HISTORY', 'run_history.db')
+
+REQUIREMENT_PATTERN = re.compile(r'_(R\d{3})_')
+
+# 元素缓存命中时的 locator_index：没有实际查找，不计入查找耗时和备选定位器统计
+CACHED_LOCATOR = -1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    started     REAL NOT NULL,
+    finished    REAL,
+    script      TEXT,
+    host        TEXT,
+    click_mode  TEXT,
+    passed      INTEGER DEFAULT 0,
+    failed      INTEGER DEFAULT 0,
+    skipped     INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS steps (
+    run_id          INTEGER NOT NULL REFERENCES runs(run_id),
+    test_case_id    TEXT NOT NULL,
+    requirement_id  TEXT,
+    action_type     TEXT,
+    locator         TEXT,
+    status          TEXT NOT NULL,
+    started         REAL NOT NULL,
+    duration_ms     REAL,
+    find_ms         REAL,
+    network_ms      REAL,
+    action_ms       REAL,
+    locator_index   INTEGER,
+    retries         INTEGER DEFAULT 0,
+    failure_type    TEXT,
+    error           TEXT
+);
+-- 分位数查询按此索引顺序扫描，不需要回表和排序
+CREATE INDEX IF NOT EXISTS idx_steps_case_duration ON steps(status, test_case_id, duration_ms, started);
+CREATE INDEX IF NOT EXISTS idx_steps_started ON steps(started);
+CREATE INDEX IF NOT EXISTS idx_steps_run ON steps(run_id, requirement_id);
+"""
+
+STEP_COLUMNS = ['test_case_id', 'requirement_id', 'action_type', 'locator', 'status', 'started', 'duration_ms',
+                'find_ms', 'network_ms', 'action_ms', 'locator_index', 'retries', 'failure_type', 'error']
+
+
+def connect(path: str = HISTORY_DB) -> 'sqlite3.Connection':
+    # 生成的测试脚本在加载阶段导入本模块，sqlite3在写入或查询时再导入
+    import sqlite3
+
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def requirement_of(test_case_id: str) -> str:
+    match = REQUIREMENT_PATTERN.search(test_case_id)
+    return match.group(1) if match else test_case_id.split('_')[0]
+
+
+# ============ 记录 ============
+class RunHistory:
+    """在内存中记录本次运行每个步骤的结果，运行结束时批量写入数据库"""
+
+    def __init__(self, path: str = HISTORY_DB):
+        self.path = path
+        self.enabled = bool(path)
+        self.started: Optional[float] = None
+        self.meta: Dict[str, str] = {}
+        self.rows: List[Dict] = []
+        self.current: Optional[Dict] = None
+        self._step_started = 0.0
+        self._open_phases = set()
+
+    def start_run(self, script: str = '', **meta):
+        self.started = time.time()
+        self.meta = dict(meta, script=script)
+
+    def start_step(self, test_case_id: str, action_type: str = '', locator: str = ''):
+        self.current = {
+            'test_case_id': test_case_id, 'requirement_id': requirement_of(test_case_id),
+            'action_type': action_type, 'locator': locator, 'status': 'running', 'started': round(time.time(), 3),
+            'find_ms': 0.0, 'network_ms': 0.0, 'locator_index': None, 'retries': 0,
+            'failure_type': None, 'error': None,
+        }
+        self._step_started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """累计当前步骤某一阶段（find / network）的耗时（同一阶段嵌套时只计最外层）"""
+        if name in self._open_phases:
+            yield
+            return
+        self._open_phases.add(name)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._open_phases.discard(name)
+            if self.current is not None:
+                self.current[f'{name}_ms'] += (time.perf_counter() - started) * 1000
+
+    def note_locator(self, index: int):
+        """记录生效的定位器：0=主定位器，i=第i个备选定位器，备选定位器数+1=按元素指纹自愈"""
+        if self.current is not None:
+            self.current['locator_index'] = index
+
+    def note_cached(self):
+        """记录元素来自缓存（locator_index=CACHED_LOCATOR）"""
+        self.note_locator(CACHED_LOCATOR)
+
+    def note_retry(self):
+        if self.current is not None:
+            self.current['retries'] += 1
+
+    def finish_step(self, status: str, error: BaseException = None):
+        step = self.current
+        if step is None:
+            return
+        step['status'] = status
+        step['duration_ms'] = round((time.perf_counter() - self._step_started) * 1000, 1)
+        step['find_ms'] = round(step['find_ms'], 1)
+        step['network_ms'] = round(step['network_ms'], 1)
+        step['action_ms'] = round(max(step['duration_ms'] - step['find_ms'] - step['network_ms'], 0.0), 1)
+        if error is not None:
+            step['failure_type'] = type(error).__name__
+            step['error'] = str(error).strip().split('\n')[0][:500]
+        self.rows.append(step)
+        self.current = None
+
+    def skip_step(self, test_case_id: str, reason: str = ''):
+        self.start_step(test_case_id)
+        self.current['error'] = reason
+        self.finish_step('skipped')
+
+    def finish_run(self) -> Optional[int]:
+        """把本次运行写入数据库，返回run_id（未记录任何步骤或记录关闭时返回None）"""
+        if not self.enabled or not self.rows:
+            return None
+        import socket
+        import sqlite3
+
+        counts = {status: sum(1 for row in self.rows if row['status'] == status)
+                  for status in ('passed', 'failed', 'skipped')}
+        try:
+            conn = connect(self.path)
+            with conn:
+                cursor = conn.execute(
+                    "INSERT INTO runs (started, finished, script, host, click_mode, passed, failed, skipped) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (self.started or self.rows[0]['started'], time.time(), self.meta.get('script'),
+                     socket.gethostname(), self.meta.get('click_mode'),
+                     counts['passed'], counts['failed'], counts['skipped'])
+                )
+                run_id = cursor.lastrowid
+                conn.executemany(
+                    f"INSERT INTO steps (run_id, {', '.join(STEP_COLUMNS)}) "
+                    f"VALUES (?, {', '.join('?' for _ in STEP_COLUMNS)})",
+                    [(run_id, *(row.get(column) for column in STEP_COLUMNS)) for row in self.rows]
+                )
+            conn.close()
+        except sqlite3.Error as e:
+            logging.warning(f"写入运行历史失败: {e}")
+            return None
+        print(f"\n🗄 运行历史: 第 {run_id} 次运行，{len(self.rows)} 个步骤 → {self.path}")
+        self.rows = []
+        return run_id
+
+
+# ============ 查询 ============
+def _since(days: Optional[float]) -> float:
+    return time.time() - days * 86400 if days else 0.0
+
+
+def step_percentiles(conn: 'sqlite3.Connection', days: float = None, test_case: str = None) -> List[Dict]:
+    """各步骤（通过的运行）耗时的 p50/p95（最近秩法），按p95降序"""
+    since = _since(days)
+    stats = {row[0]: row for row in conn.execute("""
+        SELECT test_case_id, COUNT(*), MAX(duration_ms), AVG(find_ms), AVG(network_ms)
+        FROM steps NOT INDEXED
+        WHERE status = 'passed' AND started >= ? AND (? IS NULL OR test_case_id = ?)
+        GROUP BY test_case_id
+    """, (since, test_case, test_case))}
+
+    # 上面的聚合要读各阶段耗时，整表顺序扫描比经索引逐行回表快（NOT INDEXED）；
+    # 这里只读 duration_ms，覆盖索引已按 (test_case_id, duration_ms) 排好序：每个步骤的第k个值就是第k名
+    durations = conn.execute("""
+        SELECT duration_ms FROM steps
+        WHERE status = 'passed' AND started >= ? AND (? IS NULL OR test_case_id = ?)
+        ORDER BY test_case_id, duration_ms
+    """, (since, test_case, test_case)).fetchall()
+
+    rows, offset = [], 0
+    for test_case_id in sorted(stats):
+        _, samples, max_ms, find_ms, network_ms = stats[test_case_id]
+        rows.append({
+            'test_case_id': test_case_id, 'samples': samples, 'max_ms': max_ms,
+            'p50': durations[offset + _rank(samples, 0.50)][0],
+            'p95': durations[offset + _rank(samples, 0.95)][0],
+            'find_ms': find_ms, 'network_ms': network_ms,
+        })
+        offset += samples
+    rows.sort(key=lambda row: row['p95'], reverse=True)
+    return rows
+
+
+def _rank(samples: int, quantile: float) -> int:
+    """最近秩法：第 ceil(q·n) 名（从0开始的下标）"""
+    return max(-int(-samples * quantile // 1) - 1, 0)
+
+
+def find_latency(conn: 'sqlite3.Connection', days: float = None, quantile: float = 0.95) -> Dict[str, tuple]:
+    """各步骤主定位器查找耗时（通过的步骤）的分位数：{test_case_id: (样本数, 毫秒)}，供学习步骤等待时间"""
+    rows = conn.execute("""
+        SELECT test_case_id, find_ms FROM steps
+        WHERE status = 'passed' AND locator_index = 0 AND started >= ?
+        ORDER BY test_case_id, find_ms
+    """, (_since(days),)).fetchall()
+
+    latency, start = {}, 0
+    for end in range(1, len(rows) + 1):
+        if end == len(rows) or rows[end][0] != rows[start][0]:
+            samples = end - start
+            latency[rows[start][0]] = (samples, rows[start + _rank(samples, quantile)][1])
+            start = end
+    return latency
+
+
+def step_durations(conn: 'sqlite3.Connection', days: float = None) -> Dict[str, tuple]:
+    """各步骤（未跳过）的平均耗时：{test_case_id: (样本数, 毫秒)}，供分片计划估算需求耗时"""
+    return {test_case_id: (samples, avg_ms) for test_case_id, samples, avg_ms in conn.execute("""
+        SELECT test_case_id, COUNT(*), AVG(duration_ms) FROM steps NOT INDEXED
+        WHERE status != 'skipped' AND started >= ?
+        GROUP BY test_case_id
+    """, (_since(days),))}
+
+
+def import_runs(conn: 'sqlite3.Connection', source_path: str) -> int:
+    """把另一个运行历史数据库（如CI各分片各自写入的 run_history.db）中的运行并入，返回并入的运行数
+
+    run_id按并入顺序重新分配；开始时间和主机都相同的运行视为已并入，重复导入不会重复计数
+    """
+    conn.execute("ATTACH DATABASE ? AS source", (source_path,))
+    try:
+        imported = 0
+        with conn:
+            for run in conn.execute("""
+                SELECT run_id, started, finished, script, host, click_mode, passed, failed, skipped
+                FROM source.runs src
+                WHERE NOT EXISTS (SELECT 1 FROM runs r WHERE r.started = src.started AND r.host IS src.host)
+                ORDER BY started
+            """).fetchall():
+                run_id = conn.execute(
+                    "INSERT INTO runs (started, finished, script, host, click_mode, passed, failed, skipped) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", run[1:]
+                ).lastrowid
+                conn.execute(
+                    f"INSERT INTO steps (run_id, {', '.join(STEP_COLUMNS)}) "
+                    f"SELECT ?, {', '.join(STEP_COLUMNS)} FROM source.steps WHERE run_id = ?",
+                    (run_id, run[0])
+                )
+                imported += 1
+    finally:
+        conn.execute("DETACH DATABASE source")
+    return imported
+
+
+def run_trend(conn: 'sqlite3.Connection', runs: int = 20, test_case: str = None) -> List['sqlite3.Row']:
+    """最近若干次运行的通过率和平均步骤耗时（按时间先后）"""
+    rows = conn.execute("""
+        SELECT r.run_id, r.started,
+               COUNT(*) AS steps,
+               SUM(s.status = 'passed') AS passed,
+               SUM(s.status = 'failed') AS failed,
+               AVG(CASE WHEN s.status = 'passed' THEN s.duration_ms END) AS avg_ms,
+               SUM(s.locator_index > 0) AS fallbacks
+        FROM runs r JOIN steps s ON s.run_id = r.run_id
+        WHERE (? IS NULL OR s.test_case_id = ?)
+        GROUP BY r.run_id
+        ORDER BY r.run_id DESC
+        LIMIT ?
+    """, (test_case, test_case, runs)).fetchall()
+    return list(reversed(rows))
+
+
+def fallback_dependence(conn: 'sqlite3.Connection', days: float = None, limit: int = 20) -> List[Dict]:
+    """最依赖备选定位器的步骤：备选定位器生效比例、重试比例、失败比例及最常见的失败类型"""
+    since = _since(days)
+    top_failures: Dict[str, str] = {}
+    for test_case_id, failure_type, _ in conn.execute("""
+        SELECT test_case_id, failure_type, COUNT(*) AS failures
+        FROM steps NOT INDEXED
+        WHERE failure_type IS NOT NULL AND started >= ?
+        GROUP BY test_case_id, failure_type
+        ORDER BY failures
+    """, (since,)):
+        top_failures[test_case_id] = failure_type  # 按次数升序，最后写入的是最常见的
+
+    rows = conn.execute("""
+        SELECT test_case_id, locator,
+               COUNT(*) AS runs,
+               AVG(locator_index > 0) AS fallback_rate,
+               AVG(retries > 0) AS retry_rate,
+               AVG(status = 'failed') AS failure_rate
+        FROM steps NOT INDEXED
+        WHERE status != 'skipped' AND started >= ?
+        GROUP BY test_case_id
+        HAVING fallback_rate > 0 OR retry_rate > 0 OR failure_rate > 0
+        ORDER BY fallback_rate DESC, failure_rate DESC, retry_rate DESC
+        LIMIT ?
+    """, (since, limit)).fetchall()
+    return [dict(zip(('test_case_id', 'locator', 'runs', 'fallback_rate', 'retry_rate', 'failure_rate'), row),
+                 top_failure=top_failures.get(row[0])) for row in rows]
+
+
+def slowest_requirements(conn: 'sqlite3.Connection', days: float = None, limit: int = 10) -> List['sqlite3.Row']:
+    """每次运行中各需求的总耗时，跨运行取平均和最大值"""
+    return conn.execute("""
+        SELECT requirement_id, COUNT(*) AS runs, AVG(total_ms) AS avg_ms, MAX(total_ms) AS max_ms,
+               AVG(failed > 0) AS failure_rate
+        FROM (
+            SELECT run_id, requirement_id, SUM(duration_ms) AS total_ms, SUM(status = 'failed') AS failed
+            FROM steps
+            WHERE status != 'skipped' AND started >= ?
+            GROUP BY run_id, requirement_id
+        )
+        GROUP BY requirement_id
+        ORDER BY avg_ms DESC
+        LIMIT ?
+    """, (_since(days), limit)).fetchall()
+
+
+def recent_runs(conn: 'sqlite3.Connection', limit: int = 20) -> List['sqlite3.Row']:
+    return conn.execute("""
+        SELECT run_id, started, finished, host, click_mode, passed, failed, skipped
+        FROM runs ORDER BY run_id DESC LIMIT ?
+    """, (limit,)).fetchall()
+
+
+# ============ 命令行 ============
+def _ms(value) -> str:
+    return f"{value:.0f}" if value is not None else '-'
+
+
+def _time(timestamp: float) -> str:
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp))
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="运行历史查询")
+    parser.add_argument('--db', default=HISTORY_DB or 'run_history.db', help="数据库路径")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('runs', help="最近的运行")
+    p.add_argument('--limit', type=int, default=20)
+    p = sub.add_parser('p95', help="各步骤耗时的p50/p95")
+    p.add_argument('--days', type=float, help="只统计最近N天")
+    p.add_argument('--test-case', help="只看一个步骤")
+    p = sub.add_parser('trend', help="最近若干次运行的趋势")
+    p.add_argument('--runs', type=int, default=20)
+    p.add_argument('--test-case', help="只看一个步骤")
+    p = sub.add_parser('fallbacks', help="最依赖备选定位器的步骤")
+    p.add_argument('--days', type=float)
+    p.add_argument('--limit', type=int, default=20)
+    p = sub.add_parser('slowest', help="最慢的需求")
+    p.add_argument('--days', type=float)
+    p.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    import sqlite3
+
+    if not os.path.exists(args.db):
+        print(f"没有运行历史: {args.db}")
+        return 1
+    conn = connect(args.db)
+    conn.row_factory = sqlite3.Row
+    started = time.perf_counter()
+
+    print(f"\n{'='*80}")
+    if args.command == 'runs':
+        print(f"  {'运行':>6}  {'开始时间':<18}{'耗时(s)':>9}{'通过':>6}{'失败':>6}{'跳过':>6}  主机 / 点击方式")
+        for row in recent_runs(conn, args.limit):
+            duration = f"{row['finished'] - row['started']:.0f}" if row['finished'] else '-'
+            print(f"  {row['run_id']:>6}  {_time(row['started']):<18}{duration:>9}{row['passed']:>6}"
+                  f"{row['failed']:>6}{row['skipped']:>6}  {row['host']} / {row['click_mode']}")
+
+    elif args.command == 'p95':
+        print(f"  {'步骤':<28}{'样本':>6}{'p50(ms)':>10}{'p95(ms)':>10}{'最长(ms)':>10}{'查找(ms)':>10}{'网络(ms)':>10}")
+        for row in step_percentiles(conn, args.days, args.test_case):
+            print(f"  {row['test_case_id']:<28}{row['samples']:>6}{_ms(row['p50']):>10}{_ms(row['p95']):>10}"
+                  f"{_ms(row['max_ms']):>10}{_ms(row['find_ms']):>10}{_ms(row['network_ms']):>10}")
+
+    elif args.command == 'trend':
+        from resource_monitor import ResourceMonitor
+
+        rows = run_trend(conn, args.runs, args.test_case)
+        print(f"  {'运行':>6}  {'开始时间':<18}{'步骤':>6}{'通过':>6}{'失败':>6}{'平均(ms)':>10}{'备选生效':>10}")
+        for row in rows:
+            print(f"  {row['run_id']:>6}  {_time(row['started']):<18}{row['steps']:>6}{row['passed']:>6}"
+                  f"{row['failed']:>6}{_ms(row['avg_ms']):>10}{row['fallbacks']:>10}")
+        durations = [row['avg_ms'] for row in rows if row['avg_ms'] is not None]
+        if len(durations) > 1:
+            print(f"\n  平均步骤耗时趋势: {ResourceMonitor.sparkline(durations)}")
+
+    elif args.command == 'fallbacks':
+        print(f"  {'步骤':<28}{'次数':>6}{'备选生效':>10}{'重试':>8}{'失败':>8}  最常见的失败 / 主定位器")
+        for row in fallback_dependence(conn, args.days, args.limit):
+            print(f"  {row['test_case_id']:<28}{row['runs']:>6}{row['fallback_rate']:>10.0%}"
+                  f"{row['retry_rate']:>8.0%}{row['failure_rate']:>8.0%}  {row['top_failure'] or '-'} / "
+                  f"{(row['locator'] or '')[:60]}")
+
+    elif args.command == 'slowest':
+        print(f"  {'需求':<12}{'运行次数':>8}{'平均(s)':>10}{'最长(s)':>10}{'失败率':>8}")
+        for row in slowest_requirements(conn, args.days, args.limit):
+            print(f"  {row['requirement_id']:<12}{row['runs']:>8}{row['avg_ms'] / 1000:>10.1f}"
+                  f"{row['max_ms'] / 1000:>10.1f}{row['failure_rate']:>8.0%}")
+
+    print(f"{'='*80}")
+    print(f"查询耗时 {(time.perf_counter() - started) * 1000:.1f} ms")
+    conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
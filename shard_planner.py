@@ -0,0 +1,254 @@
+"""
+按耗时均衡的分片计划
+
+把套件分到多台CI机器上运行时原来按需求类手工划分，各台机器的耗时相差很大，总时间取决于最慢的一台。
+分片计划按运行历史（run_history.db）中每个步骤的平均耗时估算每个需求的耗时：
+
+  需求耗时 = 前置步骤耗时 + 业务步骤耗时 + 每个需求类的固定开销（启动浏览器、打开初始页面）
+
+没有历史的步骤按所有步骤的平均耗时估算。需求保持完整（一个需求类只在一个分片中运行），
+按"最长处理时间优先"把需求依次分给当前估算耗时最少的分片，最慢分片的耗时接近 总耗时 / 分片数。
+
+每个分片生成一个pytest参数文件（每行一个需求类的节点编号，`pytest @文件` 需要 pytest 8.2 及以上），各分片运行结束后把JUnit结果和运行历史合并回一份报告。
+
+用法:
+  python shard_planner.py plan -n 4                    # 生成4个分片：shards/shard_1.txt ... 与 shards/plan.json
+  pytest @shards/shard_1.txt --junitxml=shard_1.xml    # 在第1台机器上运行第1个分片
+  python shard_planner.py merge --junit shard_*.xml --history shard_*/run_history.db --output report.xml
+
+环境变量:
+  CTRIP_RUN_HISTORY=run_history.db    # 估算耗时使用的运行历史，合并时各分片的运行历史也并入这里
+"""
+
+import argparse
+import heapq
+import json
+import logging
+import os
+import sys
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional
+
+from step_tables import REQUIREMENT_CLASS_PATTERN, load_step_tables, load_test_module
+
+
+DEFAULT_STEP_MS = 2000.0       # 运行历史为空时每个步骤的估算耗时
+DEFAULT_OVERHEAD_S = 5.0       # 每个需求类启动浏览器、打开初始页面的耗时（不在运行历史中）
+HISTORY_DAYS = 30
+PLAN_FILE = 'plan.json'
+
+
+class ShardPlanner:
+    """按估算耗时把需求分到N个分片"""
+
+    def __init__(self, precondition_steps: List[Dict], requirements: Dict[str, List[Dict]],
+                 node_ids: Dict[str, str], durations: Dict[str, tuple] = None,
+                 overhead_ms: float = DEFAULT_OVERHEAD_S * 1000):
+        """
+        Args:
+            precondition_steps / requirements: load_step_tables 返回的步骤表
+            node_ids: {需求编号: pytest节点编号}
+            durations: 运行历史中各步骤的 {test_case_id: (样本数, 平均毫秒)}
+            overhead_ms: 每个需求类的固定开销
+        """
+        self.precondition_steps = precondition_steps
+        self.requirements = requirements
+        self.node_ids = node_ids
+        self.durations = durations or {}
+        self.overhead_ms = overhead_ms
+        known = [avg_ms for _, avg_ms in self.durations.values()]
+        self.default_step_ms = sum(known) / len(known) if known else DEFAULT_STEP_MS
+        self.estimated_steps = 0  # 没有历史、按平均耗时估算的步骤数
+
+    @classmethod
+    def from_script(cls, script_file: str, history_path: str = None, days: float = HISTORY_DAYS,
+                    overhead_ms: float = DEFAULT_OVERHEAD_S * 1000) -> 'ShardPlanner':
+        module = load_test_module(script_file)
+        precondition_steps, requirements = load_step_tables(module)
+        node_ids = {}
+        for name in vars(module):
+            match = REQUIREMENT_CLASS_PATTERN.match(name)
+            if match:
+                node_ids[match.group(1)] = f"{script_file}::{name}"
+        return cls(precondition_steps, requirements, node_ids, load_durations(history_path, days), overhead_ms)
+
+    def step_ms(self, step: Dict) -> float:
+        entry = self.durations.get(step['test_case_id'])
+        if entry is None:
+            self.estimated_steps += 1
+            return self.default_step_ms
+        return entry[1]
+
+    def requirement_costs(self) -> Dict[str, float]:
+        """每个需求的估算耗时（毫秒），前置步骤在每个需求类中都要执行一次"""
+        self.estimated_steps = 0
+        precondition_ms = sum(self.step_ms(step) for step in self.precondition_steps)
+        return {
+            req_id: self.overhead_ms + precondition_ms + sum(self.step_ms(step) for step in steps)
+            for req_id, steps in self.requirements.items()
+        }
+
+    def plan(self, shard_count: int) -> List[Dict]:
+        """最长处理时间优先（LPT）：按估算耗时从长到短，依次分给当前负载最小的分片"""
+        costs = self.requirement_costs()
+        shards = [{'index': i + 1, 'requirements': [], 'estimated_ms': 0.0} for i in range(max(shard_count, 1))]
+        heap = [(0.0, i) for i in range(len(shards))]
+        for req_id in sorted(costs, key=lambda r: (-costs[r], r)):
+            load, i = heapq.heappop(heap)
+            shards[i]['requirements'].append(req_id)
+            shards[i]['estimated_ms'] = load + costs[req_id]
+            heapq.heappush(heap, (shards[i]['estimated_ms'], i))
+        for shard in shards:
+            shard['requirements'].sort()
+            shard['node_ids'] = [self.node_ids.get(req_id, req_id) for req_id in shard['requirements']]
+        return shards
+
+    def write_plan(self, shards: List[Dict], out_dir: str) -> str:
+        """每个分片写一个pytest参数文件，并把计划写入 plan.json，返回 plan.json 路径"""
+        os.makedirs(out_dir, exist_ok=True)
+        for shard in shards:
+            shard['args_file'] = os.path.join(out_dir, f"shard_{shard['index']}.txt")
+            with open(shard['args_file'], 'w', encoding='utf-8') as f:
+                f.write(''.join(f"{node_id}\n" for node_id in shard['node_ids']))
+        total_ms = sum(shard['estimated_ms'] for shard in shards)
+        plan = {
+            'shards': shards,
+            'total_ms': round(total_ms, 1),
+            'makespan_ms': round(max(shard['estimated_ms'] for shard in shards), 1),
+            'ideal_ms': round(total_ms / len(shards), 1),
+            'estimated_steps': self.estimated_steps,
+        }
+        plan_path = os.path.join(out_dir, PLAN_FILE)
+        with open(plan_path, 'w', encoding='utf-8') as f:
+            json.dump(plan, f, ensure_ascii=False, indent=2)
+        return plan_path
+
+    def print_plan(self, shards: List[Dict]):
+        total_ms = sum(shard['estimated_ms'] for shard in shards)
+        makespan_ms = max(shard['estimated_ms'] for shard in shards)
+        print(f"\n{'='*80}")
+        print(f"  {'分片':<6}{'需求数':>6}{'估算(s)':>10}  需求")
+        for shard in shards:
+            print(f"  {shard['index']:<6}{len(shard['requirements']):>6}{shard['estimated_ms'] / 1000:>10.1f}  "
+                  f"{', '.join(shard['requirements']) or '-'}")
+        print(f"{'='*80}")
+        print(f"估算总耗时 {total_ms / 1000:.1f}s，最慢分片 {makespan_ms / 1000:.1f}s，"
+              f"理想值（总耗时/{len(shards)}）{total_ms / len(shards) / 1000:.1f}s")
+        if self.estimated_steps:
+            print(f"其中 {self.estimated_steps} 个步骤没有运行历史，按平均 {self.default_step_ms:.0f}ms 估算")
+
+
+def load_durations(history_path: Optional[str], days: float = HISTORY_DAYS) -> Dict[str, tuple]:
+    """读取运行历史中各步骤的平均耗时，没有运行历史时返回空字典"""
+    if not history_path or not os.path.exists(history_path):
+        return {}
+    from run_history import connect, step_durations
+
+    try:
+        conn = connect(history_path)
+        try:
+            return step_durations(conn, days)
+        finally:
+            conn.close()
+    except Exception as e:
+        logging.warning(f"读取运行历史失败，按默认耗时估算: {e}")
+        return {}
+
+
+# ============ 合并 ============
+def merge_junit(junit_files: List[str], output: str) -> List[Dict]:
+    """把各分片的JUnit XML合并为一份（每个分片一个testsuite），返回各分片的统计"""
+    merged = ET.Element('testsuites')
+    stats = []
+    for index, junit_file in enumerate(junit_files, 1):
+        root = ET.parse(junit_file).getroot()
+        for suite in ([root] if root.tag == 'testsuite' else root.iter('testsuite')):
+            suite.set('name', f"shard_{index}")
+            merged.append(suite)
+            stats.append({
+                'junit': junit_file,
+                'tests': int(suite.get('tests', 0)),
+                'failures': int(suite.get('failures', 0)),
+                'errors': int(suite.get('errors', 0)),
+                'skipped': int(suite.get('skipped', 0)),
+                'time': float(suite.get('time', 0)),
+            })
+    for key in ('tests', 'failures', 'errors', 'skipped'):
+        merged.set(key, str(sum(stat[key] for stat in stats)))
+    # 各分片并行运行，合并后的耗时取最慢的分片
+    merged.set('time', f"{max((stat['time'] for stat in stats), default=0.0):.3f}")
+    ET.ElementTree(merged).write(output, encoding='utf-8', xml_declaration=True)
+    return stats
+
+
+def merge_history(history_files: List[str], target: str) -> int:
+    """把各分片的运行历史并入目标数据库，返回并入的运行数"""
+    from run_history import connect, import_runs
+
+    conn = connect(target)
+    try:
+        return sum(import_runs(conn, path) for path in history_files
+                   if os.path.abspath(path) != os.path.abspath(target))
+    finally:
+        conn.close()
+
+
+def print_merge(stats: List[Dict], plan: Optional[Dict]):
+    estimated = {shard['index']: shard['estimated_ms'] / 1000 for shard in (plan or {}).get('shards', [])}
+    print(f"\n{'='*80}")
+    print(f"  {'分片':<6}{'用例':>6}{'失败':>6}{'跳过':>6}{'实际(s)':>10}{'估算(s)':>10}  JUnit")
+    for index, stat in enumerate(stats, 1):
+        planned = f"{estimated[index]:.1f}" if index in estimated else '-'
+        print(f"  {index:<6}{stat['tests']:>6}{stat['failures'] + stat['errors']:>6}{stat['skipped']:>6}"
+              f"{stat['time']:>10.1f}{planned:>10}  {stat['junit']}")
+    print(f"{'='*80}")
+    times = [stat['time'] for stat in stats]
+    if times:
+        ideal = sum(times) / len(times)
+        print(f"总耗时 {sum(times):.1f}s，最慢分片 {max(times):.1f}s，"
+              f"理想值（总耗时/{len(times)}）{ideal:.1f}s，均衡度 {ideal / max(max(times), 1e-9):.0%}")
+
+
+def main(argv: List[str] = None) -> int:
+    from run_history import HISTORY_DB
+
+    parser = argparse.ArgumentParser(description="按耗时均衡的分片计划")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('plan', help="生成分片计划和各分片的pytest参数文件")
+    p.add_argument('-n', '--shards', type=int, required=True, help="分片数")
+    p.add_argument('--script', default='TestCtripFlight.py', help="生成的测试脚本")
+    p.add_argument('--db', default=HISTORY_DB, help="运行历史数据库路径")
+    p.add_argument('--days', type=float, default=HISTORY_DAYS, help="使用最近多少天的运行历史")
+    p.add_argument('--overhead', type=float, default=DEFAULT_OVERHEAD_S, help="每个需求类的固定开销（秒）")
+    p.add_argument('--out', default='shards', help="输出目录")
+    p = sub.add_parser('merge', help="合并各分片的JUnit结果和运行历史")
+    p.add_argument('--junit', nargs='+', required=True, help="各分片的JUnit XML（按分片顺序）")
+    p.add_argument('--history', nargs='*', default=[], help="各分片的运行历史数据库")
+    p.add_argument('--output', default='report.xml', help="合并后的JUnit XML")
+    p.add_argument('--db', default=HISTORY_DB, help="并入的运行历史数据库")
+    p.add_argument('--plan', default=os.path.join('shards', PLAN_FILE), help="分片计划（对比估算耗时）")
+    args = parser.parse_args(argv)
+
+    if args.command == 'plan':
+        planner = ShardPlanner.from_script(args.script, args.db, args.days, args.overhead * 1000)
+        shards = planner.plan(args.shards)
+        plan_path = planner.write_plan(shards, args.out)
+        planner.print_plan(shards)
+        print(f"📋 分片计划已保存: {plan_path}（运行: pytest @{shards[0]['args_file']} ...）")
+        return 0
+
+    stats = merge_junit(args.junit, args.output)
+    print(f"🧾 已合并 {len(args.junit)} 个分片的JUnit结果 → {args.output}")
+    if args.history and args.db:
+        print(f"🗄 已把 {merge_history(args.history, args.db)} 次运行并入运行历史 → {args.db}")
+    plan = None
+    if os.path.exists(args.plan):
+        with open(args.plan, encoding='utf-8') as f:
+            plan = json.load(f)
+    print_merge(stats, plan)
+    failures = sum(stat['failures'] + stat['errors'] for stat in stats)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
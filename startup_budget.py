@@ -0,0 +1,153 @@
+"""
+启动耗时预算检查
+
+用 `python -X importtime` 在独立子进程中测量录制工具、生成的测试脚本和测试用例文档工具的导入耗时，
+检查是否超出预算，并确认加载阶段没有提前导入重量级模块（WebDriver、WebDriverWait、openpyxl、pandas等）。
+同时测量 `pytest --collect-only` 的整体耗时。
+
+用法:
+  python startup_budget.py            # 输出测量结果，超出预算时返回非0退出码（可直接用于CI）
+  python startup_budget.py --repeat 5
+"""
+
+import argparse
+import compileall
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+
+# (模块名, 预先导入的模块, 导入耗时预算毫秒)
+# 生成的测试脚本在pytest进程中被导入，因此先导入pytest，只统计脚本自身新增的导入耗时
+IMPORT_BUDGETS: List[Tuple[str, List[str], float]] = [
+    ('web_optimized', [], 50),
+    ('TestCtripFlight', ['pytest'], 50),
+    ('测试用例文档', [], 50),
+]
+
+# pytest --collect-only 的整体耗时预算（毫秒，包含解释器和pytest自身启动）
+COLLECT_ONLY_BUDGET_MS = 2000
+COLLECT_ONLY_TARGET = 'TestCtripFlight.py'
+
+# 加载阶段不允许出现的重量级模块（应在首次使用时再导入）
+HEAVY_MODULES = [
+    'selenium.webdriver.remote.webdriver',
+    'selenium.webdriver.support.expected_conditions',
+    'selenium.webdriver.common.action_chains',
+    'openpyxl',
+    'pandas',
+]
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+
+def measure_import(module: str, preload: List[str]) -> Tuple[float, List[str]]:
+    """
+    在子进程中测量模块导入耗时
+
+    Returns:
+        (模块导入的累计耗时毫秒, 该模块导入过程中新加载的模块列表)
+    """
+    statements = [f"import {name}" for name in preload] + [f"import {module}"]
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', '; '.join(statements)],
+        capture_output=True, text=True, encoding='utf-8', errors='replace', check=True
+    )
+
+    loaded: List[str] = []
+    cumulative_ms = 0.0
+    preload_done = not preload
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        _, cumulative_us, indent, name = match.groups()
+        if not preload_done:
+            # 最后一个预先导入的顶层模块之后的行才属于目标模块
+            if not indent and name == preload[-1]:
+                preload_done = True
+            continue
+        loaded.append(name)
+        if not indent and name == module:
+            cumulative_ms = int(cumulative_us) / 1000
+            break
+    return cumulative_ms, loaded
+
+
+def find_heavy_modules(loaded: List[str]) -> List[str]:
+    return sorted({
+        name for name in loaded
+        for heavy in HEAVY_MODULES
+        if name == heavy or name.startswith(heavy + '.')
+    })
+
+
+def measure_collect_only(target: str) -> float:
+    """测量 pytest --collect-only 的整体耗时（毫秒）"""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, '-m', 'pytest', '--collect-only', '-q', '-p', 'no:cacheprovider', target],
+        capture_output=True, check=False
+    )
+    return (time.perf_counter() - start) * 1000
+
+
+def check_budgets(repeat: int = 3) -> List[Dict]:
+    """测量所有目标并与预算比较（每项取多次测量的最小值以降低噪声）"""
+    # 先编译好字节码，避免把源码编译时间计入导入耗时
+    compileall.compile_dir(os.getcwd(), maxlevels=0, quiet=1)
+
+    report = []
+    for module, preload, budget_ms in IMPORT_BUDGETS:
+        timings = []
+        heavy = []
+        for _ in range(repeat):
+            elapsed_ms, loaded = measure_import(module, preload)
+            timings.append(elapsed_ms)
+            heavy = find_heavy_modules(loaded)
+        elapsed_ms = min(timings)
+        report.append({
+            'target': f"import {module}",
+            'elapsed_ms': round(elapsed_ms, 1),
+            'budget_ms': budget_ms,
+            'heavy_modules': heavy,
+            'ok': elapsed_ms <= budget_ms and not heavy,
+        })
+
+    if os.path.exists(COLLECT_ONLY_TARGET):
+        elapsed_ms = min(measure_collect_only(COLLECT_ONLY_TARGET) for _ in range(repeat))
+        report.append({
+            'target': f"pytest --collect-only {COLLECT_ONLY_TARGET}",
+            'elapsed_ms': round(elapsed_ms, 1),
+            'budget_ms': COLLECT_ONLY_BUDGET_MS,
+            'heavy_modules': [],
+            'ok': elapsed_ms <= COLLECT_ONLY_BUDGET_MS,
+        })
+    return report
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="启动耗时预算检查")
+    parser.add_argument('--repeat', type=int, default=3, help="每项测量次数（取最小值）")
+    args = parser.parse_args(argv)
+
+    report = check_budgets(args.repeat)
+
+    print(f"\n{'='*80}")
+    print("启动耗时预算检查")
+    print(f"{'='*80}")
+    for item in report:
+        status = "✓" if item['ok'] else "✗"
+        print(f"  {status} {item['target']:<50} {item['elapsed_ms']:>8.1f} ms / 预算 {item['budget_ms']} ms")
+        if item['heavy_modules']:
+            print(f"      加载阶段导入了重量级模块: {', '.join(item['heavy_modules'])}")
+    print(f"{'='*80}")
+
+    return 0 if all(item['ok'] for item in report) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+生成脚本步骤表加载工具
+
+把 TestScriptGenerator 生成的测试脚本（如 TestCtripFlight.py）中的
+PreCondition.PRECONDITION_DATA 与各需求类的 TEST_DATA_Rxxx 还原为
+与 TestScriptGenerator.precondition_steps_data / test_steps_data 相同格式的步骤字典，
+供执行计划、测试用例文档等工具复用。
+"""
+
+import importlib.util
+import os
+import re
+from typing import Dict, List, Tuple
+
+
+# 需求测试类命名规则：TestCtripFlight_R001
+REQUIREMENT_CLASS_PATTERN = re.compile(r'^Test\w*_(R\d{3})$')
+
+
+def load_test_module(script_file: str):
+    """按文件路径导入生成的测试脚本模块"""
+    module_name = os.path.splitext(os.path.basename(script_file))[0]
+    spec = importlib.util.spec_from_file_location(module_name, script_file)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"无法加载测试脚本: {script_file}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _by_name(by_value: str) -> str:
+    """把By常量的值（如 'css selector'）还原为名称（如 'CSS_SELECTOR'）"""
+    from selenium.webdriver.common.by import By
+
+    for name in dir(By):
+        if name.isupper() and getattr(By, name) == by_value:
+            return name
+    return by_value
+
+
+def _row_to_step(row: tuple, requirement_id: str = None, step_options: Dict = None) -> Dict:
+    """把参数化数据元组转换为步骤字典（合并 STEP_OPTIONS 中该步骤的附加选项）"""
+    test_case_id, by_type, locator, alternative_locators, action_type, test_name, input_data = row[:7]
+    step = {
+        'step_num': test_case_id.rsplit('_', 1)[-1],
+        'test_case_id': test_case_id,
+        'by_type': _by_name(by_type),
+        'locator': locator,
+        'alternative_locators': [(f"By.{_by_name(alt_by)}", alt_loc) for alt_by, alt_loc in alternative_locators],
+        'action_type': action_type,
+        'test_name': test_name,
+        'input_data': input_data or '',
+    }
+    if requirement_id is not None:
+        step['requirement_id'] = requirement_id
+    step.update((step_options or {}).get(test_case_id, {}))
+    return step
+
+
+def load_step_tables(module) -> Tuple[List[Dict], Dict[str, List[Dict]]]:
+    """
+    读取测试脚本模块中的步骤表
+
+    Returns:
+        (前置步骤列表, {需求编号: 业务步骤列表})
+    """
+    step_options = getattr(module, 'STEP_OPTIONS', {})
+    precondition_steps = []
+    precondition = getattr(module, 'PreCondition', None)
+    if precondition is not None:
+        precondition_steps = [_row_to_step(row, step_options=step_options) for row in precondition.PRECONDITION_DATA]
+
+    requirements = {}
+    for name in sorted(vars(module)):
+        match = REQUIREMENT_CLASS_PATTERN.match(name)
+        if not match:
+            continue
+        req_id = match.group(1)
+        rows = getattr(getattr(module, name), f'TEST_DATA_{req_id}', [])
+        requirements[req_id] = [_row_to_step(row, req_id, step_options) for row in rows]
+
+    return precondition_steps, requirements
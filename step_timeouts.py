@@ -0,0 +1,137 @@
+"""
+自适应步骤等待时间
+
+查找元素的等待时间原来是固定的：主定位器10秒（输入框20秒）、每个备选定位器5秒。
+很快就能找到元素的步骤失效时要白等10秒以上，偶尔较慢的步骤又会因为等不够而失败。
+每次运行结束后按运行历史（run_history.db）中每个步骤主定位器查找耗时的 p95 重新计算等待时间：
+
+  等待时间 = p95 × 2 + 1秒，限制在 [下限, 上限] 之间
+
+保存在 step_timeouts.json 中供下次运行使用；样本不足5次的步骤仍使用固定等待时间。
+备选定位器的等待时间为 min(5秒, 该步骤的等待时间)。
+生成脚本 STEP_OPTIONS 中的 timeout（秒）优先于学习到的等待时间，用于手动指定个别步骤。
+
+用法:
+  python step_timeouts.py                 # 显示当前保存的等待时间
+  python step_timeouts.py --learn         # 立即从运行历史重新学习
+  python step_timeouts.py --learn --days 7
+
+环境变量:
+  CTRIP_STEP_TIMEOUTS=step_timeouts.json  # 保存位置，设为空字符串关闭（始终使用固定等待时间）
+  CTRIP_TIMEOUT_FLOOR=2                   # 等待时间下限（秒）
+  CTRIP_TIMEOUT_CEILING=30                # 等待时间上限（秒）
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+
+TIMEOUTS_FILE = os.environ.get('CTRIP_STEP_TIMEOUTS', 'step_timeouts.json')
+TIMEOUT_FLOOR = float(os.environ.get('CTRIP_TIMEOUT_FLOOR', '2'))
+TIMEOUT_CEILING = float(os.environ.get('CTRIP_TIMEOUT_CEILING', '30'))
+
+QUANTILE = 0.95
+MARGIN_FACTOR = 2.0
+MARGIN_SECONDS = 1.0
+MIN_SAMPLES = 5
+LEARN_DAYS = 30
+
+
+def budget(latency_ms: float, floor: float = TIMEOUT_FLOOR, ceiling: float = TIMEOUT_CEILING) -> float:
+    """由查找耗时分位数计算等待时间（秒）"""
+    return round(min(max(latency_ms / 1000 * MARGIN_FACTOR + MARGIN_SECONDS, floor), ceiling), 1)
+
+
+class StepTimeouts:
+    """按测试用例编号保存的查找等待时间"""
+
+    def __init__(self, path: str = TIMEOUTS_FILE):
+        self.path = path
+        self.enabled = bool(path)
+        self.updated: Optional[float] = None
+        self.steps: Dict[str, Dict] = {}  # test_case_id -> {'timeout', 'p95_ms', 'samples'}
+        self._load()
+
+    def _load(self):
+        if not self.enabled or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            self.updated = data.get('updated')
+            self.steps = data.get('steps', {})
+        except (OSError, ValueError) as e:
+            logging.warning(f"读取步骤等待时间失败，使用固定等待时间: {e}")
+
+    def get(self, test_case_id: str) -> Optional[float]:
+        """该步骤学习到的等待时间（秒），没有时返回None（调用方使用固定等待时间）"""
+        entry = self.steps.get(test_case_id)
+        return entry['timeout'] if entry else None
+
+    def learn(self, history_path: str, days: float = LEARN_DAYS) -> int:
+        """从运行历史重新计算所有步骤的等待时间并保存，返回学习到的步骤数"""
+        if not self.enabled or not history_path or not os.path.exists(history_path):
+            return 0
+        from run_history import connect, find_latency
+
+        try:
+            conn = connect(history_path)
+            try:
+                latency = find_latency(conn, days, QUANTILE)
+            finally:
+                conn.close()
+        except Exception as e:
+            logging.warning(f"从运行历史学习等待时间失败: {e}")
+            return 0
+
+        self.steps = {
+            test_case_id: {'timeout': budget(latency_ms), 'p95_ms': round(latency_ms, 1), 'samples': samples}
+            for test_case_id, (samples, latency_ms) in sorted(latency.items()) if samples >= MIN_SAMPLES
+        }
+        self.updated = round(time.time(), 3)
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump({'updated': self.updated, 'quantile': QUANTILE, 'steps': self.steps}, f, indent=2)
+        except OSError as e:
+            logging.warning(f"保存步骤等待时间失败: {e}")
+        span = f"最近{days:g}天" if days else "全部"
+        print(f"⏱ 步骤等待时间: 已按{span}运行历史的查找耗时学习 {len(self.steps)} 个步骤 → {self.path}")
+        return len(self.steps)
+
+    def print_table(self):
+        if not self.steps:
+            print(f"没有学习到的步骤等待时间（{self.path}），所有步骤使用固定等待时间")
+            return
+        print(f"\n{'='*80}")
+        print(f"  {'步骤':<28}{'样本':>6}{'p95(ms)':>10}{'等待(s)':>10}")
+        for test_case_id, entry in self.steps.items():
+            print(f"  {test_case_id:<28}{entry['samples']:>6}{entry['p95_ms']:>10.0f}{entry['timeout']:>10.1f}")
+        print(f"{'='*80}")
+        if self.updated:
+            print(f"更新时间 {time.strftime('%Y-%m-%d %H:%M', time.localtime(self.updated))}，"
+                  f"下限 {TIMEOUT_FLOOR:g}s，上限 {TIMEOUT_CEILING:g}s")
+
+
+def main(argv: List[str] = None) -> int:
+    from run_history import HISTORY_DB
+
+    parser = argparse.ArgumentParser(description="自适应步骤等待时间")
+    parser.add_argument('--learn', action='store_true', help="从运行历史重新学习")
+    parser.add_argument('--days', type=float, default=LEARN_DAYS, help="使用最近多少天的运行历史")
+    parser.add_argument('--db', default=HISTORY_DB, help="运行历史数据库路径")
+    args = parser.parse_args(argv)
+
+    timeouts = StepTimeouts()
+    if args.learn and not timeouts.learn(args.db, args.days):
+        print(f"运行历史中没有足够的样本（每个步骤至少 {MIN_SAMPLES} 次）: {args.db}")
+    timeouts.print_table()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
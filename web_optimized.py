@@ -10,37 +10,73 @@
 7. 支持 'a' 命令 - 连续输入多个操作组成一个测试用例，输入'a'添加新测试用例
 """
 
+from __future__ import annotations
+
 import time
 import os
 import sys
+import json
 import logging
-from typing import List, Dict, Optional, Tuple, Set
+from typing import TYPE_CHECKING, Callable, List, Dict, Optional, Tuple, Set
 from dataclasses import dataclass
-from selenium import webdriver
+# 只在模块加载时导入轻量的By和异常类；WebDriver、WebDriverWait等重量级模块在首次使用时再导入
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.remote.webelement import WebElement
 from selenium.common.exceptions import (
     WebDriverException, TimeoutException, 
     NoSuchElementException, StaleElementReferenceException
 )
 
+from date_picker import resolve_date, select_date
+from element_fingerprint import fingerprint_element
+from event_log import EventLogger
+from input_engine import INPUT_MODE as DEFAULT_INPUT_MODE, FastInputEngine
+from locator_pipeline import LocatorPipeline, snapshot_element
+from network_wait import NetworkMonitor, enable_network_log, url_to_pattern
+from request_blocker import DEFAULT_BLOCKED_RESOURCE_TYPES, DEFAULT_BLOCKED_URL_PATTERNS, RequestBlocker
+
+if TYPE_CHECKING:
+    from selenium import webdriver
+    from selenium.webdriver.remote.webelement import WebElement
+
+# 生成脚本 STEP_OPTIONS 中支持的步骤附加选项
+STEP_OPTION_NAMES = ('wait_for', 'keep_artifacts', 'fingerprint', 'timeout')
 
 # ============ 配置类 ============
 @dataclass
 class Config:
     """集中管理所有配置项"""
     # 文件配置
-    ELEMENT_LOG_FILE: str = 'clicked_elements.log'
+    ELEMENT_LOG_FILE: str = 'clicked_elements.log'  # 录制事件日志（JSONL，按大小轮转）
+    EVENT_LOG_MAX_BYTES: int = 5 * 1024 * 1024
+    EVENT_LOG_BACKUPS: int = 3
     TEST_SCRIPT_FILE: str = 'TestCtripFlight.py'
     SCREENSHOTS_DIR: str = 'screenshots'
+    TEST_CASE_XLSX_FILE: str = '携程机票查询测试用例_R001.xlsx'  # 为空则不生成测试用例文档
     
     # 超时配置
     DEFAULT_TIMEOUT: int = 10
     PAGE_LOAD_TIMEOUT: int = 30
     SCRIPT_TIMEOUT: int = 30
     
+    # 输入方式：auto=按定位器自适应（默认），insert=总是Input.insertText，keys=总是逐键输入
+    # （默认值即 input_engine 读取的环境变量 CTRIP_INPUT_MODE）
+    INPUT_MODE: str = DEFAULT_INPUT_MODE
+    
+    # 录制时列出每个步骤触发的请求，选择其一作为回放时的等待目标
+    RECORD_NETWORK_WAITS: bool = True
+    
+    # 第三方请求屏蔽（统计、广告、追踪），通过DevTools在录制和回放时生效
+    BLOCK_REQUESTS: bool = True
+    BLOCKED_URL_PATTERNS: List[str] = None
+    BLOCKED_RESOURCE_TYPES: List[str] = None  # 可选 Image / Media / Font
+    
+    # 浏览器守护进程配置（连接常驻Chrome，避免每次冷启动）
+    USE_BROWSER_DAEMON: bool = False
+    BROWSER_DAEMON_PORT: int = 9222
+    
+    # 日期选择器：默认定位出发日期输入框
+    DATE_INPUT_SELECTOR: str = "#datePicker input[type=text]"
+    
     # 高亮配置
     HIGHLIGHT_DURATION: float = 1.0
     HIGHLIGHT_STYLE: str = "border='3px solid red'; backgroundColor='yellow'"
@@ -54,6 +90,8 @@ class Config:
     CUSTOM_ELEMENT_KEYWORDS: List[str] = None
     HOVER_KEYWORDS: List[str] = None
     WINDOW_KEYWORDS: List[str] = None
+    DATE_KEYWORDS: List[str] = None
+    CAPTURE_KEYWORDS: List[str] = None
     EXIT_KEYWORDS: List[str] = None
     
     def __post_init__(self):
@@ -66,6 +104,14 @@ class Config:
             self.HOVER_KEYWORDS = ['悬浮', 'hover', '鼠标悬浮']
         if self.WINDOW_KEYWORDS is None:
             self.WINDOW_KEYWORDS = ['窗口', '切换窗口', 'windows']
+        if self.BLOCKED_URL_PATTERNS is None:
+            self.BLOCKED_URL_PATTERNS = list(DEFAULT_BLOCKED_URL_PATTERNS)
+        if self.BLOCKED_RESOURCE_TYPES is None:
+            self.BLOCKED_RESOURCE_TYPES = list(DEFAULT_BLOCKED_RESOURCE_TYPES)
+        if self.DATE_KEYWORDS is None:
+            self.DATE_KEYWORDS = ['选择日期', 'date']
+        if self.CAPTURE_KEYWORDS is None:
+            self.CAPTURE_KEYWORDS = ['捕获', 'capture']
         if self.EXIT_KEYWORDS is None:
             self.EXIT_KEYWORDS = ['quit', 'exit', '退出']
 
@@ -80,85 +126,98 @@ class ElementLocatorGenerator:
         生成元素的所有可能定位器（优先级：文本 > ID > 属性 > CSS路径）
         返回: [(selector_type, selector_value), ...]
         """
-        locators = []
-        
         try:
             # 预先获取所有属性，避免元素过期
             attributes = ElementLocatorGenerator._get_element_attributes(element)
-            tag = attributes.get('tag_name', '')
-            text = attributes.get('text', '')
-            
-            # 1. 【最优先】LINK_TEXT定位器（最稳定）
-            if tag == 'a' and text == search_text and search_text.strip():
-                locators.append(('By.LINK_TEXT', search_text))
-            
-            # 2. 【次优先】PARTIAL_LINK_TEXT定位器
-            if tag == 'a' and search_text.strip() and search_text in text:
-                locators.append(('By.PARTIAL_LINK_TEXT', search_text))
-            
-            # 3. 【高优先】精确文本的XPATH定位器（使用元素实际文本，而非搜索文本）
-            if text and text.strip():
-                # 转义单引号，避免XPath语法错误
-                # XPath中单引号的转义：使用concat()函数或双引号
-                clean_text = text.strip()
-                if "'" in clean_text:
-                    # 如果包含单引号，使用双引号包裹
-                    xpath_text_exact = f'//{tag}[text()="{clean_text}"]'
-                    xpath_text_contains = f'//{tag}[contains(text(), "{clean_text}")]'
-                else:
-                    # 没有单引号，使用单引号包裹
-                    xpath_text_exact = f"//{tag}[text()='{clean_text}']"
-                    xpath_text_contains = f"//{tag}[contains(text(), '{clean_text}')]"
-                
-                if text.strip() == search_text.strip():
-                    # 完全匹配文本 - 使用精确匹配
-                    locators.append(('By.XPATH', xpath_text_exact))
-                elif search_text.strip() in text:
-                    # 包含文本 - 但使用元素的完整文本进行精确匹配
-                    # 这样比contains更精确，避免匹配到其他相似元素
-                    locators.append(('By.XPATH', xpath_text_exact))
-                    # 同时也添加contains版本作为备选
-                    locators.append(('By.XPATH', xpath_text_contains))
-            
-            # 4. ID定位器
-            if attributes.get('id'):
-                element_id = attributes['id']
-                # 检查ID是否包含随机字符串（避免动态ID）
-                if not ElementLocatorGenerator._is_dynamic_value(element_id):
-                    if element_id[0].isdigit():
-                        locators.append(('By.CSS_SELECTOR', f"[id='{element_id}']"))
-                    else:
-                        locators.append(('By.CSS_SELECTOR', f"#{element_id}"))
-            
-            # 5. 稳定的属性定位器
-            locators.extend(ElementLocatorGenerator._generate_attribute_locators(attributes, search_text))
-            
-            # 6. 稳定的Class定位器（过滤动态class）
-            if attributes.get('class'):
-                classes = attributes['class'].split()
-                stable_classes = [c for c in classes if not ElementLocatorGenerator._is_dynamic_value(c)]
-                if stable_classes:
-                    first_stable = stable_classes[0]
-                    locators.append(('By.CSS_SELECTOR', f"{tag}.{first_stable}"))
-                    if len(stable_classes) >= 2:
-                        # 多个class组合更精确
-                        locators.append(('By.CSS_SELECTOR', f"{tag}.{'.'.join(stable_classes[:2])}"))
-            
-            # 7. 【最后】完整CSS路径定位器（容易失效，放最后）
+            if not attributes:
+                return []
+            
+            full_css_path = ''
             try:
                 full_css_path = ElementLocatorGenerator._generate_full_css_path(element, use_simple=use_simple_css)
-                if full_css_path and ' > ' in full_css_path:
-                    # 只有完整路径才添加，避免单一标签选择器
-                    locators.append(('By.CSS_SELECTOR', full_css_path))
             except Exception as e:
                 logging.debug(f"生成完整CSS路径失败: {e}")
             
-            # 去重
-            return ElementLocatorGenerator._deduplicate_locators(locators)
+            return ElementLocatorGenerator.locators_from_attributes(attributes, search_text, full_css_path)
             
         except Exception as e:
             logging.error(f"生成定位器时出错: {e}")
-            return locators
+            return []
+    
+    @staticmethod
+    def locators_from_attributes(attributes: Dict[str, str], search_text: str,
+                                 full_css_path: str = '') -> List[Tuple[str, str]]:
+        """
+        根据已读取的元素属性和完整CSS路径生成定位器
+        （录制工具通过WebDriver读取属性；捕获模式由页面内的监听脚本一次性读取后传回）
+        """
+        locators = []
+        tag = attributes.get('tag_name', '')
+        text = attributes.get('text', '')
+        
+        # 1. 【最优先】LINK_TEXT定位器（最稳定）
+        if tag == 'a' and text == search_text and search_text.strip():
+            locators.append(('By.LINK_TEXT', search_text))
+        
+        # 2. 【次优先】PARTIAL_LINK_TEXT定位器
+        if tag == 'a' and search_text.strip() and search_text in text:
+            locators.append(('By.PARTIAL_LINK_TEXT', search_text))
+        
+        # 3. 【高优先】精确文本的XPATH定位器（使用元素实际文本，而非搜索文本）
+        if text and text.strip():
+            # 转义单引号，避免XPath语法错误
+            # XPath中单引号的转义：使用concat()函数或双引号
+            clean_text = text.strip()
+            if "'" in clean_text:
+                # 如果包含单引号，使用双引号包裹
+                xpath_text_exact = f'//{tag}[text()="{clean_text}"]'
+                xpath_text_contains = f'//{tag}[contains(text(), "{clean_text}")]'
+            else:
+                # 没有单引号，使用单引号包裹
+                xpath_text_exact = f"//{tag}[text()='{clean_text}']"
+                xpath_text_contains = f"//{tag}[contains(text(), '{clean_text}')]"
+            
+            if text.strip() == search_text.strip():
+                # 完全匹配文本 - 使用精确匹配
+                locators.append(('By.XPATH', xpath_text_exact))
+            elif search_text.strip() in text:
+                # 包含文本 - 但使用元素的完整文本进行精确匹配
+                # 这样比contains更精确，避免匹配到其他相似元素
+                locators.append(('By.XPATH', xpath_text_exact))
+                # 同时也添加contains版本作为备选
+                locators.append(('By.XPATH', xpath_text_contains))
+        
+        # 4. ID定位器
+        if attributes.get('id'):
+            element_id = attributes['id']
+            # 检查ID是否包含随机字符串（避免动态ID）
+            if not ElementLocatorGenerator._is_dynamic_value(element_id):
+                if element_id[0].isdigit():
+                    locators.append(('By.CSS_SELECTOR', f"[id='{element_id}']"))
+                else:
+                    locators.append(('By.CSS_SELECTOR', f"#{element_id}"))
+        
+        # 5. 稳定的属性定位器
+        locators.extend(ElementLocatorGenerator._generate_attribute_locators(attributes, search_text))
+        
+        # 6. 稳定的Class定位器（过滤动态class）
+        if attributes.get('class'):
+            classes = attributes['class'].split()
+            stable_classes = [c for c in classes if not ElementLocatorGenerator._is_dynamic_value(c)]
+            if stable_classes:
+                first_stable = stable_classes[0]
+                locators.append(('By.CSS_SELECTOR', f"{tag}.{first_stable}"))
+                if len(stable_classes) >= 2:
+                    # 多个class组合更精确
+                    locators.append(('By.CSS_SELECTOR', f"{tag}.{'.'.join(stable_classes[:2])}"))
+        
+        # 7. 【最后】完整CSS路径定位器（容易失效，放最后）
+        if full_css_path and ' > ' in full_css_path:
+            # 只有完整路径才添加，避免单一标签选择器
+            locators.append(('By.CSS_SELECTOR', full_css_path))
+        
+        # 去重
+        return ElementLocatorGenerator._deduplicate_locators(locators)
     
     @staticmethod
     def _is_dynamic_value(value: str) -> bool:
@@ -534,9 +593,17 @@ class ElementLocatorGenerator:
 class TestScriptGenerator:
     """负责生成测试脚本（按需求编号分组）"""
     
-    def __init__(self, script_file: str, initial_url: str):
+    def __init__(self, script_file: str, initial_url: str,
+                 blocked_url_patterns: List[str] = None, blocked_resource_types: List[str] = None,
+                 output: Callable[[str], None] = print):
         self.script_file = script_file
+        # 收集步骤时的输出（录制工具在后台线程中收集步骤，输出交给主线程显示）
+        self.output = output
         self.initial_url = initial_url
+        self.blocked_url_patterns = DEFAULT_BLOCKED_URL_PATTERNS if blocked_url_patterns is None else blocked_url_patterns
+        self.blocked_resource_types = (
+            DEFAULT_BLOCKED_RESOURCE_TYPES if blocked_resource_types is None else blocked_resource_types
+        )
         self.test_step_count = 0
         self.test_steps_data = []  # 存储所有测试步骤数据
         self.precondition_steps_data = []  # 存储前置步骤数据（所有需求共享）
@@ -552,129 +619,513 @@ class TestScriptGenerator:
         with open(self.script_file, 'w', encoding='utf-8') as f:
             f.write(header)
     
+    @staticmethod
+    def _format_list(values: List[str]) -> str:
+        """把字符串列表格式化为脚本中的列表字面量（每项一行）"""
+        if not values:
+            return "[]"
+        items = ''.join(f'    {json.dumps(value, ensure_ascii=False)},\n' for value in values)
+        return f"[\n{items}]"
+    
     def _generate_script_header(self) -> str:
         """生成脚本文件头部"""
-        return f'''import os
-from datetime import datetime
+        return f'''import logging
+import os
+import sys
 import pytest
-from selenium import webdriver
-from selenium.webdriver import ActionChains, Keys
-from selenium.webdriver.chrome.service import Service
+# 收集阶段只需要By；WebDriver、ActionChains、WebDriverWait等在首次使用时再导入
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+import time
 from time import sleep
 
+from artifact_buffer import ArtifactBuffer
+from date_picker import select_date
+from element_cache import ElementCache
+from element_fingerprint import LocatorHealer
+from input_engine import FastInputEngine
+from network_replay import NetworkReplay
+from network_wait import NetworkMonitor
+from request_blocker import RequestBlocker
+from resource_monitor import CHECKPOINT_JS, RESTORE_STORAGE_JS, RecyclableDriver, ResourceMonitor
+from round_trips import RoundTripCounter
+from run_history import RunHistory
+from step_timeouts import StepTimeouts
 
-@pytest.fixture(scope="class")
-def driver():
-    service = Service(executable_path="C:\\\\Program Files\\\\Google\\\\Chrome\\\\Application\\\\chromedriver.exe")
-    driver = webdriver.Chrome(service=service)
-    driver.get("{self.initial_url}")
+
+INITIAL_URL = "{self.initial_url}"
+
+# 自适应快速输入引擎（清空方式与输入方式按定位器缓存在 input_strategies.json）
+INPUT_ENGINE = FastInputEngine()
+
+# 点击/悬浮方式：composite(默认)一次浏览器调用完成滚动、遮挡检查和操作；native 为逐条WebDriver命令
+CLICK_MODE = os.environ.get("CTRIP_CLICK_MODE", "composite")
+ROUND_TRIPS = RoundTripCounter()
+
+# 步骤截图（CTRIP_ARTIFACT_MODE=failure 时只保存在内存环形缓冲中，失败或标记的步骤才写盘）
+ARTIFACTS = ArtifactBuffer()
+
+# 每步采样浏览器内存/CPU/JS堆，超过阈值（CTRIP_RECYCLE_STEPS / CTRIP_RECYCLE_MB / CTRIP_RECYCLE_HEAP_MB）时透明回收浏览器
+RESOURCES = ResourceMonitor()
+
+# 每个步骤的耗时、各阶段耗时、生效的定位器、重试和失败类型在运行结束时写入 run_history.db（CTRIP_RUN_HISTORY）
+HISTORY = RunHistory()
+
+# 所有定位器都失效时按录制时的元素指纹（STEP_OPTIONS 中的 fingerprint）找回元素，自愈得到的定位器记入 healed_locators.jsonl
+HEALER = LocatorHealer()
+
+# 查找元素的等待时间按运行历史中主定位器查找耗时的p95加余量学习（step_timeouts.json），没有足够样本时使用固定等待时间
+TIMEOUTS = StepTimeouts()
+
+# 同一页面中再次查找同一个元素时复用已解析的元素（页面跳转或元素被重新渲染后自动重新解析，CTRIP_ELEMENT_CACHE=0 关闭）
+ELEMENTS = ElementCache()
+
+# 运行时屏蔽的统计、广告、追踪请求（设置环境变量 CTRIP_BLOCK_REQUESTS=0 关闭）
+BLOCKED_URL_PATTERNS = {self._format_list(self.blocked_url_patterns)}
+BLOCKED_RESOURCE_TYPES = {self._format_list(self.blocked_resource_types)}
+REQUEST_BLOCKER = RequestBlocker(BLOCKED_URL_PATTERNS, BLOCKED_RESOURCE_TYPES,
+                                 enabled=os.environ.get("CTRIP_BLOCK_REQUESTS", "1") == "1")
+
+
+def create_driver(archive_name="default"):
+    """创建浏览器驱动并打开初始页面（fixture与执行计划等工具共用）
+
+    archive_name: 网络录制/回放模式（CTRIP_NETWORK_MODE=record/replay）下使用的归档名称
+    """
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from driver_resolver import chrome_service
+    from network_wait import enable_network_log
+
+    # 开启Network性能日志，用于等待步骤触发的请求完成
+    options = enable_network_log(Options())
+    # 使用本机与Chrome版本匹配的chromedriver（按浏览器版本缓存，启动时不需要联网）
+    service = chrome_service(options)
+    if os.environ.get("CTRIP_BROWSER_DAEMON") == "1":
+        # 连接常驻浏览器守护进程，避免每次运行冷启动Chrome
+        from browser_daemon import BrowserDaemon
+        driver = BrowserDaemon().attach(service=service, options=options)
+    else:
+        driver = webdriver.Chrome(service=service, options=options)
+    RoundTripCounter.attach(driver)
+    driver.known_windows = set(driver.window_handles)
+    REQUEST_BLOCKER.apply(driver)
+    driver.network_replay = NetworkReplay.from_env(driver, archive_name)
+    driver.get(INITIAL_URL)
     driver.maximize_window()
+    return driver
+
+
+def release_driver(driver):
+    """释放浏览器驱动：守护进程中的浏览器只断开会话，其余直接退出"""
+    daemon = getattr(driver, "browser_daemon", None)
+    try:
+        REQUEST_BLOCKER.collect(driver)
+        REQUEST_BLOCKER.detach(driver)
+        if getattr(driver, "network_replay", None) is not None:
+            driver.network_replay.stop()
+        if daemon is not None:
+            daemon.detach(driver)
+        else:
+            driver.quit()
+    except:
+        pass
+
+
+@pytest.fixture(scope="session", autouse=True)
+def request_blocking_summary():
+    """整个运行结束后输出请求屏蔽统计"""
+    yield
+    REQUEST_BLOCKER.print_summary()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def artifact_summary():
+    """整个运行结束后输出截图缓冲统计"""
+    yield
+    ARTIFACTS.print_summary()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def round_trip_summary():
+    """整个运行结束后输出每步的WebDriver往返次数"""
+    yield
+    ROUND_TRIPS.print_summary(f"（CTRIP_CLICK_MODE={{CLICK_MODE}}）")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def element_cache_summary():
+    """整个运行结束后输出元素缓存的命中情况"""
+    yield
+    ELEMENTS.print_summary()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def resource_summary():
+    """整个运行结束后输出每个浏览器实例的内存曲线并写入资源报告"""
+    yield
+    RESOURCES.print_summary()
+    RESOURCES.write_report()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def run_history():
+    """整个运行结束后把步骤结果批量写入运行历史数据库，并据此更新步骤等待时间"""
+    HISTORY.start_run(os.path.basename(__file__), click_mode=CLICK_MODE)
+    yield
+    HISTORY.finish_run()
+    TIMEOUTS.learn(HISTORY.path)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def locator_preflight():
+    """CTRIP_PREFLIGHT=report/abort 时，运行前在每个页面状态批量检查所有步骤的定位器（abort：有失效步骤时中止运行）"""
+    mode = os.environ.get("CTRIP_PREFLIGHT", "off")
+    if mode in ("report", "abort"):
+        from preflight import run_preflight
+        run_preflight(sys.modules[__name__], abort=mode == "abort")
+    yield
+
+
+@pytest.fixture(scope="class")
+def driver(request):
+    # 每个需求类使用独立的网络归档；测试拿到的是可回收的代理，回收浏览器后仍是同一个对象
+    name = request.cls.__name__ if request.cls else "default"
+    driver = RecyclableDriver(lambda: create_driver(name), release_driver, RESOURCES, name)
     yield driver
-    driver.quit()
+    release_driver(driver)
+
+
+# 组合操作：一次调用完成"不在视口内才滚动 → 遮挡检查 → 点击/返回悬浮坐标"，并报告点击是否打开了新窗口
+ACTION_JS = """
+    var el = arguments[0], action = arguments[1];
+    if (!window.__ctripOpenHooked) {{
+        window.__ctripOpenHooked = true;
+        window.__ctripOpened = 0;
+        var open = window.open;
+        window.open = function () {{ window.__ctripOpened++; return open.apply(this, arguments); }};
+    }}
+    var rect = el.getBoundingClientRect();
+    if (rect.top < 0 || rect.left < 0 || rect.bottom > innerHeight || rect.right > innerWidth) {{
+        el.scrollIntoView({{block: 'center'}});
+        rect = el.getBoundingClientRect();
+    }}
+    if (!rect.width && !rect.height) {{ return {{status: 'invisible'}}; }}
+    var x = rect.left + rect.width / 2, y = rect.top + rect.height / 2;
+    var hit = document.elementFromPoint(x, y);
+    if (hit && hit !== el && !el.contains(hit)) {{
+        return {{status: 'covered', by: hit.tagName.toLowerCase() + (hit.id ? '#' + hit.id : '')}};
+    }}
+    if (action !== 'click') {{ return {{status: 'ready', x: x, y: y}}; }}
+
+    var before = window.__ctripOpened;
+    var options = {{bubbles: true, cancelable: true, view: window, clientX: x, clientY: y, button: 0}};
+    ['pointerdown', 'mousedown', 'pointerup', 'mouseup'].forEach(function (type) {{
+        var Event = type.indexOf('pointer') === 0 && window.PointerEvent ? PointerEvent : MouseEvent;
+        el.dispatchEvent(new Event(type, options));
+    }});
+    el.click();
+    var blank = el.closest('a[target=_blank], form[target=_blank]');
+    return {{status: 'clicked', opened: window.__ctripOpened > before || !!blank}};
+"""
 
 
 class BaseCtripFlight:
     """基础类，包含所有测试类共用的操作方法"""
 
-    def execute_action(self, driver, by_type, locator, action_type, input_data=None, alternative_locators=None):
-        """统一的操作执行方法（支持备选定位器容错）"""
-        if action_type == 'click':
-            element = self._find_element_with_fallback(driver, by_type, locator, alternative_locators)
-            driver.execute_script("arguments[0].scrollIntoView({{block: 'center'}});", element)
-            sleep(0.5)
-            
-            windows_before = set(driver.window_handles)
-            
+    # 每个需求类独立维护：最近一次通过步骤后的检查点、导致需求放弃的步骤编号、
+    # 已通过的步骤（回收浏览器后在新浏览器中重放）
+    _checkpoint = None
+    _aborted_by = None
+    _passed_steps = None
+
+    @staticmethod
+    def step_timeout(step_id):
+        """步骤查找元素的超时：STEP_OPTIONS中配置的固定值优先，否则使用按运行历史学到的预算（都没有时为None，使用默认超时）"""
+        return STEP_OPTIONS.get(step_id, {{}}).get("timeout") or TIMEOUTS.get(step_id)
+
+    def run_precondition(self, driver, precondition_data):
+        """执行共享前置步骤，失败时放弃该需求的剩余步骤"""
+        cls = type(self)
+        if cls._aborted_by:
+            for precond_step in precondition_data:
+                HISTORY.skip_step(precond_step[0], f"{{cls._aborted_by}} 失败")
+            pytest.skip(f"{{cls._aborted_by}} 失败，跳过该需求的剩余步骤")
+        try:
+            for precond_step in precondition_data:
+                precond_id, precond_by, precond_loc, precond_alts, precond_action, precond_name, precond_input = precond_step
+                options = STEP_OPTIONS.get(precond_id, {{}})
+                HISTORY.start_step(precond_id, precond_action, precond_loc)
+                self.execute_action(driver, precond_by, precond_loc, precond_action, precond_input, precond_alts,
+                                    wait_for=options.get("wait_for"), fingerprint=options.get("fingerprint"),
+                                    timeout=self.step_timeout(precond_id))
+                HISTORY.finish_step("passed")
+        except Exception as e:
+            HISTORY.finish_step("failed", e)
+            cls._aborted_by = "前置步骤"
+            ARTIFACTS.dump(driver, precond_id)
+            raise
+        cls._passed_steps = list(precondition_data)
+        self.update_checkpoint(driver)
+
+    def run_step(self, driver, test_case_id, by_type, locator, action_type, input_data=None, alternative_locators=None):
+        """执行业务步骤：通过后记录检查点；失败时恢复上一个检查点重试一次，仍失败则快速跳过该需求的剩余步骤"""
+        cls = type(self)
+        if cls._aborted_by:
+            HISTORY.skip_step(test_case_id, f"{{cls._aborted_by}} 失败")
+            pytest.skip(f"{{cls._aborted_by}} 失败，跳过该需求的剩余步骤")
+        self.recycle_if_needed(driver)
+
+        options = STEP_OPTIONS.get(test_case_id, {{}})
+        wait_for = options.get("wait_for")
+        fingerprint = options.get("fingerprint")
+        timeout = self.step_timeout(test_case_id)
+        mark = RoundTripCounter.mark(driver)
+        HISTORY.start_step(test_case_id, action_type, locator)
+        try:
+            self.execute_action(driver, by_type, locator, action_type, input_data, alternative_locators, wait_for,
+                                fingerprint, timeout)
+        except Exception as first_error:
+            if cls._checkpoint is None:
+                cls._aborted_by = test_case_id
+                HISTORY.finish_step("failed", first_error)
+                ARTIFACTS.dump(driver, test_case_id)
+                raise
+            HISTORY.note_retry()
             try:
-                element.click()
-            except:
-                driver.execute_script("arguments[0].click();", element)
+                self.restore_checkpoint(driver, cls._checkpoint)
+                self.execute_action(driver, by_type, locator, action_type, input_data, alternative_locators, wait_for,
+                                    fingerprint, timeout)
+            except Exception:
+                cls._aborted_by = test_case_id
+                HISTORY.finish_step("failed", first_error)
+                ARTIFACTS.dump(driver, test_case_id)
+                raise first_error
+
+        HISTORY.finish_step("passed")
+        ROUND_TRIPS.record(driver, action_type, mark)
+        RESOURCES.after_step(driver, test_case_id)
+        if cls._passed_steps is not None:
+            cls._passed_steps.append((test_case_id, by_type, locator, alternative_locators, action_type, None, input_data))
+        self.update_checkpoint(driver)
+
+    def recycle_if_needed(self, driver):
+        """上一个步骤超过资源阈值时，在本步骤之前回收浏览器
+
+        表单状态只存在于页面内存中，新浏览器从初始页面重放本需求已通过的步骤（不计入运行历史）后再继续
+        """
+        reason = RESOURCES.pending_recycle(driver)
+        if not reason:
+            return
+        cls = type(self)
+        driver.recycle(reason, restore=False)
+        for step_id, step_by, step_loc, step_alts, step_action, _, step_input in cls._passed_steps or []:
+            options = STEP_OPTIONS.get(step_id, {{}})
+            self.execute_action(driver, step_by, step_loc, step_action, step_input, step_alts,
+                                wait_for=options.get("wait_for"), fingerprint=options.get("fingerprint"),
+                                timeout=self.step_timeout(step_id))
+        print(f"♻ 已在新浏览器中重放 {{len(cls._passed_steps or [])}} 个已通过的步骤")
+        self.update_checkpoint(driver)
+
+    def update_checkpoint(self, driver):
+        """步骤通过后更新检查点；读取失败（页面正在跳转、存储不可访问）时保留上一个检查点，不影响已通过的步骤"""
+        try:
+            type(self)._checkpoint = self.take_checkpoint(driver)
+        except Exception as e:
+            logging.debug(f"记录检查点失败，沿用上一个检查点: {{e}}")
+
+    @staticmethod
+    def take_checkpoint(driver):
+        """记录检查点：当前窗口、URL以及localStorage/sessionStorage"""
+        state = driver.execute_script(CHECKPOINT_JS)
+        state["window"] = driver.current_window_handle
+        return state
+
+    @staticmethod
+    def restore_checkpoint(driver, checkpoint):
+        """恢复检查点：切回检查点窗口；页面已离开检查点URL时重新打开并恢复存储"""
+        if checkpoint["window"] in driver.window_handles:
+            driver.switch_to.window(checkpoint["window"])
+        if driver.current_url != checkpoint["url"]:
+            driver.get(checkpoint["url"])
+            driver.execute_script(RESTORE_STORAGE_JS, checkpoint)
+            driver.refresh()
+
+    def execute_action(self, driver, by_type, locator, action_type, input_data=None, alternative_locators=None,
+                       wait_for=None, fingerprint=None, timeout=None):
+        """统一的操作执行方法（支持备选定位器容错；wait_for为该步骤触发的请求URL模式，fingerprint为录制时的元素指纹，
+        timeout为该步骤查找元素的等待时间，为空时使用固定等待时间）
+
+        元素在查找之后被页面重新渲染（StaleElementReferenceException）时丢弃缓存，重新查找并再执行一次
+        """
+        from selenium.common.exceptions import StaleElementReferenceException
+
+        args = (driver, by_type, locator, action_type, input_data, alternative_locators, wait_for, fingerprint, timeout)
+        try:
+            self._perform_action(*args)
+        except StaleElementReferenceException:
+            ELEMENTS.invalidate(by_type, locator)
+            self._perform_action(*args)
+
+    def _perform_action(self, driver, by_type, locator, action_type, input_data, alternative_locators, wait_for,
+                        fingerprint, timeout):
+        if action_type == 'click':
+            element = self._find_element_with_fallback(driver, by_type, locator, alternative_locators,
+                                                       timeout=timeout or 10, fingerprint=fingerprint)
+            since = time.time()
+            result = self._composite_action(driver, element, 'click')
+            windows_before = None
+            if result.get('status') != 'clicked':
+                # native模式、元素被遮挡或不可见：逐条命令滚动和点击，点击前后比较窗口句柄
+                driver.execute_script("arguments[0].scrollIntoView({{block: 'center'}});", element)
+                windows_before = set(driver.window_handles)
+                try:
+                    element.click()
+                except:
+                    driver.execute_script("arguments[0].click();", element)
             
-            sleep(1)
+            # 有URL模式时等待匹配请求完成，否则最多等1秒网络空闲
+            self.wait_for_network(driver, wait_for, since, timeout=15 if wait_for else 1)
             
-            windows_after = set(driver.window_handles)
-            if len(windows_after) > len(windows_before):
-                new_window = list(windows_after - windows_before)[0]
-                driver.switch_to.window(new_window)
+            # 组合点击报告了打开新窗口时才读取窗口句柄
+            if windows_before is not None or result.get('opened'):
+                self._switch_to_unseen_window(driver, windows_before)
             
         elif action_type == 'input':
-            element = self._find_element_with_fallback(driver, by_type, locator, alternative_locators, timeout=20)
+            element = self._find_element_with_fallback(driver, by_type, locator, alternative_locators,
+                                                       timeout=timeout or 20, fingerprint=fingerprint)
             element.click()
-            sleep(0.3)
-            
-            try:
-                element.clear()
-                sleep(0.2)
-            except:
-                pass
-            
-            try:
-                driver.execute_script("""
-                    arguments[0].value = '';
-                    arguments[0].dispatchEvent(new Event('input', {{ bubbles: true }}));
-                    arguments[0].dispatchEvent(new Event('change', {{ bubbles: true }}));
-                """, element)
-                sleep(0.2)
-            except:
-                pass
-            
-            try:
-                element.send_keys(Keys.CONTROL + 'a')
-                sleep(0.1)
-                element.send_keys(Keys.BACKSPACE)
-                sleep(0.1)
-            except:
-                pass
-            
-            element.send_keys(input_data)
+            # 按定位器缓存的清空方式清空，再通过Input.insertText一次性输入；只有需要键盘事件的控件才逐键输入
+            since = time.time()
+            INPUT_ENGINE.type_text(driver, element, input_data, key=INPUT_ENGINE.locator_key(by_type, locator))
+            if wait_for:
+                # 等待城市联想等请求返回
+                self.wait_for_network(driver, wait_for, since)
+            
+        elif action_type == 'select_date':
+            # input_data为真实日期（YYYY-MM-DD）或相对今天的天数（+N），一次调用完成定位、翻月和点击
+            element = self._find_element_with_fallback(driver, by_type, locator, alternative_locators,
+                                                       timeout=timeout or 10, fingerprint=fingerprint)
+            since = time.time()
+            select_date(driver, element, input_data)
+            self.wait_for_network(driver, wait_for, since, timeout=15 if wait_for else 1)
             
         elif action_type == 'hover':
-            element = self._find_element_with_fallback(driver, by_type, locator, alternative_locators)
-            driver.execute_script("arguments[0].scrollIntoView({{block: 'center'}});", element)
-            sleep(0.5)
-            actions = ActionChains(driver)
-            actions.move_to_element(element).perform()
-            sleep(1)
+            element = self._find_element_with_fallback(driver, by_type, locator, alternative_locators,
+                                                       timeout=timeout or 10, fingerprint=fingerprint)
+            since = time.time()
+            result = self._composite_action(driver, element, 'hover')
+            if result.get('status') != 'ready' or not self._move_mouse(driver, result['x'], result['y']):
+                from selenium.webdriver import ActionChains
+
+                driver.execute_script("arguments[0].scrollIntoView({{block: 'center'}});", element)
+                actions = ActionChains(driver)
+                actions.move_to_element(element).perform()
+            # 悬浮展开的菜单可能异步加载内容：与点击相同，有URL模式时等待匹配请求完成，否则最多等1秒网络空闲
+            self.wait_for_network(driver, wait_for, since, timeout=15 if wait_for else 1)
             
         elif action_type == 'window_switch':
             window_index = int(locator.split('_')[1]) - 1
             window_handles = driver.window_handles
             driver.switch_to.window(window_handles[window_index])
+            self._known_windows(driver).update(window_handles)
     
-    def _find_element_with_fallback(self, driver, by_type, locator, alternative_locators=None, timeout=10):
-        """使用主定位器查找元素，失败后尝试备选定位器"""
-        from selenium.common.exceptions import TimeoutException, NoSuchElementException
-        
+    @staticmethod
+    def _composite_action(driver, element, action):
+        """一次浏览器调用完成滚动、遮挡检查和点击（或返回悬浮坐标）；返回空字典表示改用逐条命令"""
+        if CLICK_MODE != "composite":
+            return {{}}
         try:
-            wait = WebDriverWait(driver, timeout)
-            element = wait.until(EC.presence_of_element_located((by_type, locator)))
-            return element
-        except TimeoutException:
-            pass
-        
-        if alternative_locators:
-            for alt_by, alt_locator in alternative_locators:
-                try:
-                    wait = WebDriverWait(driver, 5)
-                    element = wait.until(EC.presence_of_element_located((alt_by, alt_locator)))
-                    return element
-                except TimeoutException:
-                    continue
+            return driver.execute_script(ACTION_JS, element, action) or {{}}
+        except Exception:
+            return {{}}
+    
+    @staticmethod
+    def _move_mouse(driver, x, y):
+        """通过DevTools把真实鼠标移动到视口坐标（触发:hover样式和mouseenter）"""
+        try:
+            driver.execute_cdp_cmd("Input.dispatchMouseEvent", {{"type": "mouseMoved", "x": x, "y": y}})
+            return True
+        except Exception:
+            return False
+    
+    @staticmethod
+    def _known_windows(driver):
+        known = getattr(driver, "known_windows", None)
+        if known is None:
+            known = driver.known_windows = set(driver.window_handles)
+        return known
+    
+    def _switch_to_unseen_window(self, driver, windows_before=None):
+        """切换到新打开的窗口（windows_before为空时与已知窗口比较），返回是否切换"""
+        known = self._known_windows(driver)
+        window_handles = driver.window_handles
+        new_windows = [handle for handle in window_handles if handle not in (windows_before or known)]
+        known.update(window_handles)
+        if new_windows:
+            driver.switch_to.window(new_windows[0])
+            return True
+        return False
+    
+    @staticmethod
+    def wait_for_network(driver, wait_for, since, timeout=15):
+        """等待步骤触发的请求完成；驱动未开启性能日志时退回原来的固定等待"""
+        with HISTORY.phase("network"):
+            if NetworkMonitor.for_driver(driver).wait(wait_for, since=since, timeout=timeout) is None:
+                sleep(1)
+
+    def _find_element_with_fallback(self, driver, by_type, locator, alternative_locators=None, timeout=10,
+                                    fingerprint=None):
+        """使用主定位器查找元素，失败后尝试备选定位器，都失败时按元素指纹自愈（已解析过且仍在文档中的元素直接复用；
+        查找耗时和生效的定位器记入运行历史）"""
+        from selenium.common.exceptions import TimeoutException, NoSuchElementException
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
         
-        raise NoSuchElementException(f"无法找到元素: 主定位器和所有备选定位器均失败")
+        with HISTORY.phase("find"):
+            # 同一页面中再次查找同一个元素：确认缓存的元素仍在文档中即可，不再等待
+            cached = ELEMENTS.get(driver, by_type, locator)
+            if cached is not None:
+                HISTORY.note_cached()
+                return cached[0]
+            
+            try:
+                wait = WebDriverWait(driver, timeout)
+                element = wait.until(EC.presence_of_element_located((by_type, locator)))
+                HISTORY.note_locator(0)
+                ELEMENTS.put(by_type, locator, element, 0)
+                return element
+            except TimeoutException:
+                pass
+            
+            if alternative_locators:
+                for index, (alt_by, alt_locator) in enumerate(alternative_locators, start=1):
+                    try:
+                        wait = WebDriverWait(driver, min(5, timeout))
+                        element = wait.until(EC.presence_of_element_located((alt_by, alt_locator)))
+                        HISTORY.note_locator(index)
+                        ELEMENTS.put(by_type, locator, element, index)
+                        return element
+                    except TimeoutException:
+                        continue
+            
+            # 页面稍后才打开的新窗口（组合点击只能报告点击时同步打开的窗口）：切换过去再找一次
+            if self._switch_to_unseen_window(driver):
+                return self._find_element_with_fallback(driver, by_type, locator, alternative_locators, timeout,
+                                                        fingerprint)
+            
+            # 所有定位器都失效：按录制时的元素指纹在页面内一次打分，找回置信度足够高的元素
+            element = HEALER.heal(driver, fingerprint, by_type, locator)
+            if element is not None:
+                HISTORY.note_locator(len(alternative_locators or []) + 1)
+                ELEMENTS.put(by_type, locator, element, len(alternative_locators or []) + 1)
+                return element
+            
+            raise NoSuchElementException(f"无法找到元素: 主定位器和所有备选定位器均失败")
 
     @staticmethod
-    def take_screenshot(driver, file_name):
-        timestamp = datetime.now().strftime("%H%M%S%d%f")
-        timestamped_file_name = f"{{timestamp}}_{{file_name}}"
-        screenshots_dir = "screenshots"
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
-        screenshot_file_path = os.path.join(screenshots_dir, timestamped_file_name)
-        driver.save_screenshot(screenshot_file_path)
+    def take_screenshot(driver, file_name, keep=False):
+        """步骤截图：always模式直接写入screenshots目录；failure模式放入缓冲，keep=True时立即写盘"""
+        ARTIFACTS.capture(driver, file_name, keep)
 
 
 '''
@@ -727,6 +1178,8 @@ class BaseCtripFlight:
             action_type = "input"
         elif operation_type == "悬浮":
             action_type = "hover"
+        elif operation_type == "选择日期":
+            action_type = "select_date"
         else:
             action_type = "click"
         
@@ -750,6 +1203,10 @@ class BaseCtripFlight:
                 'test_name': element_data['search_text'],
                 'input_data': element_data.get('user_input', '')
             }
+            if element_data.get('wait_for'):
+                step_data['wait_for'] = element_data['wait_for']
+            if element_data.get('fingerprint'):
+                step_data['fingerprint'] = element_data['fingerprint']
             
             self.precondition_steps_data.append(step_data)
             step_type_text = "前置步骤"
@@ -757,7 +1214,7 @@ class BaseCtripFlight:
         else:
             # 业务步骤（需要需求编号）
             if self.current_requirement is None:
-                print("\n⚠ 错误：请先输入 'b' 完成前置步骤并设置需求编号")
+                self.output("\n⚠ 错误：请先输入 'b' 完成前置步骤并设置需求编号")
                 return "错误：未设置需求编号"
             
             # 确保需求编号在字典中存在（可能被删除后重新添加）
@@ -779,6 +1236,10 @@ class BaseCtripFlight:
                 'test_name': element_data['search_text'],
                 'input_data': element_data.get('user_input', '')
             }
+            if element_data.get('wait_for'):
+                step_data['wait_for'] = element_data['wait_for']
+            if element_data.get('fingerprint'):
+                step_data['fingerprint'] = element_data['fingerprint']
             
             self.test_steps_data.append(step_data)
             step_index = len(self.test_steps_data) - 1
@@ -788,18 +1249,30 @@ class BaseCtripFlight:
             req_text = f"【{self.current_requirement}】"
         
         # 显示收集的信息
-        print(f"\n{'='*50}")
-        print(f"已收集{step_type_text} {req_text}: {test_case_id}")
-        print(f"  操作名称: {element_data['search_text']}")
-        print(f"  定位方式: {element_data['selector_type']}")
-        print(f"  定位器: {element_data['selector'][:80]}{'...' if len(element_data['selector']) > 80 else ''}")
-        print(f"  操作类型: {action_type}")
-        if action_type == "input":
-            print(f"  输入内容: {element_data['user_input']}")
-        print(f"{'='*50}")
+        self.output(f"\n{'='*50}")
+        self.output(f"已收集{step_type_text} {req_text}: {test_case_id}")
+        self.output(f"  操作名称: {element_data['search_text']}")
+        self.output(f"  定位方式: {element_data['selector_type']}")
+        self.output(f"  定位器: {element_data['selector'][:80]}{'...' if len(element_data['selector']) > 80 else ''}")
+        self.output(f"  操作类型: {action_type}")
+        if action_type in ("input", "select_date"):
+            self.output(f"  输入内容: {element_data['user_input']}")
+        self.output(f"{'='*50}")
         
         return f"步骤{step_num}: {element_data['search_text']}"
     
+    def set_last_step_wait(self, pattern: str) -> bool:
+        """为最近收集的步骤设置等待的请求URL模式"""
+        if self.is_collecting_precondition:
+            steps = self.precondition_steps_data
+        else:
+            steps = self.test_steps_data
+        if not steps:
+            return False
+        steps[-1]['wait_for'] = pattern
+        print(f"✓ {steps[-1]['test_case_id']} 将等待请求: {pattern}")
+        return True
+    
     def add_window_switch_method(self, window_index: int, window_title: str):
         """添加窗口切换步骤"""
         # 如果没有设置需求编号，询问用户
@@ -915,39 +1388,72 @@ class BaseCtripFlight:
             print(f"无效的步骤索引: {index + 1}")
             return False
     
+    @staticmethod
+    def _escape(value: str) -> str:
+        return value.replace('\\', '\\\\').replace('"', '\\"')
+    
+    @staticmethod
+    def _locator_key(step: Dict) -> Tuple:
+        """逻辑元素的判定键：主定位器和备选定位器都相同才视为同一个元素"""
+        return (step['by_type'], step['locator'],
+                tuple((alt_by.replace('By.', ''), alt_loc) for alt_by, alt_loc in step.get('alternative_locators', [])))
+    
+    def _build_locator_registry(self) -> Dict[Tuple, str]:
+        """为每个逻辑元素分配共享定位器表中的名称（按首次出现的顺序；name/id定位器用其值，其余用操作名称）"""
+        registry: Dict[Tuple, str] = {}
+        used: Set[str] = set()
+        for step in self.precondition_steps_data + self.test_steps_data:
+            if step['action_type'] == 'window_switch':
+                continue
+            key = self._locator_key(step)
+            if key in registry:
+                continue
+            base = step['locator'] if step['by_type'] in ('ID', 'NAME') else step['test_name']
+            name, suffix = base, 2
+            while name in used:
+                name, suffix = f"{base}_{suffix}", suffix + 1
+            registry[key] = name
+            used.add(name)
+        return registry
+    
+    def _generate_locator_registry(self) -> str:
+        """生成共享定位器表"""
+        lines = ["# 共享定位器表：每个逻辑元素（主定位器 + 备选定位器）只定义一次，前置步骤和各需求的步骤表按名称引用",
+                 "LOCATORS = {"]
+        for (by_type, locator, alternatives), name in self._locator_registry.items():
+            alt_locators_str = '[' + ', '.join(
+                f'(By.{alt_by}, "{self._escape(alt_loc)}")' for alt_by, alt_loc in alternatives
+            ) + ']'
+            lines.append(f'    "{self._escape(name)}": (By.{by_type}, "{self._escape(locator)}", {alt_locators_str}),')
+        lines.append("}")
+        return '\n'.join(lines) + '\n'
+    
+    def _format_step_row(self, step: Dict) -> str:
+        """生成步骤表中的一行：定位器引用共享定位器表（窗口切换等不在表中的步骤直接写出定位器）"""
+        test_case_id = step['test_case_id']
+        action_type = step['action_type']
+        test_name = self._escape(step['test_name'])
+        input_data = step.get('input_data', '')
+        input_str = f'"{self._escape(input_data)}"' if input_data else 'None'
+        
+        name = getattr(self, '_locator_registry', {}).get(self._locator_key(step))
+        if name is not None:
+            locator_str = f'*LOCATORS["{self._escape(name)}"]'
+        else:
+            alt_locators_str = '[' + ', '.join(
+                f'(By.{alt_by.replace("By.", "")}, "{self._escape(alt_loc)}")'
+                for alt_by, alt_loc in step.get('alternative_locators', [])
+            ) + ']'
+            locator_str = f'By.{step["by_type"]}, "{self._escape(step["locator"])}", {alt_locators_str}'
+        
+        return f'        ("{test_case_id}", {locator_str}, "{action_type}", "{test_name}", {input_str}),'
+    
     def _generate_test_data_for_requirement(self, req_id: str, step_indices: List[int]) -> str:
-        """为单个需求生成测试数据（参数化，包含备选定位器）"""
+        """为单个需求生成测试数据（参数化，定位器引用共享定位器表）"""
         lines = []
         lines.append(f"    TEST_DATA_{req_id} = [")
-        
         for idx in step_indices:
-            step = self.test_steps_data[idx]
-            test_case_id = step['test_case_id']
-            by_type = step['by_type']
-            locator = step['locator'].replace('\\', '\\\\').replace('"', '\\"')
-            action_type = step['action_type']
-            test_name = step['test_name'].replace('\\', '\\\\').replace('"', '\\"')
-            input_data = step.get('input_data', '')
-            
-            # 获取备选定位器
-            alternative_locators = step.get('alternative_locators', [])
-            alt_locators_list = []
-            for alt_by, alt_loc in alternative_locators:
-                alt_by_name = alt_by.replace('By.', '')
-                alt_loc_escaped = alt_loc.replace('\\', '\\\\').replace('"', '\\"')
-                alt_locators_list.append(f'(By.{alt_by_name}, "{alt_loc_escaped}")')
-            
-            alt_locators_str = '[' + ', '.join(alt_locators_list) + ']' if alt_locators_list else '[]'
-            
-            if input_data:
-                input_data = input_data.replace('\\', '\\\\').replace('"', '\\"')
-                input_str = f'"{input_data}"'
-            else:
-                input_str = 'None'
-            
-            line = f'        ("{test_case_id}", By.{by_type}, "{locator}", {alt_locators_str}, "{action_type}", "{test_name}", {input_str}),'
-            lines.append(line)
-        
+            lines.append(self._format_step_row(self.test_steps_data[idx]))
         lines.append("    ]")
         return '\n'.join(lines)
     
@@ -968,20 +1474,31 @@ class BaseCtripFlight:
         if self.precondition_steps_data:
             lines.append(f"        # 只在第一个测试步骤时执行前置步骤")
             lines.append(f"        if not TestCtripFlight_{req_id}._precondition_executed:")
-            lines.append("            for precond_step in PreCondition.PRECONDITION_DATA:")
-            lines.append("                precond_id, precond_by, precond_loc, precond_alts, precond_action, precond_name, precond_input = precond_step")
-            lines.append("                self.execute_action(driver, precond_by, precond_loc, precond_action, precond_input, precond_alts)")
-            lines.append("                sleep(0.5)")
+            lines.append("            self.run_precondition(driver, PreCondition.PRECONDITION_DATA)")
             lines.append(f"            TestCtripFlight_{req_id}._precondition_executed = True")
             lines.append("")
-            lines.append("        # 执行业务步骤")
         
-        lines.append("        self.execute_action(driver, by_type, locator, action_type, input_data, alternative_locators)")
-        lines.append("        self.take_screenshot(driver, f\"{test_case_id}.png\")")
-        lines.append("        sleep(1)")
+        lines.append("        # 执行业务步骤（失败时恢复检查点重试一次，仍失败则跳过剩余步骤）")
+        lines.append("        self.run_step(driver, test_case_id, by_type, locator, action_type, input_data, alternative_locators)")
+        lines.append("        self.take_screenshot(driver, f\"{test_case_id}.png\",")
+        lines.append("                             keep=STEP_OPTIONS.get(test_case_id, {}).get(\"keep_artifacts\", False))")
         
         return '\n'.join(lines)
     
+    def _generate_step_options(self) -> str:
+        """生成步骤附加选项（如等待的请求URL模式），按测试用例编号索引，不改变参数化数据的结构"""
+        lines = ["# 步骤附加选项：wait_for=该步骤触发、需要等待完成的请求URL（正则）",
+                 "#               keep_artifacts=True 时该步骤的截图总是写盘（CTRIP_ARTIFACT_MODE=failure 下也写）",
+                 "#               fingerprint=录制时的元素指纹，所有定位器都失效时用于自愈",
+                 "#               timeout=查找元素的等待时间（秒），优先于 step_timeouts.json 中学习到的等待时间",
+                 "STEP_OPTIONS = {"]
+        for step in self.precondition_steps_data + self.test_steps_data:
+            options = {name: step[name] for name in STEP_OPTION_NAMES if step.get(name)}
+            if options:
+                lines.append(f'    "{step["test_case_id"]}": {json.dumps(options, ensure_ascii=False)},')
+        lines.append("}")
+        return '\n'.join(lines) + '\n'
+    
     def _generate_precondition_class(self) -> str:
         """生成共享的前置步骤类（仅包含数据，不包含测试方法）"""
         if not self.precondition_steps_data:
@@ -993,32 +1510,10 @@ class BaseCtripFlight:
         lines.append("    PRECONDITION_DATA = [")
         
         for step in self.precondition_steps_data:
-            test_case_id = step['test_case_id']
-            by_type = step['by_type']
-            locator = step['locator'].replace('\\', '\\\\').replace('"', '\\"')
-            action_type = step['action_type']
-            test_name = step['test_name'].replace('\\', '\\\\').replace('"', '\\"')
-            input_data = step.get('input_data', '')
-            
-            alternative_locators = step.get('alternative_locators', [])
-            alt_locators_list = []
-            for alt_by, alt_loc in alternative_locators:
-                alt_by_name = alt_by.replace('By.', '')
-                alt_loc_escaped = alt_loc.replace('\\', '\\\\').replace('"', '\\"')
-                alt_locators_list.append(f'(By.{alt_by_name}, "{alt_loc_escaped}")')
-            
-            alt_locators_str = '[' + ', '.join(alt_locators_list) + ']' if alt_locators_list else '[]'
-            
-            if input_data:
-                input_data = input_data.replace('\\', '\\\\').replace('"', '\\"')
-                input_str = f'"{input_data}"'
-            else:
-                input_str = 'None'
-            
-            line = f'        ("{test_case_id}", By.{by_type}, "{locator}", {alt_locators_str}, "{action_type}", "{test_name}", {input_str}),'
-            lines.append(line)
+            lines.append(self._format_step_row(step))
         
         lines.append("    ]")
+        lines.append("")
         
         return '\n'.join(lines)
     
@@ -1028,7 +1523,8 @@ class BaseCtripFlight:
             print("⚠ 警告：没有收集到任何测试步骤")
             return
         
-        all_classes = []
+        self._locator_registry = self._build_locator_registry()
+        all_classes = [self._generate_step_options(), self._generate_locator_registry()]
         
         # 1. 生成共享的前置步骤类（只生成一次）
         precondition_class = self._generate_precondition_class()
@@ -1213,9 +1709,12 @@ class ElementOperator:
     def __init__(self, driver: webdriver.Chrome, config: Config):
         self.driver = driver
         self.config = config
+        self.input_engine = FastInputEngine(mode=config.INPUT_MODE)
     
     def wait_for_stable_page(self, timeout: int = 5):
         """等待页面稳定"""
+        from selenium.webdriver.support.ui import WebDriverWait
+        
         try:
             WebDriverWait(self.driver, timeout).until(
                 lambda d: d.execute_script("return document.readyState") == "complete"
@@ -1223,18 +1722,20 @@ class ElementOperator:
         except TimeoutException:
             pass
     
-    def highlight_element(self, element: WebElement, duration: float = None):
-        """高亮显示元素"""
+    def highlight_element(self, element: WebElement, duration: float = None, block: bool = True):
+        """高亮显示元素（到时由页面自己恢复原样式；block=False时不等待高亮结束，立即返回）"""
         if duration is None:
             duration = self.config.HIGHLIGHT_DURATION
         
         try:
-            original_style = element.get_attribute("style")
             self.driver.execute_script(
-                f"arguments[0].style.{self.config.HIGHLIGHT_STYLE}", element
+                f"var el = arguments[0], style = el.getAttribute('style'); el.style.{self.config.HIGHLIGHT_STYLE}; "
+                "setTimeout(function () { if (style === null) { el.removeAttribute('style'); } "
+                "else { el.setAttribute('style', style); } }, arguments[1]);",
+                element, int(duration * 1000)
             )
-            time.sleep(duration)
-            self.driver.execute_script(f"arguments[0].style='{original_style}'", element)
+            if block:
+                time.sleep(duration)
         except Exception as e:
             logging.error(f"高亮元素失败: {e}")
     
@@ -1278,6 +1779,15 @@ class ElementOperator:
             logging.error(f"鼠标悬浮失败: {e}")
             return False
     
+    def input_text(self, element: WebElement, text: str, key: str = None) -> bool:
+        """清空输入框并输入文本（自适应选择清空方式，优先用Input.insertText一次性输入）"""
+        try:
+            self.input_engine.type_text(self.driver, element, text, key=key)
+            return True
+        except Exception as e:
+            logging.error(f"输入文本失败: {e}")
+            return False
+    
     def find_elements_by_text(self, text: str, exact: bool = True) -> List[WebElement]:
         """根据文本查找元素"""
         try:
@@ -1336,6 +1846,12 @@ class WebAutomationTool:
         self.element_operator = None
         self.script_generator = None
         self.element_counter = 0
+        # 点击/输入前只读取元素快照，定位器在后台按录制顺序生成
+        self.locator_pipeline = LocatorPipeline()
+        self.request_blocker = RequestBlocker(
+            self.config.BLOCKED_URL_PATTERNS, self.config.BLOCKED_RESOURCE_TYPES,
+            enabled=self.config.BLOCK_REQUESTS
+        )
         
         self._setup_logging()
         self._check_dependencies()
@@ -1347,23 +1863,38 @@ class WebAutomationTool:
             level=logging.INFO,
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
-        # 清空元素日志文件
-        with open(self.config.ELEMENT_LOG_FILE, 'w', encoding='utf-8') as f:
-            f.write("")
+        # 录制事件日志：上一次会话的日志轮转为历史文件
+        self.event_log = EventLogger(
+            self.config.ELEMENT_LOG_FILE,
+            max_bytes=self.config.EVENT_LOG_MAX_BYTES, backups=self.config.EVENT_LOG_BACKUPS
+        )
+        self.event_log.start_session(input_mode=self.config.INPUT_MODE, daemon=self.config.USE_BROWSER_DAEMON,
+                                     block_requests=self.config.BLOCK_REQUESTS)
     
     def _check_dependencies(self):
-        """检查依赖"""
-        try:
-            import selenium
-            print(f"Selenium版本: {selenium.__version__}")
-        except ImportError:
-            print("Selenium未安装，请运行: pip install selenium")
-            sys.exit(1)
+        """检查依赖（selenium已随By在模块加载时导入，这里只读取版本号，不再重复探测）"""
+        import selenium
+        print(f"Selenium版本: {selenium.__version__}")
     
     def _init_browser(self):
         """初始化浏览器"""
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        from driver_resolver import chrome_service
+        
+        # 开启Network性能日志，录制时记录每个步骤触发的请求
+        options = enable_network_log(Options())
         try:
-            self.driver = webdriver.Chrome()
+            with self.event_log.timed('browser_start', daemon=self.config.USE_BROWSER_DAEMON):
+                # 使用本机缓存的chromedriver，启动时不再由 Selenium Manager 联网解析
+                service = chrome_service(options)
+                if self.config.USE_BROWSER_DAEMON:
+                    from browser_daemon import BrowserDaemon
+                    self.driver = BrowserDaemon(port=self.config.BROWSER_DAEMON_PORT).attach(service=service,
+                                                                                            options=options)
+                else:
+                    self.driver = webdriver.Chrome(service=service, options=options)
+            self.request_blocker.apply(self.driver)
             self.window_manager = WindowManager(self.driver)
             self.element_operator = ElementOperator(self.driver, self.config)
             print("浏览器初始化成功!")
@@ -1371,19 +1902,42 @@ class WebAutomationTool:
             print(f"ChromeDriver初始化失败: {e}")
             print("请确保Chrome浏览器和ChromeDriver已正确安装")
             sys.exit(1)
+        except RuntimeError as e:
+            print(f"连接浏览器守护进程失败: {e}")
+            sys.exit(1)
+    
+    def _quit_browser(self):
+        """关闭浏览器（守护进程中的浏览器只断开会话）"""
+        daemon = getattr(self.driver, 'browser_daemon', None)
+        try:
+            self.request_blocker.collect(self.driver)
+            self.request_blocker.detach(self.driver)
+            if daemon is not None:
+                daemon.detach(self.driver)
+            else:
+                self.driver.quit()
+        except Exception:
+            pass
     
     def open_url(self, url: str) -> bool:
         """打开URL"""
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        
         try:
-            self.driver.get(url)
-            self.driver.maximize_window()
-            WebDriverWait(self.driver, self.config.DEFAULT_TIMEOUT).until(
-                EC.presence_of_element_located((By.TAG_NAME, "body"))
-            )
+            with self.event_log.timed('open_url', url=url):
+                self.driver.get(url)
+                self.driver.maximize_window()
+                WebDriverWait(self.driver, self.config.DEFAULT_TIMEOUT).until(
+                    EC.presence_of_element_located((By.TAG_NAME, "body"))
+                )
             
             # 初始化脚本生成器
             self.script_generator = TestScriptGenerator(
-                self.config.TEST_SCRIPT_FILE, url
+                self.config.TEST_SCRIPT_FILE, url,
+                blocked_url_patterns=self.config.BLOCKED_URL_PATTERNS,
+                blocked_resource_types=self.config.BLOCKED_RESOURCE_TYPES,
+                output=self.locator_pipeline.say
             )
             
             print(f"成功打开: {url}")
@@ -1402,16 +1956,16 @@ class WebAutomationTool:
             return self._handle_custom_element()
         elif text in self.config.HOVER_KEYWORDS:
             return self._handle_hover_element()
+        elif text in self.config.DATE_KEYWORDS:
+            return self._handle_date_selection()
+        elif text in self.config.CAPTURE_KEYWORDS:
+            return self._capture_workflow()
         
         # 记录点击前的窗口
         previous_windows = set(self.driver.window_handles)
         
         # 查找元素（先精确匹配，再部分匹配）
-        elements = self.element_operator.find_elements_by_text(text, exact=True)
-        if not elements:
-            print(f"未找到精确匹配'{text}'的元素，尝试部分匹配...")
-            elements = self.element_operator.find_elements_by_text(text, exact=False)
-        
+        elements = self._search_elements(text)
         if not elements:
             print(f"未找到包含'{text}'的元素")
             return False
@@ -1424,12 +1978,32 @@ class WebAutomationTool:
         # 点击或输入
         return self._interact_with_element(element, text, previous_windows)
     
+    def _search_elements(self, text: str) -> List[WebElement]:
+        """按文本查找元素：先精确匹配，再部分匹配（记录搜索耗时和候选数量）"""
+        with self.event_log.timed('search', text=text, match='exact') as event:
+            elements = self.element_operator.find_elements_by_text(text, exact=True)
+            if not elements:
+                print(f"未找到精确匹配'{text}'的元素，尝试部分匹配...")
+                event['match'] = 'partial'
+                elements = self.element_operator.find_elements_by_text(text, exact=False)
+            event['candidates'] = len(elements)
+        return elements
+    
     def _select_element_from_list(self, elements: List[WebElement], 
                                    text: str, auto_mode: bool) -> Optional[WebElement]:
-        """从元素列表中选择一个元素"""
+        """从元素列表中选择一个元素（记录候选数量、选择结果和等待用户选择的耗时）"""
         if len(elements) == 1:
+            self.event_log.log('select', text=text, candidates=1, choice=1)
             return elements[0]
         
+        with self.event_log.timed('select', text=text, candidates=len(elements), choice=None) as event:
+            element = self._prompt_element_choice(elements, auto_mode)
+            if element is not None:
+                event['choice'] = elements.index(element) + 1
+        return element
+    
+    def _prompt_element_choice(self, elements: List[WebElement], auto_mode: bool) -> Optional[WebElement]:
+        """高亮并列出所有候选元素，等待用户选择"""
         # 多个元素，让用户选择
         print(f"找到 {len(elements)} 个匹配的元素:")
         for i, elem in enumerate(elements, 1):
@@ -1474,8 +2048,8 @@ class WebAutomationTool:
         try:
             self.element_counter += 1
             
-            # 高亮显示
-            self.element_operator.highlight_element(element, duration=2)
+            # 高亮显示（不等待高亮结束）
+            self.element_operator.highlight_element(element, duration=2, block=False)
             
             # 判断是否是输入框
             is_input = self.element_operator.is_input_element(element)
@@ -1498,40 +2072,16 @@ class WebAutomationTool:
             
             user_input = input("请输入内容: ").strip()
             
-            # 清空输入框（标准方法优先 - 速度快，适合大多数网站）
-            from selenium.webdriver.common.keys import Keys
-            
-            # 方法1: 标准clear()方法（快速高效）
-            try:
-                element.clear()
-                time.sleep(0.2)
-            except:
-                pass
-            
-            # 方法2: JavaScript清空并触发事件（处理特殊情况）
-            try:
-                self.driver.execute_script("""
-                    arguments[0].value = '';
-                    arguments[0].dispatchEvent(new Event('input', { bubbles: true }));
-                    arguments[0].dispatchEvent(new Event('change', { bubbles: true }));
-                """, element)
-                time.sleep(0.2)
-            except:
-                pass
-            
-            # 方法3: 物理按键清空（最后手段，适用于自定义控件）
-            try:
-                element.send_keys(Keys.CONTROL + 'a')
-                time.sleep(0.1)
-                element.send_keys(Keys.BACKSPACE)
-                time.sleep(0.1)
-            except:
-                pass
-            
-            element.send_keys(user_input)
+            # 清空并输入（清空方式自动探测，整段文本一次性插入）
+            since = time.time()
+            with self.event_log.timed('interaction', kind='input', text=text) as event:
+                event['success'] = self.element_operator.input_text(element, user_input)
+            if not event['success']:
+                return False
             
             # 生成测试代码
             self._save_element_to_script(element, text, "输入", user_input)
+            self._record_network_wait(since)
             
             print(f"输入完成: {user_input}")
             return True
@@ -1543,18 +2093,23 @@ class WebAutomationTool:
                                   previous_windows: Set[str]) -> bool:
         """处理点击交互"""
         try:
-            # 先生成测试代码
+            # 先读取元素快照（定位器在后台生成），再立即点击
             self._save_element_to_script(element, text, "点击", "")
             
             # 点击元素
-            if not self.element_operator.click_element_safely(element):
+            since = time.time()
+            with self.event_log.timed('interaction', kind='click', text=text) as event:
+                event['success'] = self.element_operator.click_element_safely(element)
+                if event['success']:
+                    # 等待页面稳定
+                    self.element_operator.wait_for_stable_page()
+            if not event['success']:
                 return False
-            
-            # 等待页面稳定
-            self.element_operator.wait_for_stable_page()
+            self._record_network_wait(since)
             
             # 检查并切换窗口
             if self.window_manager.switch_to_new_window(previous_windows):
+                self.event_log.log('window_switch', kind='new_window', title=self.driver.title)
                 self.window_manager.print_window_info()
             else:
                 print("页面已跳转")
@@ -1565,14 +2120,65 @@ class WebAutomationTool:
             logging.error(f"点击操作失败: {e}")
             return False
     
+    def _record_network_wait(self, since: float):
+        """列出该步骤触发的请求，选择其一作为回放时的等待目标（替代固定等待）"""
+        if not self.config.RECORD_NETWORK_WAITS:
+            return
+        
+        monitor = NetworkMonitor.for_driver(self.driver)
+        with self.event_log.timed('network_idle') as event:
+            event['available'] = monitor.wait(since=since, timeout=5) is not None
+        if not event['available']:
+            return
+        urls = monitor.finished_requests(since)[:10]
+        if not urls:
+            return
+        
+        # 等待要设置的步骤在后台生成完毕
+        self._flush_locators()
+        print(f"\n🌐 该步骤触发的请求 ({len(urls)}个):")
+        for i, url in enumerate(urls, 1):
+            print(f"   {i}. {url[:100]}{'...' if len(url) > 100 else ''}")
+        with self.event_log.timed('network_wait', requests=len(urls), pattern=None) as event:
+            choice = input("选择回放时要等待完成的请求编号（直接回车跳过）: ").strip()
+            if choice.isdigit() and 1 <= int(choice) <= len(urls):
+                event['pattern'] = url_to_pattern(urls[int(choice) - 1])
+                self.script_generator.set_last_step_wait(event['pattern'])
+    
     def _save_element_to_script(self, element: WebElement, text: str, 
                                operation: str, user_input: str = ""):
-        """保存元素到测试脚本（包含备选定位器）"""
+        """保存元素到测试脚本（包含备选定位器）：当前线程只读取一次元素快照，定位器在后台生成并按顺序写入"""
+        started = time.perf_counter()
+        snapshot = snapshot_element(self.driver, element)
+        if snapshot is None:
+            print("⚠ 读取元素失败，该步骤未写入脚本")
+            return
+        snapshot_ms = (time.perf_counter() - started) * 1000
+        self.locator_pipeline.submit(f"{operation} {text}", self._save_snapshot_to_script,
+                                     snapshot, text, operation, user_input, snapshot_ms)
+    
+    def _save_snapshot_to_script(self, snapshot: Dict, text: str, operation: str, user_input: str,
+                                 snapshot_ms: float):
+        """按元素快照生成定位器并保存到测试脚本（在后台线程中执行，不使用WebDriver）"""
+        started = time.perf_counter()
+        locators = ElementLocatorGenerator.locators_from_attributes(
+            snapshot['attributes'], text, snapshot.get('css_path') or ''
+        )
+        generate_ms = round(snapshot_ms + (time.perf_counter() - started) * 1000, 1)
+        if not self._save_locators_to_script(locators, text, operation, user_input, generate_ms,
+                                             fingerprint=snapshot.get('fingerprint')):
+            raise RuntimeError("没有可用的定位器，该步骤未写入脚本")
+    
+    def _flush_locators(self):
+        """等待后台生成的步骤全部写入，按顺序显示期间排队的输出和错误"""
+        for message in self.locator_pipeline.drain():
+            print(message)
+    
+    def _save_locators_to_script(self, locators: List[Tuple[str, str]], text: str,
+                                 operation: str, user_input: str = "", generate_ms: float = None,
+                                 fingerprint: Dict = None) -> bool:
+        """从候选定位器中选出主定位器和备选定位器并保存到测试脚本，返回是否写入了步骤"""
         try:
-            # 生成定位器（使用配置中的简洁模式设置）
-            locators = ElementLocatorGenerator.generate_locators(
-                element, text, use_simple_css=self.config.USE_SIMPLE_CSS_PATH
-            )
             best_locator = ElementLocatorGenerator.select_best_locator(locators)
             
             if best_locator:
@@ -1610,18 +2216,19 @@ class WebAutomationTool:
                     if len(alternative_locators) >= 3:
                         break
                 
-                # 打印使用的定位器（让用户看到生成的定位器）
-                print(f"\n📍 主定位器:")
-                print(f"   类型: {best_locator[0]}")
-                print(f"   选择器: {best_locator[1][:100]}{'...' if len(best_locator[1]) > 100 else ''}")
+                # 显示使用的定位器（让用户看到生成的定位器；在后台线程中生成时由主线程在下一个输入提示前显示）
+                say = self.locator_pipeline.say
+                say(f"\n📍 主定位器:")
+                say(f"   类型: {best_locator[0]}")
+                say(f"   选择器: {best_locator[1][:100]}{'...' if len(best_locator[1]) > 100 else ''}")
                 
                 if alternative_locators:
-                    print(f"📍 备选定位器 ({len(alternative_locators)}个):")
+                    say(f"📍 备选定位器 ({len(alternative_locators)}个):")
                     for i, (alt_type, alt_sel) in enumerate(alternative_locators, 1):
                         display_sel = alt_sel[:80] + '...' if len(alt_sel) > 80 else alt_sel
-                        print(f"   {i}. {alt_type}: {display_sel}")
+                        say(f"   {i}. {alt_type}: {display_sel}")
                 else:
-                    print(f"⚠ 无合适的备选定位器（将仅使用主定位器）")
+                    say(f"⚠ 无合适的备选定位器（将仅使用主定位器）")
                 
                 element_data = {
                     'search_text': text,
@@ -1629,11 +2236,22 @@ class WebAutomationTool:
                     'selector': best_locator[1],
                     'alternative_locators': alternative_locators,
                     'operation_type': operation,
-                    'user_input': user_input
+                    'user_input': user_input,
+                    'fingerprint': fingerprint
                 }
                 self.script_generator.add_test_method(element_data)
+            
+            self.event_log.log(
+                'locators', text=text, operation=operation, candidates=len(locators),
+                primary=list(best_locator) if best_locator else None,
+                alternatives=[list(loc) for loc in alternative_locators] if best_locator else [],
+                duration_ms=generate_ms
+            )
+            return best_locator is not None
         except Exception as e:
-            logging.error(f"保存测试脚本失败: {e}")
+            logging.debug(f"保存测试脚本失败: {e}")
+            self.locator_pipeline.say(f"⚠ 保存测试脚本失败: {e}")
+            return False
     
     def _handle_input_field(self) -> bool:
         """处理输入框特殊命令"""
@@ -1680,14 +2298,16 @@ class WebAutomationTool:
             previous_windows = set(self.driver.window_handles)
             
             # 执行点击操作
-            element = self.driver.find_element(By.CSS_SELECTOR, css_selector)
-            self.element_operator.click_element_safely(element)
-            
-            # 等待页面稳定
-            self.element_operator.wait_for_stable_page()
+            with self.event_log.timed('interaction', kind='custom_click', text=element_name) as event:
+                element = self.driver.find_element(By.CSS_SELECTOR, css_selector)
+                event['success'] = self.element_operator.click_element_safely(element)
+                
+                # 等待页面稳定
+                self.element_operator.wait_for_stable_page()
             
             # 检查并切换到新窗口
             if self.window_manager.switch_to_new_window(previous_windows):
+                self.event_log.log('window_switch', kind='new_window', title=self.driver.title)
                 print(f"检测到新窗口，已自动切换")
                 self.window_manager.print_window_info()
             else:
@@ -1701,6 +2321,44 @@ class WebAutomationTool:
             print(f"错误: {e}")
             return False
     
+    def _handle_date_selection(self) -> bool:
+        """处理日期选择命令：按真实日期选择，而不是录制日历单元格的路径"""
+        try:
+            css_selector = input(f"请输入日期输入框或日历容器的CSS选择器 (直接回车使用 {self.config.DATE_INPUT_SELECTOR}): ").strip()
+            css_selector = css_selector or self.config.DATE_INPUT_SELECTOR
+            date_value = input("请输入日期 (YYYY-MM-DD，或+N表示N天后): ").strip()
+            
+            try:
+                resolve_date(date_value)
+            except ValueError as e:
+                print(f"⚠ {e}")
+                return False
+            
+            try:
+                element = self.driver.find_element(By.CSS_SELECTOR, css_selector)
+            except Exception as e:
+                print(f"未找到元素: {e}")
+                return False
+            
+            with self.event_log.timed('interaction', kind='select_date', text=date_value) as event:
+                selected = select_date(self.driver, element, date_value)
+                event['date'] = selected.isoformat()
+            print(f"✓ 已选择日期: {selected.isoformat()}")
+            
+            element_data = {
+                'search_text': '日期',
+                'selector_type': 'By.CSS_SELECTOR',
+                'selector': css_selector,
+                'operation_type': '选择日期',
+                'user_input': date_value,
+                'fingerprint': fingerprint_element(self.driver, element)
+            }
+            self.script_generator.add_test_method(element_data)
+            return True
+        except Exception as e:
+            logging.error(f"选择日期失败: {e}")
+            return False
+    
     def _handle_hover_element(self) -> bool:
         """处理鼠标悬浮命令"""
         try:
@@ -1738,13 +2396,13 @@ class WebAutomationTool:
                     'selector_type': 'By.CSS_SELECTOR',
                     'selector': css_selector,
                     'operation_type': '悬浮',
-                    'user_input': ''
+                    'user_input': '',
+                    'fingerprint': fingerprint_element(self.driver, element)
                 }
                 self.script_generator.add_test_method(element_data)
                 
                 # 执行悬浮
-                if self.element_operator.hover_element_safely(element):
-                    self.element_operator.wait_for_stable_page()
+                if self._hover_and_wait(element, element_name):
                     print(f"已悬浮到元素: {element_name}")
                     return True
                 else:
@@ -1759,11 +2417,7 @@ class WebAutomationTool:
                     return False
                 
                 # 查找元素（先精确匹配，再部分匹配）
-                elements = self.element_operator.find_elements_by_text(element_text, exact=True)
-                if not elements:
-                    print(f"未找到精确匹配'{element_text}'的元素，尝试部分匹配...")
-                    elements = self.element_operator.find_elements_by_text(element_text, exact=False)
-                
+                elements = self._search_elements(element_text)
                 if not elements:
                     print(f"未找到包含'{element_text}'的元素")
                     return False
@@ -1792,14 +2446,13 @@ class WebAutomationTool:
                         'selector_type': best_locator[0],
                         'selector': best_locator[1],
                         'operation_type': '悬浮',
-                        'user_input': ''
+                        'user_input': '',
+                        'fingerprint': fingerprint_element(self.driver, element)
                     }
                     self.script_generator.add_test_method(element_data)
                 
-                # 执行鼠标悬浮操作
-                if self.element_operator.hover_element_safely(element):
-                    # 等待页面稳定
-                    self.element_operator.wait_for_stable_page()
+                # 执行鼠标悬浮操作（并等待页面稳定）
+                if self._hover_and_wait(element, element_text):
                     print(f"已悬浮到元素: {element_text}")
                     return True
                 else:
@@ -1814,6 +2467,82 @@ class WebAutomationTool:
             print(f"错误: {e}")
             return False
     
+    def _capture_workflow(self) -> bool:
+        """捕获模式：直接在浏览器中操作，页面内的监听脚本生成定位器，操作实时写入测试脚本"""
+        from click_capture import ClickCapture
+        
+        try:
+            capture = ClickCapture(self.driver)
+        except Exception as e:
+            logging.error(f"启动捕获模式失败: {e}")
+            return False
+        
+        print("\n" + "=" * 80)
+        print("🎯 捕获模式：直接在浏览器中操作，每个操作会自动记录为测试步骤")
+        print("   - 点击：直接点击元素")
+        print("   - 输入：在输入框中输入后移开焦点（按Tab或点击别处）")
+        print("   - 悬浮：鼠标停在元素上时按 Alt 键")
+        print("   - 在此终端按 Ctrl+C 退出捕获模式")
+        print("=" * 80)
+        
+        known_windows = set(self.driver.window_handles)
+        captured = 0
+        try:
+            while True:
+                event = capture.next_event(timeout=0.5)
+                if event is None:
+                    continue
+                try:
+                    self._save_captured_event(event, known_windows)
+                    captured += 1
+                except Exception as e:
+                    logging.error(f"记录捕获的操作失败: {e}")
+        except KeyboardInterrupt:
+            print(f"\n已退出捕获模式，共记录 {captured} 个操作")
+        finally:
+            capture.stop()
+        self.event_log.log('capture', steps=captured)
+        return captured > 0
+    
+    def _save_captured_event(self, event: Dict, known_windows: Set[str]):
+        """把一个捕获的操作写入测试脚本"""
+        target_id = event.get('target_id')
+        if target_id and target_id != self.window_manager.current_window and target_id in self.driver.window_handles:
+            self.driver.switch_to.window(target_id)
+            self.window_manager.current_window = target_id
+            if target_id in known_windows:
+                # 操作人员切回了已有窗口：记录窗口切换步骤
+                window_index = self.driver.window_handles.index(target_id) + 1
+                self.script_generator.add_window_switch_method(window_index, self.driver.title)
+                self.event_log.log('window_switch', kind='capture', index=window_index, title=self.driver.title)
+            else:
+                # 上一步点击打开的新窗口：生成的脚本点击后会自动切换，不需要单独的步骤
+                known_windows.add(target_id)
+                self.event_log.log('window_switch', kind='new_window', title=self.driver.title)
+            self.window_manager.print_window_info()
+        
+        attributes = event['attributes']
+        text = attributes.get('text') or ''
+        if len(text) > 50 or '\n' in text:
+            # 多行或过长的文本（容器元素）不适合作为文本定位器
+            attributes['text'] = text = ''
+        operation = {'click': '点击', 'input': '输入', 'hover': '悬浮'}[event['type']]
+        label = text or attributes.get('placeholder') or attributes.get('name') or attributes.get('tag_name', '')
+        
+        self.element_counter += 1
+        print(f"\n🎯 捕获{operation}: {label}" + (f" = {event['value']}" if event.get('value') else ""))
+        locators = ElementLocatorGenerator.locators_from_attributes(attributes, text, event.get('css_path', ''))
+        self._save_locators_to_script(locators, label, operation, event.get('value', ''),
+                                      generate_ms=event.get('duration_ms'), fingerprint=event.get('fingerprint'))
+    
+    def _hover_and_wait(self, element: WebElement, text: str) -> bool:
+        """鼠标悬浮并等待页面稳定"""
+        with self.event_log.timed('interaction', kind='hover', text=text) as event:
+            event['success'] = self.element_operator.hover_element_safely(element)
+            if event['success']:
+                self.element_operator.wait_for_stable_page()
+        return event['success']
+    
     def automated_workflow(self, texts: List[str]):
         """自动化工作流"""
         print("=" * 50)
@@ -1824,13 +2553,15 @@ class WebAutomationTool:
         for i, text in enumerate(texts, 1):
             if not text.strip():
                 continue
+            self._flush_locators()
             
             # 支持重试机制
             retry_count = 1
             while True:
                 print(f"\n[{i}/{len(texts)}] 正在处理: '{text}'" + (f" (第{retry_count}次尝试)" if retry_count > 1 else ""))
                 
-                success = self.find_and_click_element(text, auto_mode=True)
+                with self.event_log.timed('step', mode='auto', text=text, attempt=retry_count) as event:
+                    success = event['success'] = self.find_and_click_element(text, auto_mode=True)
                 
                 if success:
                     break  # 成功则跳出重试循环
@@ -1855,6 +2586,7 @@ class WebAutomationTool:
             
             time.sleep(1)
         
+        self._flush_locators()
         print("\n自动化流程完成")
     
     def interactive_workflow(self):
@@ -1868,6 +2600,8 @@ class WebAutomationTool:
         print("- 输入'悬浮'执行鼠标悬浮操作")
         print("- 输入'添加'手动添加CSS选择器（只点击）")
         print("- 输入'窗口'切换浏览器窗口")
+        print("- 输入'选择日期'按日期（如2026-10-26或+7）选择日历中的日期")
+        print("- 输入'捕获'进入捕获模式，直接在浏览器中点击/输入/悬浮录制步骤")
         print("- 输入'b'完成前置步骤，开始添加具体业务步骤")
         print("- 输入'a'添加新测试用例（完成当前测试用例，开始新的测试用例）")
         print("- 输入'l'显示所有已添加的操作")
@@ -1886,6 +2620,8 @@ class WebAutomationTool:
         
         while True:
             try:
+                # 上一个操作的步骤在后台生成完毕后再显示提示
+                self._flush_locators()
                 # 显示窗口和当前状态信息
                 self.window_manager.print_window_info()
                 if self.script_generator:
@@ -1928,6 +2664,7 @@ class WebAutomationTool:
                             print("需求编号不能为空")
                             continue
                         if self.script_generator.set_current_requirement(req_input):
+                            self.event_log.log('requirement', requirement_id=req_input, precondition_steps=precond_count)
                             print(f"\n✓ 现在可以开始添加需求 {req_input} 的具体业务步骤")
                             break
                     continue
@@ -1947,10 +2684,7 @@ class WebAutomationTool:
                     
                     # 关闭当前浏览器
                     print("\n🔴 关闭当前浏览器...")
-                    try:
-                        self.driver.quit()
-                    except:
-                        pass
+                    self._quit_browser()
                     
                     # 重新打开新浏览器
                     print("🚀 启动新浏览器...")
@@ -1981,6 +2715,7 @@ class WebAutomationTool:
                             print("需求编号不能为空")
                             continue
                         if self.script_generator.set_current_requirement(req_input):
+                            self.event_log.log('requirement', requirement_id=req_input)
                             new_req_id = req_input
                             print(f"\n✓ 开始收集测试用例 {req_input} 的操作步骤")
                             break
@@ -2023,11 +2758,15 @@ class WebAutomationTool:
                                     if step['action_type'] == 'click':
                                         self.element_operator.click_element_safely(element)
                                     elif step['action_type'] == 'input':
-                                        element.clear()
-                                        time.sleep(0.2)
-                                        element.send_keys(step['input_data'])
+                                        element.click()
+                                        self.element_operator.input_text(
+                                            element, step['input_data'],
+                                            key=FastInputEngine.locator_key(by_type, step['locator'])
+                                        )
                                     elif step['action_type'] == 'hover':
                                         self.element_operator.hover_element_safely(element)
+                                    elif step['action_type'] == 'select_date':
+                                        select_date(self.driver, element, step['input_data'])
                                     
                                     # 等待操作完成
                                     time.sleep(1)
@@ -2084,15 +2823,18 @@ class WebAutomationTool:
                     
                     # 记录窗口切换操作到测试脚本
                     if success and window_index > 0 and self.script_generator:
+                        self.event_log.log('window_switch', kind='manual', index=window_index, title=window_title)
                         self.script_generator.add_window_switch_method(window_index, window_title)
                     continue
                 
                 if user_input.lower() in ['back', '返回']:
-                    self.window_manager.switch_to_original()
+                    if self.window_manager.switch_to_original():
+                        self.event_log.log('window_switch', kind='original')
                     continue
                 
                 if user_input.lower() in ['close', '关闭']:
-                    self.window_manager.close_current_window()
+                    if self.window_manager.close_current_window():
+                        self.event_log.log('window_switch', kind='close')
                     continue
                 
                 if not user_input:
@@ -2110,7 +2852,8 @@ class WebAutomationTool:
                         user_input = texts[0]
                 
                 # 单步模式
-                self.find_and_click_element(user_input)
+                with self.event_log.timed('step', mode='single', text=user_input) as event:
+                    event['success'] = self.find_and_click_element(user_input)
                 
             except KeyboardInterrupt:
                 print("\n程序被用户中断")
@@ -2121,11 +2864,31 @@ class WebAutomationTool:
     
     def close(self):
         """关闭浏览器并完成脚本"""
+        self._flush_locators()
         if self.driver:
             if self.script_generator:
                 self.script_generator.complete_script()
-            self.driver.quit()
+                self._generate_test_case_document()
+            self._quit_browser()
+            self.request_blocker.print_summary()
             print("浏览器已关闭")
+        steps = len(self.script_generator.test_steps_data) if self.script_generator else 0
+        self.event_log.log('session_end', steps=steps, elements=self.element_counter)
+        self.event_log.close()
+    
+    def _generate_test_case_document(self):
+        """根据已收集的步骤数据生成测试用例文档"""
+        if not self.config.TEST_CASE_XLSX_FILE or not self.script_generator.requirements:
+            return
+        try:
+            import importlib
+            document_module = importlib.import_module('测试用例文档')
+            xlsx_file = document_module.generate_ctrip_flight_xlsx(
+                self.script_generator, file_name=self.config.TEST_CASE_XLSX_FILE
+            )
+            print(f"✓ 测试用例文档生成完成: {xlsx_file}")
+        except Exception as e:
+            logging.error(f"生成测试用例文档失败: {e}")
 
 
 # ============ 主程序 ============
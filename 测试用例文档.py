@@ -1,93 +1,377 @@
-import pandas as pd
-from openpyxl import Workbook
-from openpyxl.styles import Alignment
-
-
-def generate_ctrip_flight_xlsx():
-    # 创建测试用例数据
-    test_cases = [
-        {
-            "测试用例编号": "TC001",
-            "模块名称": "单程机票查询",
-            "需求编号": "R001",
-            "用例说明": "验证从北京到广州的单程机票查询，带儿童，经济舱",
-            "前置条件": "使用Chrome浏览器（Win11系统），已清除缓存，携程网首页可访问",
-            "执行步骤": "1. 打开浏览器，访问 https://www.ctrip.com\n2. 悬停鼠标到左侧导航栏的'机票'菜单\n3. 点击出现的'国内/国际/中国港澳台'选项\n4. 在机票查询页面，点击'单程'按钮（确保选中）\n5. 在'出发地'输入框中输入'北京'\n6. 在'目的地'输入框中输入'广州'\n7. 点击'出发日期'输入框，选择日期2025-09-11\n8. 从'舱等'下拉框中选择'经济舱'\n9. 勾选'带儿童'复选框\n10. 点击'搜索'按钮",
-            "输入数据": "出发地:北京\n目的地:广州\n出发日期:2025-09-11\n舱型:经济舱\n乘客类型:带儿童",
-            "预期结果": "系统跳转到查询结果页面，显示从北京到广州的航班列表，且查询条件正确（带儿童、经济舱）",
-            "实际结果": "",
-            "截图文件名": ""
-        },
-        {
-            "测试用例编号": "TC002",
-            "模块名称": "单程机票查询",
-            "需求编号": "R001",
-            "用例说明": "验证从北京到成都的单程机票查询，带儿童，经济舱",
-            "前置条件": "使用Chrome浏览器（Win11系统），已清除缓存，携程网首页可访问",
-            "执行步骤": "1. 打开浏览器，访问 https://www.ctrip.com\n2. 悬停鼠标到左侧导航栏的'机票'菜单\n3. 点击出现的'国内/国际/中国港澳台'选项\n4. 在机票查询页面，点击'单程'按钮（确保选中）\n5. 在'出发地'输入框中输入'北京'\n6. 在'目的地'输入框中输入'成都'\n7. 点击'出发日期'输入框，选择日期2025-09-11\n8. 从'舱等'下拉框中选择'经济舱'\n9. 勾选'带儿童'复选框\n10. 点击'搜索'按钮",
-            "输入数据": "出发地:北京\n目的地:成都\n出发日期:2025-09-11\n舱型:经济舱\n乘客类型:带儿童",
-            "预期结果": "系统跳转到查询结果页面，显示从北京到成都的航班列表，且查询条件正确（带儿童、经济舱）",
-            "实际结果": "",
-            "截图文件名": ""
-        },
-        {
-            "测试用例编号": "TC003",
-            "模块名称": "单程机票查询",
-            "需求编号": "R001",
-            "用例说明": "验证从上海到广州的单程机票查询，带儿童，经济舱",
-            "前置条件": "使用Chrome浏览器（Win11系统），已清除缓存，携程网首页可访问",
-            "执行步骤": "1. 打开浏览器，访问 https://www.ctrip.com\n2. 悬停鼠标到左侧导航栏的'机票'菜单\n3. 点击出现的'国内/国际/中国港澳台'选项\n4. 在机票查询页面，点击'单程'按钮（确保选中）\n5. 在'出发地'输入框中输入'上海'\n6. 在'目的地'输入框中输入'广州'\n7. 点击'出发日期'输入框，选择日期2025-09-11\n8. 从'舱等'下拉框中选择'经济舱'\n9. 勾选'带儿童'复选框\n10. 点击'搜索'按钮",
-            "输入数据": "出发地:上海\n目的地:广州\n出发日期:2025-09-11\n舱型:经济舱\n乘客类型:带儿童",
-            "预期结果": "系统跳转到查询结果页面，显示从上海到广州的航班列表，且查询条件正确（带儿童、经济舱）",
-            "实际结果": "",
-            "截图文件名": ""
-        },
-        {
-            "测试用例编号": "TC004",
-            "模块名称": "单程机票查询",
-            "需求编号": "R001",
-            "用例说明": "验证从上海到成都的单程机票查询，带儿童，经济舱",
-            "前置条件": "使用Chrome浏览器（Win11系统），已清除缓存，携程网首页可访问",
-            "执行步骤": "1. 打开浏览器，访问 https://www.ctrip.com\n2. 悬停鼠标到左侧导航栏的'机票'菜单\n3. 点击出现的'国内/国际/中国港澳台'选项\n4. 在机票查询页面，点击'单程'按钮（确保选中）\n5. 在'出发地'输入框中输入'上海'\n6. 在'目的地'输入框中输入'成都'\n7. 点击'出发日期'输入框，选择日期2025-09-11\n8. 从'舱等'下拉框中选择'经济舱'\n9. 勾选'带儿童'复选框\n10. 点击'搜索'按钮",
-            "输入数据": "出发地:上海\n目的地:成都\n出发日期:2025-09-11\n舱型:经济舱\n乘客类型:带儿童",
-            "预期结果": "系统跳转到查询结果页面，显示从上海到成都的航班列表，且查询条件正确（带儿童、经济舱）",
-            "实际结果": "",
-            "截图文件名": ""
-        }
-    ]
-
-    # 创建DataFrame
-    df = pd.DataFrame(test_cases)
-
-    # 创建Excel文件
-    file_name = "携程机票查询测试用例_R001.xlsx"
-    with pd.ExcelWriter(file_name, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='测试用例', index=False)
-
-        # 设置单元格格式（自动换行）
-        workbook = writer.book
-        worksheet = writer.sheets['测试用例']
-
-        # 设置列宽
-        worksheet.column_dimensions['A'].width = 15
-        worksheet.column_dimensions['B'].width = 15
-        worksheet.column_dimensions['C'].width = 10
-        worksheet.column_dimensions['D'].width = 40
-        worksheet.column_dimensions['E'].width = 40
-        worksheet.column_dimensions['F'].width = 60
-        worksheet.column_dimensions['G'].width = 30
-        worksheet.column_dimensions['H'].width = 40
-        worksheet.column_dimensions['I'].width = 40
-        worksheet.column_dimensions['J'].width = 20
-
-        # 设置自动换行
-        for row in worksheet.iter_rows(min_row=2, max_row=len(df) + 1, min_col=1, max_col=10):
-            for cell in row:
-                cell.alignment = Alignment(wrap_text=True, vertical='top')
+"""
+测试用例文档生成工具
+
+直接根据 TestScriptGenerator 收集的步骤数据（或已生成的测试脚本中的步骤表）
+生成"测试用例"工作簿，每个需求对应一行测试用例。
+
+- 使用 openpyxl 的 write-only 流式模式逐行写入，内存占用与行数无关
+- 不依赖 pandas
+
+用法:
+  python 测试用例文档.py                         # 从 TestCtripFlight.py 生成工作簿
+  python 测试用例文档.py --script TestCtripFlight.py -o 测试用例.xlsx
+  python 测试用例文档.py --benchmark 50000       # 流式写入性能测试（写入临时文件，测完删除）
+
+  # 运行测试后回填实际结果、截图文件名和执行耗时
+  pytest TestCtripFlight.py --junitxml=report.xml
+  python 测试用例文档.py --write-back report.xml
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+
+SHEET_NAME = '测试用例'
+DEFAULT_XLSX_FILE = '携程机票查询测试用例_R001.xlsx'
+MODULE_NAME = '单程机票查询'
+PRECONDITION_TEXT = '使用Chrome浏览器（Win11系统），已清除缓存，携程网首页可访问'
+
+# 列名与列宽（A-K）
+COLUMNS = [
+    ('测试用例编号', 15),
+    ('模块名称', 15),
+    ('需求编号', 10),
+    ('用例说明', 40),
+    ('前置条件', 40),
+    ('执行步骤', 60),
+    ('输入数据', 30),
+    ('预期结果', 40),
+    ('实际结果', 40),
+    ('截图文件名', 20),
+    ('执行耗时(秒)', 12),
+]
+
+# 截图文件名格式：{时间戳}_{测试用例编号}.png（见生成脚本中的 take_screenshot）
+SCREENSHOT_PATTERN = re.compile(r'^\d+_(?P<test_case_id>.+)\.png$')
+# 业务步骤测试用例编号中的需求编号：CtripFlight_R001_001
+REQUIREMENT_IN_CASE_ID = re.compile(r'_(R\d{3})_\d+$')
+
+
+def describe_step(step: Dict) -> str:
+    """把一个步骤转换为测试用例文档中的自然语言描述"""
+    name = step['test_name']
+    action_type = step['action_type']
+    input_data = step.get('input_data') or ''
+
+    if action_type == 'hover':
+        return f"悬停鼠标到'{name}'"
+    if action_type == 'input':
+        return f"在'{name}'中输入'{input_data}'"
+    if action_type == 'select_date':
+        return f"在'{name}'中选择日期'{input_data}'"
+    if action_type == 'window_switch':
+        return name
+    return f"点击'{name}'"
+
+
+def build_test_case_rows(precondition_steps: List[Dict], requirements: Dict[str, List[Dict]],
+                         initial_url: str, start_index: int = 1) -> Iterator[List[str]]:
+    """按需求逐行生成测试用例（生成器，不在内存中保留整张表）"""
+    for index, req_id in enumerate(sorted(requirements), start_index):
+        steps = list(precondition_steps) + list(requirements[req_id])
+        inputs = [step['input_data'] for step in steps if step['action_type'] == 'input' and step.get('input_data')]
+
+        step_lines = [f"1. 打开浏览器，访问 {initial_url}"]
+        step_lines.extend(f"{i}. {describe_step(step)}" for i, step in enumerate(steps, 2))
+
+        input_lines = [
+            f"{step['test_name']}:{step['input_data']}"
+            for step in steps if step['action_type'] in ('input', 'select_date') and step.get('input_data')
+        ]
+
+        summary = f"（{' → '.join(inputs)}）" if inputs else ""
+        last_step = steps[-1]['test_name'] if steps else ""
+        yield [
+            f"TC{index:03d}",
+            MODULE_NAME,
+            req_id,
+            f"验证需求{req_id}的{MODULE_NAME}流程{summary}",
+            PRECONDITION_TEXT,
+            '\n'.join(step_lines),
+            '\n'.join(input_lines),
+            f"所有步骤执行成功，点击'{last_step}'后系统显示对应的查询结果" if last_step else "",
+            "",
+            "",
+            "",
+        ]
 
+
+def write_test_case_workbook(rows: Iterable[List[str]], file_name: str) -> int:
+    """以 write-only 流式模式写出工作簿，返回写入的测试用例行数"""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Font
+    from openpyxl.utils import get_column_letter
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(SHEET_NAME)
+
+    # 列宽必须在写入任何行之前设置
+    for col_index, (_, width) in enumerate(COLUMNS, 1):
+        worksheet.column_dimensions[get_column_letter(col_index)].width = width
+
+    header_font = Font(bold=True)
+    header = []
+    for title, _ in COLUMNS:
+        cell = WriteOnlyCell(worksheet, value=title)
+        cell.font = header_font
+        header.append(cell)
+    worksheet.append(header)
+
+    # 所有数据单元格共享同一个样式对象（自动换行 + 顶端对齐）
+    alignment = Alignment(wrap_text=True, vertical='top')
+    row_count = 0
+    for row in rows:
+        cells = []
+        for value in row:
+            cell = WriteOnlyCell(worksheet, value=value)
+            cell.alignment = alignment
+            cells.append(cell)
+        worksheet.append(cells)
+        row_count += 1
+
+    workbook.save(file_name)
+    return row_count
+
+
+def _steps_from_generator(script_generator) -> Tuple[List[Dict], Dict[str, List[Dict]], str]:
+    """从 TestScriptGenerator 读取步骤数据"""
+    requirements = {
+        req_id: [script_generator.test_steps_data[i] for i in step_indices]
+        for req_id, step_indices in script_generator.requirements.items()
+        if step_indices
+    }
+    return script_generator.precondition_steps_data, requirements, script_generator.initial_url
+
+
+def _steps_from_script(script_file: str) -> Tuple[List[Dict], Dict[str, List[Dict]], str]:
+    """从已生成的测试脚本读取步骤数据"""
+    from step_tables import load_step_tables, load_test_module
+
+    module = load_test_module(script_file)
+    precondition_steps, requirements = load_step_tables(module)
+    return precondition_steps, requirements, getattr(module, 'INITIAL_URL', 'https://www.ctrip.com')
+
+
+def generate_ctrip_flight_xlsx(script_generator=None, file_name: str = DEFAULT_XLSX_FILE,
+                               script_file: str = 'TestCtripFlight.py') -> str:
+    """
+    生成测试用例工作簿
+
+    Args:
+        script_generator: TestScriptGenerator 实例；为None时从 script_file 读取步骤表
+        file_name: 输出的xlsx文件名
+        script_file: 已生成的测试脚本路径
+    """
+    if script_generator is not None:
+        precondition_steps, requirements, initial_url = _steps_from_generator(script_generator)
+    else:
+        precondition_steps, requirements, initial_url = _steps_from_script(script_file)
+
+    rows = build_test_case_rows(precondition_steps, requirements, initial_url)
+    write_test_case_workbook(rows, file_name)
     return file_name
 
 
-# 生成XLSX文件
-xlsx_file = generate_ctrip_flight_xlsx()
-print(f"已生成文件: {xlsx_file}")
\ No newline at end of file
+def read_junit_results(junit_file: str) -> Dict[str, Dict]:
+    """
+    读取pytest生成的JUnit XML结果
+
+    Returns:
+        {测试用例编号: {'status': passed/failed/skipped, 'message': str, 'duration': float}}
+    """
+    import xml.etree.ElementTree as ET
+
+    results = {}
+    for testcase in ET.parse(junit_file).getroot().iter('testcase'):
+        name = testcase.get('name', '')
+        # 参数化用例名：test_CtripFlight_R001[CtripFlight_R001_001]
+        test_case_id = name[name.find('[') + 1:-1] if name.endswith(']') else name
+
+        status, message = 'passed', ''
+        for tag in ('failure', 'error', 'skipped'):
+            node = testcase.find(tag)
+            if node is not None:
+                status = 'skipped' if tag == 'skipped' else 'failed'
+                message = (node.get('message') or node.text or '').strip()
+                break
+
+        results[test_case_id] = {
+            'status': status,
+            'message': message,
+            'duration': float(testcase.get('time') or 0),
+        }
+    return results
+
+
+def find_latest_screenshots(screenshots_dir: str) -> Dict[str, str]:
+    """按测试用例编号找到最新的截图文件名"""
+    latest = {}
+    if not os.path.isdir(screenshots_dir):
+        return {}
+    for entry in os.scandir(screenshots_dir):
+        match = SCREENSHOT_PATTERN.match(entry.name)
+        if not match:
+            continue
+        test_case_id = match.group('test_case_id')
+        mtime = entry.stat().st_mtime
+        if test_case_id not in latest or mtime > latest[test_case_id][0]:
+            latest[test_case_id] = (mtime, entry.name)
+    return {test_case_id: name for test_case_id, (_, name) in latest.items()}
+
+
+def _summarize_requirement(step_results: List[Tuple[str, Dict]]) -> Tuple[str, float]:
+    """汇总一个需求所有步骤的执行结果，返回(实际结果文本, 总耗时)"""
+    total = len(step_results)
+    passed = sum(1 for _, result in step_results if result['status'] == 'passed')
+    duration = round(sum(result['duration'] for _, result in step_results), 2)
+
+    if passed == total:
+        return f"通过（{passed}/{total}个步骤通过）", duration
+
+    lines = [f"失败（{passed}/{total}个步骤通过）"]
+    for test_case_id, result in step_results:
+        if result['status'] != 'passed':
+            message = result['message'].splitlines()[0] if result['message'] else ''
+            status_text = '跳过' if result['status'] == 'skipped' else '失败'
+            lines.append(f"{test_case_id} {status_text}: {message[:200]}")
+    return '\n'.join(lines), duration
+
+
+def write_back_results(xlsx_file: str, junit_file: str, screenshots_dir: str = 'screenshots') -> int:
+    """
+    把一次运行的结果批量回填到测试用例工作簿
+
+    只更新"实际结果"、"截图文件名"、"执行耗时(秒)"三列，其余单元格保持原样。
+    返回更新的测试用例行数。
+
+    xlsx是zip压缩包，openpyxl不能只改写其中一列：回填仍要完整读入并重新保存整个工作簿，
+    耗时随行数增长；没有可回填的结果时不写文件。
+    """
+    from openpyxl import load_workbook
+    from openpyxl.styles import Alignment
+    from openpyxl.utils import get_column_letter
+
+    results = read_junit_results(junit_file)
+    screenshots = find_latest_screenshots(screenshots_dir)
+
+    # 按需求编号分组步骤结果（保持步骤顺序）
+    results_by_requirement: Dict[str, List[Tuple[str, Dict]]] = {}
+    for test_case_id in sorted(results):
+        match = REQUIREMENT_IN_CASE_ID.search(test_case_id)
+        if match:
+            results_by_requirement.setdefault(match.group(1), []).append((test_case_id, results[test_case_id]))
+
+    if not results_by_requirement:
+        return 0
+
+    workbook = load_workbook(xlsx_file)
+    worksheet = workbook[SHEET_NAME]
+
+    header = {cell.value: cell.column for cell in worksheet[1] if cell.value}
+    # 兼容没有"执行耗时"列的旧工作簿
+    for title, width in COLUMNS:
+        if title not in header:
+            column = worksheet.max_column + 1
+            worksheet.cell(row=1, column=column, value=title)
+            worksheet.column_dimensions[get_column_letter(column)].width = width
+            header[title] = column
+
+    alignment = Alignment(wrap_text=True, vertical='top')
+    updated = 0
+    for row in worksheet.iter_rows(min_row=2):
+        req_id = row[header['需求编号'] - 1].value
+        step_results = results_by_requirement.get(req_id)
+        if not step_results:
+            continue
+
+        actual_result, duration = _summarize_requirement(step_results)
+        screenshot_names = [screenshots[tc_id] for tc_id, _ in step_results if tc_id in screenshots]
+
+        row_index = row[0].row
+        for title, value in (('实际结果', actual_result),
+                             ('截图文件名', '\n'.join(screenshot_names)),
+                             ('执行耗时(秒)', duration)):
+            cell = worksheet.cell(row=row_index, column=header[title], value=value)
+            cell.alignment = alignment
+        updated += 1
+
+    if updated:
+        workbook.save(xlsx_file)
+    return updated
+
+
+def run_benchmark(row_count: int, script_file: str = 'TestCtripFlight.py') -> Dict:
+    """用真实步骤表循环生成大量测试用例行，测量流式写入的耗时和内存峰值
+
+    工作簿写入系统临时目录，测完即删除，不会覆盖真实的测试用例文档。
+    """
+    import tracemalloc
+
+    precondition_steps, requirements, initial_url = _steps_from_script(script_file)
+    req_ids = sorted(requirements)
+
+    def synthetic_rows():
+        for index in range(row_count):
+            req_id = req_ids[index % len(req_ids)]
+            yield from build_test_case_rows(precondition_steps, {req_id: requirements[req_id]},
+                                            initial_url, start_index=index + 1)
+
+    fd, file_name = tempfile.mkstemp(prefix='benchmark_', suffix='.xlsx')
+    os.close(fd)
+    try:
+        # 第一遍只计时；tracemalloc会显著拖慢写入，内存峰值单独测量
+        start = time.perf_counter()
+        written = write_test_case_workbook(synthetic_rows(), file_name)
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        write_test_case_workbook(synthetic_rows(), file_name)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        os.remove(file_name)
+
+    return {
+        'rows': written,
+        'seconds': round(elapsed, 2),
+        'rows_per_second': round(written / elapsed) if elapsed else 0,
+        'peak_memory_mb': round(peak / 1024 / 1024, 2),
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="测试用例文档生成工具")
+    parser.add_argument('--script', default='TestCtripFlight.py', help="生成的测试脚本路径")
+    parser.add_argument('-o', '--output', default=DEFAULT_XLSX_FILE, help="输出的xlsx文件名")
+    parser.add_argument('--benchmark', type=int, metavar='ROWS', help="生成指定行数的工作簿并输出耗时和内存峰值")
+    parser.add_argument('--write-back', metavar='JUNIT_XML', help="把pytest的JUnit XML结果回填到工作簿")
+    parser.add_argument('--screenshots', default='screenshots', help="截图目录")
+    args = parser.parse_args(argv)
+
+    if args.write_back:
+        if not os.path.exists(args.output):
+            generate_ctrip_flight_xlsx(file_name=args.output, script_file=args.script)
+        updated = write_back_results(args.output, args.write_back, args.screenshots)
+        print(f"已回填 {updated} 个测试用例的运行结果: {args.output}")
+        return 0
+
+    if args.benchmark:
+        for rows in sorted({max(args.benchmark // 10, 1), args.benchmark}):
+            result = run_benchmark(rows, args.script)
+            print(f"行数: {result['rows']:>8}  耗时: {result['seconds']:>6}s  "
+                  f"速度: {result['rows_per_second']:>6} 行/秒  内存峰值: {result['peak_memory_mb']} MB")
+        return 0
+
+    xlsx_file = generate_ctrip_flight_xlsx(file_name=args.output, script_file=args.script)
+    print(f"已生成文件: {xlsx_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())